@@ -0,0 +1,620 @@
+"""
+Async counterpart of db_operations built on azure.cosmos.aio.
+
+Every function mirrors the synchronous version in db_operations.py (same name,
+same arguments, same return values) but is a coroutine, so FastAPI handlers can
+await it without blocking the event loop. The constants, queries and document
+builders are imported from db_operations, so this module only does the I/O. The
+client and containers are created lazily on first use and shared for the
+lifetime of the process.
+"""
+from azure.cosmos import exceptions
+from azure.cosmos.aio import CosmosClient
+from common.database.cosmos.db_operations import (
+    config, COSMOS_ENDPOINT, COSMOS_KEY, DATABASE_NAME, CONTAINER_PARTITION_KEYS, CANDIDATE_LIST_FIELDS,
+    container_options,
+    is_safe_query, ranking_fields, set_application_status, set_recruitment_status,
+    top_k_candidates_query, unscored_candidates_query, candidate_count_query, rankings_for_emails_query,
+    finalize_candidates, rankings_by_email, candidates_page_query, applicants_page_query, jobs_page_query,
+    candidates_for_ranking_query, candidate_rankings_query, invalidate_ranking_cache,
+    sync_job_ids, check_resume_blob, assign_candidate_id, candidate_document, ranking_document,
+    merge_ranking_candidate, application_document, github_analysis_document, refresh_github_analysis,
+    github_analysis_query, github_analysis_lookup, GITHUB_LINKS_QUERY, github_link_candidates,
+    merge_user_settings, append_feedback,
+)
+from common.database.cosmos.query_builder import build_query, query_items_async, query_page_async, project_item
+import asyncio
+import json
+
+
+_client = None
+_database = None
+_containers = None
+_init_lock = None
+
+
+async def ensure_containers():
+    """Create (once) the async client, database and containers and return the containers dict."""
+    global _client, _database, _containers, _init_lock
+    if _containers is not None:
+        return _containers
+    # The lock is created lazily so it binds to the running event loop
+    if _init_lock is None:
+        _init_lock = asyncio.Lock()
+    async with _init_lock:
+        if _containers is not None:
+            return _containers
+        try:
+            print(f"[async] Connecting to Cosmos DB at {COSMOS_ENDPOINT}")
+            _client = CosmosClient(COSMOS_ENDPOINT, COSMOS_KEY)
+            _database = await _client.create_database_if_not_exists(id=DATABASE_NAME, offer_throughput=1000)
+            containers = {}
+            for name in CONTAINER_PARTITION_KEYS:
+                containers[name] = await _database.create_container_if_not_exists(**container_options(name))
+            _containers = containers
+            print("[async] All containers ready")
+            return _containers
+        except Exception as e:
+            print(f"[async] Error creating containers: {e}")
+            raise e
+
+
+async def get_container(name):
+    containers = await ensure_containers()
+    return containers[name]
+
+
+async def close_client():
+    """Close the shared async client. Call on application shutdown."""
+    global _client, _database, _containers
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _database = None
+    _containers = None
+
+
+async def _query(container_name, query, parameters=None, partition_key=None, operation="query"):
+    container = await get_container(container_name)
+    return await query_items_async(container, query, parameters, partition_key=partition_key, operation=operation)
+
+
+async def update_candidate_status_by_id(job_id, candidate_id, status):
+    try:
+        print(f"[DEBUG] update_candidate_status_by_id called with job_id={job_id}, candidate_id={candidate_id}, status={status}")
+        query, parameters = build_query(where={"candidate_id": candidate_id, "job_id": str(job_id)})
+        candidates = await _query(config['database']['application_container_name'], query, parameters,
+                                  partition_key=str(job_id), operation="update_candidate_status_by_id")
+        if not candidates:
+            print(f"[DEBUG] No candidate found with candidate_id={candidate_id} and job_id={job_id}")
+            return f"Error: Candidate with candidate_id {candidate_id} not found for job ID {job_id}."
+        candidate = candidates[0]
+        set_application_status(candidate, status)
+        container = await get_container(config['database']['application_container_name'])
+        await container.replace_item(item=candidate["id"], body=candidate)
+        print(f"[DEBUG] Status for {candidate_id} updated to '{status}'")
+        return f"Success: Status for {candidate_id} updated to '{status}'."
+    except Exception as e:
+        print(f"[DEBUG] An error occurred: {e}")
+        return f"An error occurred: {e}"
+
+# Fetch applications by candidate_id (for UUID lookup)
+async def fetch_applications_by_candidate(candidate_id):
+    query, parameters = build_query(where={"candidate_id": candidate_id})
+    return await _query(config['database']['application_container_name'], query, parameters,
+                        operation="fetch_applications_by_candidate")
+
+# Fetch applications by candidate email (for fallback lookup)
+async def fetch_applications_by_candidate_email(email):
+    query, parameters = build_query(where={"email": email})
+    return await _query(config['database']['application_container_name'], query, parameters,
+                        operation="fetch_applications_by_candidate_email")
+
+async def upsert_resume(resume_data):
+    try:
+        print(f"Upserting resume for {resume_data['email']}")
+        container = await get_container(config['database']['resumes_container_name'])
+        await container.upsert_item(resume_data)
+        print(f"Resume data upserted successfully!")
+    except Exception as e:
+        print(f"An error occurred while upserting resume: {e}")
+
+async def upsert_jobDetails(jobData):
+    try:
+        # Ensure both id and job_id are present
+        sync_job_ids(jobData)
+        print("Final job data to upsert:", jobData)
+        container = await get_container(config['database']['job_description_container_name'])
+        await container.upsert_item(jobData)
+        print(f"Job data upserted successfully!")
+        invalidate_ranking_cache(jobData["job_id"])
+    except Exception as e:
+        print(f"An error occurred while upserting job: {e}")
+
+async def delete_job(job_id):
+    """
+    Delete a job from the job description container by job_id.
+    """
+    try:
+        container = await get_container(config['database']['job_description_container_name'])
+        await container.delete_item(item=job_id, partition_key=job_id)
+        print(f"Job {job_id} deleted successfully.")
+        invalidate_ranking_cache(job_id)
+        return True
+    except Exception as e:
+        print(f"Failed to delete job {job_id}: {e}")
+        return False
+
+async def delete_applications_by_job_id(job_id):
+    """
+    Delete all candidate application records for a given job_id from the application container.
+    """
+    try:
+        container = await get_container(config['database']['application_container_name'])
+        query, parameters = build_query(select=["id"], where={"job_id": str(job_id)})
+        items = await _query(config['database']['application_container_name'], query, parameters,
+                             partition_key=str(job_id), operation="delete_applications_by_job_id")
+        for item in items:
+            await container.delete_item(item=item['id'], partition_key=str(job_id))
+            print(f"Deleted application {item['id']} for job {job_id}")
+        print(f"All applications for job {job_id} deleted.")
+        return True
+    except Exception as e:
+        print(f"Failed to delete applications for job {job_id}: {e}")
+        return False
+
+async def upsert_candidate(candidate_data):
+    """
+    Upsert a candidate application into the database.
+    Same validation and candidate_id reuse rules as db_operations.upsert_candidate.
+    """
+    try:
+        print(f"Upserting candidate application for job {candidate_data['job_id']}")
+        check_resume_blob(candidate_data)
+        # Ensure candidate_id is consistent for email
+        if not candidate_data.get("candidate_id"):
+            assign_candidate_id(candidate_data, await fetch_applications_by_candidate_email(candidate_data["email"]))
+        candidate_document(candidate_data)
+        container = await get_container(config['database']['application_container_name'])
+        await container.upsert_item(candidate_data)
+        print(f"Candidate application upserted successfully!")
+        return candidate_data
+    except Exception as e:
+        print(f"An error occurred while upserting candidate: {e}")
+        raise e
+
+async def fetch_job_description(job_id):
+    try:
+        query, parameters = build_query(where={"job_id": str(job_id)})
+        items = await _query(config['database']['job_description_container_name'], query, parameters,
+                             partition_key=str(job_id), operation="fetch_job_description")
+        return items[0] if items else None
+    except Exception as e:
+        print(f"An error occurred while fetching job description: {e}")
+        return None
+
+async def fetch_all_jobs(fields=None):
+    try:
+        # Listing every job has to fan out across partitions
+        query, parameters = jobs_page_query(fields)
+        return await _query(config['database']['job_description_container_name'], query, parameters,
+                            operation="fetch_all_jobs")
+    except Exception as e:
+        print(f"An error occurred while fetching all jobs: {e}")
+        return []
+
+async def fetch_jobs_page(page_size=100, continuation=None, fields=None):
+    """Async counterpart of db_operations.fetch_jobs_page."""
+    try:
+        query, parameters = jobs_page_query(fields)
+        container = await get_container(config['database']['job_description_container_name'])
+        return await query_page_async(container, query, parameters, operation="fetch_jobs_page",
+                                      page_size=page_size, continuation=continuation)
+    except ValueError:
+        raise
+    except Exception as e:
+        print(f"An error occurred while fetching jobs page: {e}")
+        return [], None
+
+async def _fetch_top_k_candidates_in_memory(job_id, top_k, fields=None):
+    """Legacy path: load every application for the job and sort in Python."""
+    query, parameters = build_query(where={"job_id": str(job_id)})
+    candidates = await _query(config['database']['application_container_name'], query, parameters,
+                              partition_key=str(job_id), operation="fetch_top_k_candidates_in_memory")
+    candidates = [c for c in candidates if c.get('type') != 'application']
+    finalize_candidates(candidates, await fetch_candidate_rankings(job_id), job_id)
+    sorted_candidates = sorted(candidates, key=lambda x: x.get('ranking', 0), reverse=True)
+    return [project_item(c, fields or CANDIDATE_LIST_FIELDS) for c in sorted_candidates[:top_k]]
+
+async def fetch_top_k_candidates_by_count(job_id, top_k=10, fields=None):
+    """Async counterpart of db_operations.fetch_top_k_candidates_by_count."""
+    try:
+        container_name = config['database']['application_container_name']
+        try:
+            query, parameters = top_k_candidates_query(job_id, top_k, fields=fields)
+            candidates = await _query(container_name, query, parameters, partition_key=str(job_id),
+                                      operation="fetch_top_k_candidates_by_count")
+            if len(candidates) < top_k:
+                # ORDER BY skips documents without ranking_score, so make sure none were left out
+                count_query, count_parameters = unscored_candidates_query(job_id)
+                unscored = await _query(container_name, count_query, count_parameters, partition_key=str(job_id),
+                                        operation="count_unscored_candidates")
+                if unscored and unscored[0]:
+                    print(f"[WARN] {unscored[0]} candidates for job {job_id} have no ranking_score; "
+                          f"run scripts/backfill_application_ranking_fields.py")
+                    candidates = None
+        except exceptions.CosmosHttpResponseError as e:
+            print(f"[WARN] Top-K query failed for job {job_id} ({e}); falling back to in-memory sort")
+            candidates = None
+        if candidates is None:
+            candidates = await _fetch_top_k_candidates_in_memory(job_id, top_k, fields)
+        else:
+            emails = [(c.get('email') or '').strip() for c in candidates if c.get('email')]
+            rankings = await fetch_candidate_rankings_for_emails(job_id, emails) if emails else {}
+            finalize_candidates(candidates, rankings, job_id)
+            # Rankings stored before denormalization may still differ from ranking_score
+            candidates.sort(key=lambda x: x.get('ranking', 0), reverse=True)
+        print(f"Returning top {top_k} candidates for job {job_id}")
+        return json.dumps(candidates)
+    except Exception as e:
+        print(f"An error occurred while fetching candidates: {e}")
+        return []
+
+async def fetch_candidates_page(job_id, page_size=50, continuation=None, fields=None):
+    """Async counterpart of db_operations.fetch_candidates_page."""
+    try:
+        query, parameters = candidates_page_query(job_id, fields)
+        container = await get_container(config['database']['application_container_name'])
+        candidates, next_token = await query_page_async(container, query, parameters, partition_key=str(job_id),
+                                                        operation="fetch_candidates_page",
+                                                        page_size=page_size, continuation=continuation)
+        for c in candidates:
+            c['job_id'] = c.get('job_id', job_id)
+        return candidates, next_token
+    except ValueError:
+        raise
+    except Exception as e:
+        print(f"An error occurred while fetching candidates page: {e}")
+        return [], None
+
+async def fetch_top_k_candidates_by_percentage(job_id, top_percent=0.1):
+    """
+    Fetch the top X% of candidates for a given job_id.
+    :param job_id: str, the job to query for
+    :param top_percent: float, e.g. 0.1 for top 10%
+    :return: JSON string of top candidate dicts
+    """
+    try:
+        query, parameters = candidate_count_query(job_id)
+        counts = await _query(config['database']['application_container_name'], query, parameters,
+                              partition_key=str(job_id), operation="count_candidates")
+        total = counts[0] if counts else 0
+        if not total:
+            return json.dumps([])
+        count = max(1, int(total * top_percent))
+        return await fetch_top_k_candidates_by_count(job_id, top_k=count)
+    except Exception as e:
+        print(f"An error occurred in fetch_top_k_candidates_by_percentage: {e}")
+        return json.dumps([])
+
+async def fetch_candidate_rankings(job_id):
+    try:
+        query, parameters = candidate_rankings_query(job_id)
+        rankings = await _query(config['database']['ranking_container_name'], query, parameters,
+                                partition_key=str(job_id), operation="fetch_candidate_rankings")
+        return rankings_by_email(rankings)
+    except Exception as e:
+        print(f"An error occurred while fetching candidate rankings: {e}")
+        return {}
+
+async def fetch_candidate_rankings_for_emails(job_id, emails):
+    """Ranking container entries for just the given candidates of a job."""
+    try:
+        query, parameters = rankings_for_emails_query(job_id, emails)
+        rankings = await _query(config['database']['ranking_container_name'], query, parameters,
+                                partition_key=str(job_id), operation="fetch_candidate_rankings_for_emails")
+        return rankings_by_email(rankings)
+    except Exception as e:
+        print(f"An error occurred while fetching candidate rankings: {e}")
+        return {}
+
+async def update_candidate_fields(job_id, candidate_email, fields):
+    """Async counterpart of db_operations.update_candidate_fields."""
+    container = await get_container(config['database']['application_container_name'])
+    return await container.patch_item(
+        item=f"{job_id}_{candidate_email}",
+        partition_key=str(job_id),
+        patch_operations=[{"op": "set", "path": f"/{k}", "value": v} for k, v in fields.items()]
+    )
+
+async def _denormalize_ranking_to_application(job_id, candidate_email, ranking, explanation=None):
+    """Copy a ranking onto the candidate's application document so listings can ORDER BY it."""
+    try:
+        await update_candidate_fields(job_id, candidate_email, ranking_fields(ranking, explanation))
+    except exceptions.CosmosResourceNotFoundError:
+        print(f"[WARN] No application document to denormalize ranking into for job {job_id} and {candidate_email}")
+    except Exception as e:
+        print(f"[WARN] Failed to denormalize ranking for job {job_id} and {candidate_email}: {e}")
+
+async def store_candidate_ranking(job_id, candidate_email, ranking, explanation=None):
+    try:
+        data = ranking_document(job_id, candidate_email, ranking, explanation)
+        container = await get_container(config['database']['ranking_container_name'])
+        await container.upsert_item(data)
+        await _denormalize_ranking_to_application(job_id, candidate_email, ranking, explanation)
+        print(f"Stored ranking for job {job_id} and {candidate_email}")
+    except Exception as e:
+        print(f"Failed to store candidate ranking: {e}")
+
+async def update_recruitment_process(job_id, candidate_email, status, additional_info=None):
+    try:
+        container = await get_container(config['database']['job_description_container_name'])
+        job_document = await container.read_item(item=str(job_id), partition_key=str(job_id))
+        if "candidates" not in job_document:
+            return f"Error: No candidates found for job ID {job_id}."
+        if set_recruitment_status(job_document, candidate_email, status):
+            await container.replace_item(item=job_document["id"], body=job_document)
+            print(f"[DEBUG] Status for {candidate_email} updated to '{status}'")
+            return f"Success: Status for {candidate_email} updated to '{status}'."
+        return f"Error: Candidate with email {candidate_email} not found for job ID {job_id}."
+    except Exception as e:
+        print(f"[DEBUG] An error occurred: {e}")
+        return f"An error occurred: {e}"
+
+async def store_application(application_data):
+    try:
+        application_data["type"] = "application"
+        container = await get_container(config['database']['application_container_name'])
+        await container.upsert_item(body=application_data)
+        print(f"Application data stored successfully for {application_data['id']}")
+    except exceptions.CosmosHttpResponseError as e:
+        print(f"Failed to store application data: {e}")
+
+async def fetch_application(application_id):
+    try:
+        query, parameters = build_query(where={"type": "application", "id": application_id})
+        results = await _query(config['database']['application_container_name'], query, parameters,
+                               operation="fetch_application")
+        return results[0] if results else None
+    except Exception as e:
+        print(f"An error occurred while fetching application: {e}")
+        return None
+
+async def store_job_questionnaire(questionnaire_data):
+    try:
+        questionnaire_data["type"] = "job_questionnaire"
+        container = await get_container(config['database']['job_description_questionnaire_container_name'])
+        await container.upsert_item(body=questionnaire_data)
+        print(f"Questionnaire data stored successfully for {questionnaire_data['job_id']}")
+        invalidate_ranking_cache(questionnaire_data['job_id'])
+    except exceptions.CosmosHttpResponseError as e:
+        print(f"Failed to store Questionnaire data: {e}")
+
+async def fetch_job_description_questionnaire(job_id):
+    try:
+        query, parameters = build_query(where={"type": "job_questionnaire", "job_id": str(job_id)})
+        results = await _query(config['database']['job_description_questionnaire_container_name'], query, parameters,
+                               partition_key=str(job_id), operation="fetch_job_description_questionnaire")
+        if results:
+            return results[0]
+        print(f"No job description questionnaire found for job ID: {job_id}")
+        return None
+    except Exception as e:
+        print(f"An error occurred while fetching job description questionnaire: {e}")
+        return None
+
+async def fetch_candidates_for_ranking(job_id, emails=None):
+    try:
+        query, parameters = candidates_for_ranking_query(job_id, emails)
+        return await _query(config['database']['application_container_name'], query, parameters,
+                            partition_key=str(job_id), operation="fetch_candidates_for_ranking")
+    except Exception as e:
+        print(f"An error occurred while fetching candidates for ranking: {e}")
+        return []
+
+async def fetch_resume_with_email_and_job(job_id, email):
+    try:
+        query, parameters = build_query(where={"email": email, "job_id": str(job_id), "type": "candidate"})
+        results = await _query(config['database']['application_container_name'], query, parameters,
+                               partition_key=str(job_id), operation="fetch_resume_with_email_and_job")
+        if results:
+            return results[0]
+        print("No candidate found for the given email and job_id.")
+        return None
+    except Exception as e:
+        print(f"An error occurred while fetching candidate: {e}")
+        return None
+
+async def fetch_resume_with_email(email):
+    try:
+        # Applications are partitioned by job_id, so an email-only lookup must fan out
+        query, parameters = build_query(where={"email": email, "type": "candidate"})
+        results = await _query(config['database']['application_container_name'], query, parameters,
+                               operation="fetch_resume_with_email")
+        if results:
+            return results[0]
+        print("No resume found for the given email.")
+        return None
+    except Exception as e:
+        print(f"An error occurred while fetching resume: {e}")
+        return None
+
+async def upsert_github_analysis(candidate_email, github_identifier, analysis_result, watermarks=None):
+    """Upsert GitHub analysis for a candidate (by email + github_identifier).
+    watermarks are the per-repo pushed_at/SHA marks used for incremental refreshes; None drops them."""
+    item = github_analysis_document(candidate_email, github_identifier, analysis_result, watermarks)
+    container = await get_container(config['database']['github_container_name'])
+    try:
+        await container.upsert_item(item)
+        print(f"[INFO] GitHub analysis upserted for candidate_email={candidate_email}, github_identifier={github_identifier}")
+    except Exception as e:
+        print(f"[ERROR] Upsert failed: {e}")
+        # If conflict, fetch existing, update, and replace
+        if getattr(e, 'status_code', None) != 409:
+            raise
+        query, parameters = github_analysis_query(candidate_email, github_identifier)
+        existing = await _query(config['database']['github_container_name'], query, parameters,
+                                partition_key=candidate_email, operation="upsert_github_analysis")
+        if existing:
+            doc = refresh_github_analysis(existing[0], analysis_result, watermarks)
+            await container.replace_item(item=doc['id'], body=doc)
+            print(f"[INFO] Existing GitHub analysis updated for candidate_email={candidate_email}, github_identifier={github_identifier}")
+        else:
+            print(f"[ERROR] Conflict but no existing record found for candidate_email={candidate_email}, github_identifier={github_identifier}")
+
+async def fetch_github_analysis_by_candidate(email, github_username, return_full_item=False):
+    """Fetch GitHub analysis for a candidate (by email + github_identifier).
+    Returns the nested 'result' payload, or the whole document when return_full_item is True."""
+    try:
+        query, parameters, partition_keys = github_analysis_lookup(email, github_username)
+        # Try the candidate's partition before fanning out
+        items = []
+        for partition_key in partition_keys:
+            items = await _query(config['database']['github_container_name'], query, parameters,
+                                 partition_key=partition_key, operation="fetch_github_analysis_by_candidate")
+            if items:
+                break
+        if not items:
+            items = await _query(config['database']['github_container_name'], query, parameters,
+                                 operation="fetch_github_analysis_by_candidate")
+        if items:
+            return items[0] if return_full_item else items[0].get("result")
+        return None
+    except Exception as e:
+        print(f"An error occurred while fetching GitHub analysis: {e}")
+        return None
+
+async def fetch_user_settings(user_email):
+    """Fetch user settings by email."""
+    try:
+        query, parameters = build_query(where={"email": user_email})
+        items = await _query(config['database']['users_container_name'], query, parameters,
+                             partition_key=user_email, operation="fetch_user_settings")
+        return items[0] if items else None
+    except Exception as e:
+        print(f"An error occurred while fetching user settings: {e}")
+        return None
+
+async def update_user_settings(user_email, settings_data):
+    """Update user settings (company info, notifications, etc.)."""
+    try:
+        user = await fetch_user_settings(user_email)
+        if not user:
+            print(f"User not found: {user_email}")
+            return False
+        merge_user_settings(user, settings_data)
+        container = await get_container(config['database']['users_container_name'])
+        await container.upsert_item(user)
+        print(f"User settings updated for {user_email}")
+        return True
+    except Exception as e:
+        print(f"An error occurred while updating user settings: {e}")
+        return False
+
+async def add_user_feedback(user_email, feedback_data):
+    """Add feedback to user's feedback array."""
+    try:
+        user = await fetch_user_settings(user_email)
+        if not user:
+            print(f"User not found: {user_email}")
+            return False
+        feedback_entry = append_feedback(user, feedback_data)
+        container = await get_container(config['database']['users_container_name'])
+        await container.upsert_item(user)
+        print(f"Feedback added for {user_email}, feedback_id: {feedback_entry['feedback_id']}")
+        return True
+    except Exception as e:
+        print(f"An error occurred while adding feedback: {e}")
+        return False
+
+async def fetch_candidates_with_github_links():
+    """Fetch all candidates with GitHub links from application container."""
+    try:
+        items = await _query(config['database']['application_container_name'], GITHUB_LINKS_QUERY,
+                             operation="fetch_candidates_with_github_links")
+        candidates = github_link_candidates(items)
+        print(f"[INFO] Found {len(candidates)} candidates with GitHub links")
+        return candidates
+    except Exception as e:
+        print(f"An error occurred while fetching candidates with GitHub links: {e}")
+        return []
+
+async def fetch_applications_page(job_id, page_size=100, continuation=None, fields=None):
+    """Async counterpart of db_operations.fetch_applications_page."""
+    try:
+        query, parameters = applicants_page_query(job_id, fields)
+        container = await get_container(config['database']['application_container_name'])
+        return await query_page_async(container, query, parameters, partition_key=str(job_id),
+                                      operation="fetch_applications_page",
+                                      page_size=page_size, continuation=continuation)
+    except ValueError:
+        raise
+    except Exception as e:
+        print(f"An error occurred while fetching applications page: {e}")
+        return [], None
+
+async def fetch_application_by_job_id(job_id, fields=None):
+    try:
+        query, parameters = build_query(select=fields or "*", where={"type": "application", "job_id": str(job_id)})
+        results = await _query(config['database']['application_container_name'], query, parameters,
+                               partition_key=str(job_id), operation="fetch_application_by_job_id")
+        if results:
+            return results[0]
+        print(f"No application found for job ID: {job_id}")
+        return None
+    except Exception as e:
+        print(f"An error occurred while fetching application: {e}")
+        return None
+
+async def create_application_for_job_id(job_id, job_questionnaire_id):
+    try:
+        new_application = application_document(job_id, job_questionnaire_id)
+        container = await get_container(config['database']['application_container_name'])
+        await container.create_item(body=new_application)
+        print(f"New application created for job ID: {job_id}")
+        return new_application
+    except Exception as e:
+        print(f"An error occurred while creating application: {e}")
+        return None
+
+async def save_ranking_data_to_cosmos_db(ranking_data, candidate_email, ranking, conversation, resume):
+    try:
+        if not candidate_email or not ranking_data.get('job_id'):
+            print(f"[ERROR] Missing candidate_email or job_id. Skipping save. candidate_email={candidate_email}, job_id={ranking_data.get('job_id')}")
+            return "Error: Missing candidate_email or job_id."
+        if ranking is None:
+            print(f"[ERROR] Ranking is None for candidate_email={candidate_email}, job_id={ranking_data.get('job_id')}. Skipping save.")
+            return "Error: Ranking is None."
+
+        container = await get_container(config['database']['ranking_container_name'])
+        # --- Save a flat ranking record for UI ---
+        flat_ranking_doc = ranking_document(ranking_data['job_id'], candidate_email, ranking)
+        try:
+            await container.upsert_item(flat_ranking_doc)
+            await _denormalize_ranking_to_application(ranking_data['job_id'], candidate_email, ranking)
+        except Exception as e:
+            print(f"[ERROR] Failed to upsert flat ranking doc for UI: {e}")
+
+        # --- Retain old logic for backward compatibility ---
+        merge_ranking_candidate(ranking_data, candidate_email, ranking, conversation, resume)
+
+        if "id" in ranking_data:
+            await container.upsert_item(ranking_data)
+            print(f"[DEBUG] Ranking data successfully upserted in Cosmos DB for {candidate_email}.")
+            return f"Success: The candidate with email {candidate_email} has been added."
+        print(f"[DEBUG] Error: No 'id' found in ranking_data, cannot update the document.")
+        return "Error: No 'id' found in ranking_data, cannot update the document."
+    except Exception as e:
+        print(f"[ERROR] An error occurred while saving ranking data: {e}")
+        import traceback; traceback.print_exc()
+        return f"An error occurred: {e}"
+
+async def execute_sql_query(query: str):
+    if not is_safe_query(query):
+        print("Unsafe query detected. Aborting execution.")
+        return None
+    try:
+        return await _query(config['database']['resumes_container_name'], query, operation="execute_sql_query")
+    except exceptions.CosmosHttpResponseError as e:
+        print(f"Error executing SQL query: {e}")
+        return None
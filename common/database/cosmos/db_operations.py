@@ -1,7 +1,12 @@
 from azure.cosmos import CosmosClient, PartitionKey, exceptions
 from common.utils.config_utils import load_config
+from common.database.cosmos.query_builder import build_query, query_items, query_page, project_item
+from common.utils.cache import get_cache
+from collections.abc import Mapping
 from datetime import datetime
 import ast
+import json
+import threading
 import uuid
 
 
@@ -11,51 +16,90 @@ COSMOS_ENDPOINT = config['database']['cosmos_db_uri']
 COSMOS_KEY = config['database']['cosmos_db_key']
 DATABASE_NAME = config['database']['cosmos_db_name']
 
-# Initialize Cosmos DB client
-print(f"Connecting to Cosmos DB at {COSMOS_ENDPOINT}")
-client = CosmosClient(COSMOS_ENDPOINT, COSMOS_KEY)
+# The Cosmos client, database and containers are created on first use in each process, so
+# importing this module (e.g. in a gunicorn master before it forks workers) opens no connections
+_client = None
+_database = None
+_containers = None
+_init_lock = threading.RLock()
 
-# Ensure database exists
-try:
-    print(f"Creating database if not exists: {DATABASE_NAME}")
-    database = client.create_database_if_not_exists(id=DATABASE_NAME, offer_throughput=1000)
-    print(f"Using database: {DATABASE_NAME}")
-except Exception as e:
-    print(f"Error creating/accessing database: {e}")
-    raise e
+def get_client():
+    global _client
+    with _init_lock:
+        if _client is None:
+            print(f"Connecting to Cosmos DB at {COSMOS_ENDPOINT}")
+            _client = CosmosClient(COSMOS_ENDPOINT, COSMOS_KEY)
+        return _client
+
+def get_database():
+    global _database
+    if _database is None:
+        client = get_client()
+        with _init_lock:
+            if _database is None:
+                # Ensure database exists
+                try:
+                    print(f"Creating database if not exists: {DATABASE_NAME}")
+                    _database = client.create_database_if_not_exists(id=DATABASE_NAME, offer_throughput=1000)
+                    print(f"Using database: {DATABASE_NAME}")
+                except Exception as e:
+                    print(f"Error creating/accessing database: {e}")
+                    raise e
+    return _database
+
+def __getattr__(name):
+    # Keeps `db_operations.client` / `db_operations.database` working for existing callers
+    if name == "client":
+        return get_client()
+    if name == "database":
+        return get_database()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+VALID_APPLICATION_STATUSES = [
+    "Applied",
+    "Application Under Review",
+    "Interview Invite Sent",
+    "Interview Scheduled",
+    "Interview Feedback Under Review",
+    "Offer Extended",
+    "Rejected",
+    "Withdrawn",
+    "Shortlisted"
+]
+
+def normalize_application_status(status):
+    """The canonical spelling of a recruitment status (case-insensitive), or "Unknown"."""
+    status_map = {s.lower(): s for s in VALID_APPLICATION_STATUSES}
+    return status_map.get((status or "").lower(), "Unknown")
+
+def set_application_status(candidate, status):
+    """Set both status fields of a candidate entry; returns the status that was stored."""
+    normalized_status = normalize_application_status(status)
+    candidate["application_status"] = normalized_status
+    candidate["status"] = normalized_status
+    return normalized_status
+
+def set_recruitment_status(job_document, candidate_email, status):
+    """Update the candidate's entry in a job document's legacy candidates list; True if it was found."""
+    updated = False
+    for candidate in job_document.get("candidates", []):
+        if candidate["email"].lower() == candidate_email.lower():
+            set_application_status(candidate, status)
+            updated = True
+    return updated
 
 def update_candidate_status_by_id(job_id, candidate_id, status):
-    valid_statuses = [
-        "Applied",
-        "Application Under Review",
-        "Interview Invite Sent",
-        "Interview Scheduled",
-        "Interview Feedback Under Review",
-        "Offer Extended",
-        "Rejected",
-        "Withdrawn",
-        "Shortlisted"
-    ]
     try:
         print(f"[DEBUG] update_candidate_status_by_id called with job_id={job_id}, candidate_id={candidate_id}, status={status}")
-        query = f"SELECT * FROM c WHERE c.candidate_id = '{candidate_id}' AND c.job_id = '{job_id}'"
-        candidates = list(containers[config['database']['application_container_name']].query_items(query=query, enable_cross_partition_query=True))
+        query, parameters = build_query(where={"candidate_id": candidate_id, "job_id": str(job_id)})
+        candidates = query_items(containers[config['database']['application_container_name']], query, parameters,
+                                 partition_key=str(job_id), operation="update_candidate_status_by_id")
         if not candidates:
             print(f"[DEBUG] No candidate found with candidate_id={candidate_id} and job_id={job_id}")
             return f"Error: Candidate with candidate_id {candidate_id} not found for job ID {job_id}."
         candidate = candidates[0]
         print(f"[DEBUG] Found candidate: {candidate.get('email')} (candidate_id={candidate_id})")
-        # Case-insensitive status validation
-        status_map = {s.lower(): s for s in valid_statuses}
-        normalized_status = status_map.get(status.lower())
-        if normalized_status:
-            candidate["application_status"] = normalized_status
-            candidate["status"] = normalized_status
-            print(f"[DEBUG] Setting status to {normalized_status}")
-        else:
-            candidate["application_status"] = "Unknown"
-            candidate["status"] = "Unknown"
-            print(f"[DEBUG] Invalid status, setting to Unknown")
+        print(f"[DEBUG] Setting status to {set_application_status(candidate, status)}")
         containers[config['database']['application_container_name']].replace_item(item=candidate["id"], body=candidate)
         print(f"[DEBUG] Status for {candidate_id} updated to '{status}'")
         return f"Success: Status for {candidate_id} updated to '{status}'."
@@ -66,57 +110,445 @@ def update_candidate_status_by_id(job_id, candidate_id, status):
 # Fetch applications by candidate_id (for UUID lookup)
 def fetch_applications_by_candidate(candidate_id):
     global containers, config
-    query = f"SELECT * FROM c WHERE c.candidate_id = '{candidate_id}'"
-    return list(containers[config['database']['application_container_name']].query_items(query=query, enable_cross_partition_query=True))
+    query, parameters = build_query(where={"candidate_id": candidate_id})
+    return query_items(containers[config['database']['application_container_name']], query, parameters,
+                       operation="fetch_applications_by_candidate")
 
 # Fetch applications by candidate email (for fallback lookup)
 def fetch_applications_by_candidate_email(email):
     global containers, config
-    query = f"SELECT * FROM c WHERE c.email = '{email}'"
-    return list(containers[config['database']['application_container_name']].query_items(query=query, enable_cross_partition_query=True))
+    query, parameters = build_query(where={"email": email})
+    return query_items(containers[config['database']['application_container_name']], query, parameters,
+                       operation="fetch_applications_by_candidate_email")
+
+# Composite index backing the server-side top-K query (job partition, best ranking first)
+APPLICATION_INDEXING_POLICY = {
+    "indexingMode": "consistent",
+    "includedPaths": [{"path": "/*"}],
+    "excludedPaths": [{"path": "/\"_etag\"/?"}],
+    "compositeIndexes": [
+        [
+            {"path": "/job_id", "order": "ascending"},
+            {"path": "/ranking_score", "order": "descending"}
+        ]
+    ]
+}
+
+# Fields returned by candidate listings (everything the dashboard and chatbot read). The parsed
+# resume is left out, only its links are kept (Cosmos returns them as "links"); callers that need
+# the resume text pass fields=CANDIDATE_LIST_FIELDS + ["parsed_resume"]
+CANDIDATE_LIST_FIELDS = [
+    "id", "job_id", "candidate_id", "type", "name", "email", "status", "application_status",
+    "applied_at", "ranking", "ranking_score", "ranked_at", "explanation", "score", "evaluation",
+    "resume_blob_name", "cover_letter", "parse_status", "parsed_resume.links"
+]
+
+# Container name -> partition key path
+CONTAINER_PARTITION_KEYS = {
+    config['database']['resumes_container_name']: "/email",
+    config['database']['github_container_name']: "/email",
+    config['database']['ranking_container_name']: "/job_id",
+    config['database']['job_description_container_name']: "/job_id",
+    config['database']['application_container_name']: "/job_id",
+    config['database']['job_description_questionnaire_container_name']: "/job_id",
+    config['database']['users_container_name']: "/email",
+}
+
+def container_options(name):
+    """Keyword arguments for create_container_if_not_exists for one of the containers."""
+    options = {"id": name, "partition_key": PartitionKey(path=CONTAINER_PARTITION_KEYS[name])}
+    if name == config['database']['application_container_name']:
+        options["indexing_policy"] = APPLICATION_INDEXING_POLICY
+    return options
 
 # Initialize containers
 def ensure_containers():
+    database = get_database()
     containers = {}
     try:
         print("Creating containers if they don't exist")
-        containers[config['database']['resumes_container_name']] = database.create_container_if_not_exists(
-            id=config['database']['resumes_container_name'],
-            partition_key=PartitionKey(path="/email")
-        )
-        containers[config['database']['github_container_name']] = database.create_container_if_not_exists(
-            id=config['database']['github_container_name'],
-            partition_key=PartitionKey(path="/email")
-        )
-        containers[config['database']['ranking_container_name']] = database.create_container_if_not_exists(
-            id=config['database']['ranking_container_name'],
-            partition_key=PartitionKey(path="/job_id")
-        )
-        containers[config['database']['job_description_container_name']] = database.create_container_if_not_exists(
-            id=config['database']['job_description_container_name'],
-            partition_key=PartitionKey(path="/job_id")
-        )
-        containers[config['database']['application_container_name']] = database.create_container_if_not_exists(
-            id=config['database']['application_container_name'],
-            partition_key=PartitionKey(path="/job_id")
-        )
-        containers[config['database']['job_description_questionnaire_container_name']] = database.create_container_if_not_exists(
-            id=config['database']['job_description_questionnaire_container_name'],
-            partition_key=PartitionKey(path="/job_id")
-        )
-        containers[config['database']['users_container_name']] = database.create_container_if_not_exists(
-            id=config['database']['users_container_name'],
-            partition_key=PartitionKey(path="/email")
-        )
+        for name in CONTAINER_PARTITION_KEYS:
+            containers[name] = database.create_container_if_not_exists(**container_options(name))
         print("All containers ready")
         return containers
     except Exception as e:
         print(f"Error creating containers: {e}")
         raise e
 
-# Initialize containers
-print("Initializing containers...")
-containers = ensure_containers()
+class _LazyContainers(Mapping):
+    """The container clients by name, created by ensure_containers() on first access."""
+
+    def _load(self):
+        global _containers
+        if _containers is None:
+            with _init_lock:
+                if _containers is None:
+                    print("Initializing containers...")
+                    _containers = ensure_containers()
+        return _containers
+
+    def __getitem__(self, name):
+        return self._load()[name]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+containers = _LazyContainers()
+
+def ensure_application_indexes():
+    """
+    Apply APPLICATION_INDEXING_POLICY to an existing applications container.
+    create_container_if_not_exists does not update the policy of a container that already exists.
+    """
+    get_database().replace_container(
+        containers[config['database']['application_container_name']],
+        partition_key=PartitionKey(path="/job_id"),
+        indexing_policy=APPLICATION_INDEXING_POLICY
+    )
+    print("Applications indexing policy updated")
+
+def ranking_cache_tag(job_id):
+    """Cache tag shared by every ranking result computed from this job's description and questionnaire."""
+    return f"job:{job_id}"
+
+def invalidate_ranking_cache(job_id):
+    """Drop cached ranking results for a job, e.g. after its questionnaire is regenerated."""
+    try:
+        removed = get_cache("ranking").invalidate(ranking_cache_tag(job_id))
+        print(f"[INFO] Invalidated {removed} cached rankings for job {job_id}")
+    except Exception as e:
+        print(f"[WARN] Could not invalidate ranking cache for job {job_id}: {e}")
+
+def normalize_ranking(ranking):
+    """Normalize a stored ranking to the 0-100 scale used for sorting (0-1 fractions are scaled up)."""
+    try:
+        ranking = float(ranking)
+    except (TypeError, ValueError):
+        return 0.0
+    if ranking <= 1:
+        ranking = ranking * 100
+    return round(ranking, 2)
+
+def ranking_fields(ranking, explanation=None, ranked_at=None):
+    """Denormalized ranking fields stored on the application document."""
+    fields = {
+        "ranking": ranking,
+        "ranking_score": normalize_ranking(ranking),
+        "ranked_at": ranked_at or datetime.utcnow().isoformat()
+    }
+    if explanation is not None:
+        fields["explanation"] = explanation
+    return fields
+
+def candidate_ranking(candidate, ranking_info=None):
+    """Resolve a candidate's ranking: ranking container, then ranking, score, evaluation.total, or 0."""
+    ranking_info = ranking_info or {}
+    evaluation = candidate.get('evaluation')
+    if ranking_info.get('ranking') is not None:
+        return ranking_info['ranking']
+    if candidate.get('ranking') is not None:
+        return candidate['ranking']
+    if candidate.get('score') is not None:
+        return candidate['score']
+    if isinstance(evaluation, dict) and evaluation.get('total') is not None:
+        return evaluation['total']
+    return 0
+
+def top_k_candidates_query(job_id, top_k, offset=0, fields=None):
+    """Single-partition ORDER BY ranking_score query served by the composite index."""
+    return build_query(
+        select=fields or CANDIDATE_LIST_FIELDS,
+        where={"job_id": str(job_id)},
+        conditions=["(NOT IS_DEFINED(c.type) OR c.type != @bookkeeping_type)"],
+        parameters={"@bookkeeping_type": "application"},
+        order_by=[("job_id", "ASC"), ("ranking_score", "DESC")],
+        offset=offset,
+        limit=top_k
+    )
+
+def candidates_page_query(job_id, fields=None):
+    """Same ordering as top_k_candidates_query, paged with continuation tokens instead of OFFSET."""
+    return build_query(
+        select=fields or CANDIDATE_LIST_FIELDS,
+        where={"job_id": str(job_id)},
+        conditions=["(NOT IS_DEFINED(c.type) OR c.type != @bookkeeping_type)"],
+        parameters={"@bookkeeping_type": "application"},
+        order_by=[("job_id", "ASC"), ("ranking_score", "DESC")]
+    )
+
+def applicants_page_query(job_id, fields=None):
+    """Every candidate application document for a job, in partition order."""
+    return build_query(
+        select=fields or "*",
+        where={"job_id": str(job_id)},
+        conditions=["(NOT IS_DEFINED(c.type) OR c.type != @bookkeeping_type)"],
+        parameters={"@bookkeeping_type": "application"}
+    )
+
+def jobs_page_query(fields=None):
+    return build_query(select=fields or "*", order_by=[("_ts", "DESC")])
+
+def unscored_candidates_query(job_id):
+    """Count candidates written before ranking_score was denormalized (excluded by ORDER BY)."""
+    return build_query(
+        select="VALUE COUNT(1)",
+        where={"job_id": str(job_id)},
+        conditions=["(NOT IS_DEFINED(c.type) OR c.type != @bookkeeping_type)", "NOT IS_DEFINED(c.ranking_score)"],
+        parameters={"@bookkeeping_type": "application"}
+    )
+
+def candidate_count_query(job_id):
+    return build_query(
+        select="VALUE COUNT(1)",
+        where={"job_id": str(job_id)},
+        conditions=["(NOT IS_DEFINED(c.type) OR c.type != @bookkeeping_type)"],
+        parameters={"@bookkeeping_type": "application"}
+    )
+
+def candidates_for_ranking_query(job_id, emails=None):
+    """Candidate documents of a job (optionally only the given emails) with what ranking needs."""
+    conditions, parameters = [], {}
+    if emails:
+        conditions.append("ARRAY_CONTAINS(@emails, c.email)")
+        parameters["@emails"] = list(emails)
+    return build_query(
+        select=["id", "email", "parsed_resume", "resume_blob_name"],
+        where={"job_id": str(job_id), "type": "candidate"},
+        conditions=conditions,
+        parameters=parameters
+    )
+
+def rankings_for_emails_query(job_id, emails):
+    return build_query(
+        select=["candidate_email", "ranking", "ranked_at", "explanation"],
+        where={"type": "ranking", "job_id": str(job_id)},
+        conditions=["ARRAY_CONTAINS(@emails, c.candidate_email)"],
+        parameters={"@emails": list(emails)}
+    )
+
+def finalize_candidates(candidates, rankings, job_id):
+    """
+    Attach the resolved 0-100 ranking, job_id and candidate_id to each candidate (in place).
+    A ranking container entry also supplies ranked_at and explanation, so callers can tell a
+    ranked candidate (even one scored 0) from an unranked one without another query.
+    """
+    for c in candidates:
+        email = (c.get('email') or c.get('candidate_email') or '').strip().lower()
+        ranking_info = rankings.get(email)
+        c['ranking'] = normalize_ranking(candidate_ranking(c, ranking_info))
+        if ranking_info and ranking_info.get('ranking') is not None:
+            c['ranked_at'] = ranking_info.get('ranked_at') or c.get('ranked_at')
+            c['explanation'] = ranking_info.get('explanation') or c.get('explanation')
+        c['job_id'] = c.get('job_id', job_id)
+        if not c.get('candidate_id'):
+            # Try to extract from id if possible
+            if c.get('id') and '_' in c['id']:
+                c['candidate_id'] = c['id'].split('_', 1)[-1]
+    return candidates
+
+# Documents and queries shared with async_db_operations, which only differs in the I/O
+
+def sync_job_ids(job_data):
+    """Make sure a job document carries both id and job_id."""
+    if "id" not in job_data and "job_id" in job_data:
+        job_data["id"] = job_data["job_id"]
+    elif "job_id" not in job_data and "id" in job_data:
+        job_data["job_id"] = job_data["id"]
+    return job_data
+
+def check_resume_blob(candidate_data):
+    """Raise ValueError for a candidate with an uploaded resume but no 'resume_blob_name'."""
+    if candidate_data.get('resume_uploaded', True):  # Assume True if not specified
+        if not candidate_data.get('resume_blob_name'):
+            print(f"WARNING: Candidate {candidate_data.get('email')} for job {candidate_data.get('job_id')} is missing 'resume_blob_name'.")
+            raise ValueError(f"Missing 'resume_blob_name' for candidate {candidate_data.get('email')} and job {candidate_data.get('job_id')}")
+
+def assign_candidate_id(candidate_data, existing_apps):
+    """Reuse the candidate_id of the email's other applications, or generate a new one."""
+    existing_cids = [app.get("candidate_id") for app in existing_apps if app.get("candidate_id")]
+    if existing_cids:
+        candidate_data["candidate_id"] = existing_cids[0]
+        print(f"Reusing candidate_id {candidate_data['candidate_id']} for email {candidate_data['email']}")
+    else:
+        candidate_data["candidate_id"] = str(uuid.uuid4())
+        print(f"Generated new candidate_id: {candidate_data['candidate_id']}")
+    return candidate_data["candidate_id"]
+
+def candidate_document(candidate_data):
+    """Set the composite id and the sortable ranking_score on a candidate application before it is written."""
+    candidate_data["id"] = f"{candidate_data['job_id']}_{candidate_data['email']}"
+    # Keep the sortable ranking field in step with the ranking stored on the document
+    candidate_data["ranking_score"] = normalize_ranking(candidate_ranking(candidate_data))
+    return candidate_data
+
+def candidate_rankings_query(job_id):
+    return build_query(
+        select=["candidate_email", "ranking", "ranked_at", "explanation"],
+        where={"type": "ranking", "job_id": str(job_id)}
+    )
+
+def ranking_document(job_id, candidate_email, ranking, explanation=None):
+    """The flat per-candidate record in the ranking container."""
+    data = {
+        "id": f"{job_id}_{candidate_email}",
+        "type": "ranking",
+        "job_id": job_id,
+        "candidate_email": candidate_email,
+        "ranking": ranking,
+        "ranked_at": datetime.utcnow().isoformat()
+    }
+    if explanation is not None:
+        data["explanation"] = explanation
+    return data
+
+def merge_ranking_candidate(ranking_data, candidate_email, ranking, conversation, resume):
+    """Add or update the candidate in a legacy ranking document's candidates list; True if it was updated."""
+    if "candidates" not in ranking_data:
+        ranking_data["candidates"] = []
+    for candidate in ranking_data["candidates"]:
+        if candidate["email"].lower() == candidate_email.lower() and candidate.get("job_id") == ranking_data.get("job_id"):
+            candidate["ranking"] = ranking
+            candidate["conversation"] = conversation
+            candidate["resume"] = resume
+            candidate["application_status"] = "Applied"
+            return True
+    ranking_data["candidates"].append({
+        "email": candidate_email,
+        "job_id": ranking_data.get("job_id"),
+        "ranking": ranking,
+        "conversation": conversation,
+        "resume": resume,
+        "application_status": "Applied"
+    })
+    return False
+
+def application_document(job_id, job_questionnaire_id):
+    return {
+        "job_id": job_id,
+        "job_questionnaire_id": job_questionnaire_id,
+        "id": f"{job_id}_{job_questionnaire_id}",
+        "type": "application"
+    }
+
+def github_analysis_document(candidate_email, github_identifier, analysis_result, watermarks=None):
+    item = {
+        "id": f"github_analysis_{candidate_email}_{github_identifier}",
+        "candidate_email": candidate_email,
+        "github_identifier": github_identifier,
+        "type": "github_analysis",
+        "result": analysis_result,
+        "created_at": datetime.utcnow().isoformat(),
+        "email": candidate_email  # for partition key compatibility
+    }
+    if watermarks is not None:
+        item["watermarks"] = watermarks
+    return item
+
+def refresh_github_analysis(doc, analysis_result, watermarks=None):
+    """Overwrite an existing analysis document with a new result; None drops the watermarks."""
+    doc['result'] = analysis_result
+    if watermarks is not None:
+        doc['watermarks'] = watermarks
+    else:
+        doc.pop('watermarks', None)
+    doc['created_at'] = datetime.utcnow().isoformat()
+    return doc
+
+def github_analysis_query(candidate_email, github_identifier):
+    """Exact lookup used to resolve an upsert conflict."""
+    return build_query(where={
+        "type": "github_analysis",
+        "candidate_email": candidate_email,
+        "github_identifier": github_identifier
+    })
+
+def github_analysis_lookup(email, github_username):
+    """
+    Case-insensitive lookup of a candidate's analysis.
+    :return: (query, parameters, partition_keys) - the partitions to try before fanning out
+    """
+    email_norm = (email or "").strip().lower()
+    user_norm = (github_username or "").strip().lower()
+    query, parameters = build_query(
+        where={"type": "github_analysis"},
+        conditions=["LOWER(c.candidate_email) = @email", "LOWER(c.github_identifier) = @github_identifier"],
+        parameters={"@email": email_norm, "@github_identifier": user_norm}
+    )
+    # The container is partitioned by the email as stored
+    partition_keys = [key for key in dict.fromkeys([(email or "").strip(), email_norm]) if key]
+    return query, parameters, partition_keys
+
+GITHUB_LINKS_QUERY = """
+        SELECT DISTINCT c.email, c.parsed_resume
+        FROM c
+        WHERE c.type = 'candidate'
+          AND (IS_DEFINED(c.parsed_resume.links.github) 
+               OR IS_DEFINED(c.parsed_resume.links.gitHub)
+               OR IS_DEFINED(c.parsed_resume.github))
+        """
+
+def github_link_candidates(items):
+    """[{'email', 'github'}] for the GITHUB_LINKS_QUERY results that carry a GitHub link."""
+    candidates = []
+    for item in items:
+        pr = item.get('parsed_resume', {})
+        if isinstance(pr, str):
+            try:
+                pr = json.loads(pr)
+            except Exception:
+                pr = {}
+        github = (
+            pr.get('links', {}).get('github')
+            or pr.get('links', {}).get('gitHub')
+            or pr.get('github')
+        )
+        if github:
+            candidates.append({'email': item['email'], 'github': github})
+    return candidates
+
+def merge_user_settings(user, settings_data):
+    """Apply the settings form to a user document, keeping fields it leaves out."""
+    user['company_name'] = settings_data.get('company_name', user.get('company_name', ''))
+    user['website'] = settings_data.get('website', user.get('website', ''))
+    user['email_notifications'] = settings_data.get('email_notifications', user.get('email_notifications', True))
+    user['application_alerts'] = settings_data.get('application_alerts', user.get('application_alerts', True))
+    user['weekly_digest'] = settings_data.get('weekly_digest', user.get('weekly_digest', False))
+    return user
+
+def append_feedback(user, feedback_data):
+    """Append a feedback entry with a unique ID and timestamp to a user document and return it."""
+    feedback_entry = {
+        'feedback_id': str(uuid.uuid4()),
+        'category': feedback_data.get('category', 'general'),
+        'message': feedback_data.get('message', ''),
+        'created_at': datetime.utcnow().isoformat(),
+        'status': 'new'
+    }
+    user.setdefault('feedback', []).append(feedback_entry)
+    return feedback_entry
+
+def update_candidate_fields(job_id, candidate_email, fields):
+    """
+    Set top-level fields on a candidate's application document with a partial update.
+    Raises CosmosResourceNotFoundError if the application does not exist.
+    """
+    return containers[config['database']['application_container_name']].patch_item(
+        item=f"{job_id}_{candidate_email}",
+        partition_key=str(job_id),
+        patch_operations=[{"op": "set", "path": f"/{k}", "value": v} for k, v in fields.items()]
+    )
+
+def _denormalize_ranking_to_application(job_id, candidate_email, ranking, explanation=None):
+    """Copy a ranking onto the candidate's application document so listings can ORDER BY it."""
+    try:
+        update_candidate_fields(job_id, candidate_email, ranking_fields(ranking, explanation))
+    except exceptions.CosmosResourceNotFoundError:
+        print(f"[WARN] No application document to denormalize ranking into for job {job_id} and {candidate_email}")
+    except Exception as e:
+        print(f"[WARN] Failed to denormalize ranking for job {job_id} and {candidate_email}: {e}")
 
 def upsert_resume(resume_data):
     try:
@@ -130,14 +562,11 @@ def upsert_jobDetails(jobData):
     try:
         print("Upserting job data:", jobData)
         # Ensure both id and job_id are present
-        if "id" not in jobData and "job_id" in jobData:
-            jobData["id"] = jobData["job_id"]
-        elif "job_id" not in jobData and "id" in jobData:
-            jobData["job_id"] = jobData["id"]
-            
+        sync_job_ids(jobData)
         print("Final job data to upsert:", jobData)
         containers[config['database']['job_description_container_name']].upsert_item(jobData)
         print(f"Job data upserted successfully!")
+        invalidate_ranking_cache(jobData["job_id"])
         
         # Verify the job was saved
         saved_job = fetch_job_description(jobData["job_id"])
@@ -157,6 +586,7 @@ def delete_job(job_id):
         container = containers[config['database']['job_description_container_name']]
         container.delete_item(item=job_id, partition_key=job_id)
         print(f"Job {job_id} deleted successfully.")
+        invalidate_ranking_cache(job_id)
         return True
     except Exception as e:
         print(f"Failed to delete job {job_id}: {e}")
@@ -168,10 +598,10 @@ def delete_applications_by_job_id(job_id):
     """
     try:
         container = containers[config['database']['application_container_name']]
-        query = f"SELECT c.id FROM c WHERE c.job_id = '{job_id}'"
-        items = list(container.query_items(query=query, enable_cross_partition_query=True))
+        query, parameters = build_query(select=["id"], where={"job_id": str(job_id)})
+        items = query_items(container, query, parameters, partition_key=str(job_id), operation="delete_applications_by_job_id")
         for item in items:
-            container.delete_item(item=item['id'], partition_key=job_id)
+            container.delete_item(item=item['id'], partition_key=str(job_id))
             print(f"Deleted application {item['id']} for job {job_id}")
         print(f"All applications for job {job_id} deleted.")
         return True
@@ -211,23 +641,12 @@ def upsert_candidate(candidate_data):
         print(f"Upserting candidate application for job {candidate_data['job_id']}")
         print("Candidate data to upsert:", candidate_data)
         # Validate presence of resume_blob_name if a resume is uploaded
-        if candidate_data.get('resume_uploaded', True):  # Assume True if not specified
-            if not candidate_data.get('resume_blob_name'):
-                print(f"WARNING: Candidate {candidate_data.get('email')} for job {candidate_data.get('job_id')} is missing 'resume_blob_name'.")
-                raise ValueError(f"Missing 'resume_blob_name' for candidate {candidate_data.get('email')} and job {candidate_data.get('job_id')}")
+        check_resume_blob(candidate_data)
         # Ensure candidate_id is consistent for email
         if not candidate_data.get("candidate_id"):
             # Look for existing applications for this email
-            existing_apps = fetch_applications_by_candidate_email(candidate_data["email"])
-            existing_cids = [app.get("candidate_id") for app in existing_apps if app.get("candidate_id")]
-            if existing_cids:
-                candidate_data["candidate_id"] = existing_cids[0]
-                print(f"Reusing candidate_id {candidate_data['candidate_id']} for email {candidate_data['email']}")
-            else:
-                candidate_data["candidate_id"] = str(uuid.uuid4())
-                print(f"Generated new candidate_id: {candidate_data['candidate_id']}")
-        # Create composite ID from job_id and email
-        candidate_data["id"] = f"{candidate_data['job_id']}_{candidate_data['email']}"
+            assign_candidate_id(candidate_data, fetch_applications_by_candidate_email(candidate_data["email"]))
+        candidate_document(candidate_data)
         containers[config['database']['application_container_name']].upsert_item(candidate_data)
         print(f"Candidate application upserted successfully!")
         return candidate_data
@@ -237,82 +656,110 @@ def upsert_candidate(candidate_data):
 
 def fetch_job_description(job_id):
     try:
-        query = f"SELECT * FROM c WHERE c.job_id = '{job_id}'"
-        items = list(containers[config['database']['job_description_container_name']].query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
+        query, parameters = build_query(where={"job_id": str(job_id)})
+        items = query_items(containers[config['database']['job_description_container_name']], query, parameters,
+                            partition_key=str(job_id), operation="fetch_job_description")
         return items[0] if items else None
     except Exception as e:
         print(f"An error occurred while fetching job description: {e}")
         return None
 
-def fetch_all_jobs():
+def fetch_all_jobs(fields=None):
     try:
-        query = "SELECT * FROM c ORDER BY c._ts DESC"
-        items = list(containers[config['database']['job_description_container_name']].query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
-        return items
+        # Listing every job has to fan out across partitions
+        query, parameters = jobs_page_query(fields)
+        return query_items(containers[config['database']['job_description_container_name']], query, parameters,
+                           operation="fetch_all_jobs")
     except Exception as e:
         print(f"An error occurred while fetching all jobs: {e}")
         return []
 
-def fetch_top_k_candidates_by_count(job_id, top_k=10):
+def fetch_jobs_page(page_size=100, continuation=None, fields=None):
+    """
+    One page of jobs, newest first.
+    :return: (jobs, continuation) - continuation is None on the last page
+    :raises ValueError: on a malformed continuation token
+    """
     try:
-        query = f"""
-        SELECT *
-        FROM c
-        WHERE c.job_id = '{job_id}'
-        """
-        candidates = list(containers[config['database']['application_container_name']].query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
-        print("RAW CANDIDATES:", candidates)  # Debug print
-        # Do not filter by resume_blob_name; include all candidates (align with repo behavior)
-        valid_candidates = candidates
-        print("VALID CANDIDATES:", valid_candidates)  # Debug print
-        print(f"Found {len(valid_candidates)} valid candidates for job {job_id}")
-
-        # Fetch rankings for this job
-        rankings = fetch_candidate_rankings(job_id)
-        # Attach ranking and ensure job_id/candidate_id for each candidate
-        for c in valid_candidates:
-            email = (c.get('email') or c.get('candidate_email') or '').strip().lower()
-            ranking_info = rankings.get(email, {})
-            # Fallback logic: ranking, score, evaluation.total, or 0
-            ranking = (
-                ranking_info.get('ranking') if ranking_info.get('ranking') is not None else
-                c.get('ranking') if c.get('ranking') is not None else
-                c.get('score') if c.get('score') is not None else
-                (c.get('evaluation', {}).get('total') if isinstance(c.get('evaluation'), dict) and c.get('evaluation', {}).get('total') is not None else 0)
-            )
-            # Normalize all rankings to 0-100 scale
-            if ranking is not None and ranking <= 1:
-                ranking = ranking * 100
-            c['ranking'] = ranking
-            c['job_id'] = c.get('job_id', job_id)
-            if not c.get('candidate_id'):
-                # Try to extract from id if possible
-                if c.get('id') and '_' in c['id']:
-                    c['candidate_id'] = c['id'].split('_', 1)[-1]
-        # Debug print all candidate rankings before sorting
-        print('CANDIDATE RANKINGS FOR JOB', job_id)
-        for c in valid_candidates:
-            print(f"Candidate: {c.get('name')} | Email: {c.get('email')} | Ranking: {c.get('ranking')}")
-        # Sort by ranking descending, fallback to original order if no ranking
-        sorted_candidates = sorted(valid_candidates, key=lambda x: x.get('ranking', 0), reverse=True)
-        # Limit to top_k
-        top_candidates = sorted_candidates[:top_k]
+        query, parameters = jobs_page_query(fields)
+        return query_page(containers[config['database']['job_description_container_name']], query, parameters,
+                          operation="fetch_jobs_page", page_size=page_size, continuation=continuation)
+    except ValueError:
+        raise
+    except Exception as e:
+        print(f"An error occurred while fetching jobs page: {e}")
+        return [], None
+
+def _fetch_top_k_candidates_in_memory(job_id, top_k, fields=None):
+    """Legacy path: load every application for the job and sort in Python."""
+    query, parameters = build_query(where={"job_id": str(job_id)})
+    candidates = query_items(containers[config['database']['application_container_name']], query, parameters,
+                             partition_key=str(job_id), operation="fetch_top_k_candidates_in_memory")
+    candidates = [c for c in candidates if c.get('type') != 'application']
+    finalize_candidates(candidates, fetch_candidate_rankings(job_id), job_id)
+    sorted_candidates = sorted(candidates, key=lambda x: x.get('ranking', 0), reverse=True)
+    return [project_item(c, fields or CANDIDATE_LIST_FIELDS) for c in sorted_candidates[:top_k]]
+
+def fetch_top_k_candidates_by_count(job_id, top_k=10, fields=None):
+    """
+    Return the top_k candidates for a job as a JSON string, best ranking first.
+    The sort and limit run server-side on the denormalized ranking_score field; the in-memory
+    sort is only used while some applications still lack ranking_score or the index is missing.
+    """
+    try:
+        container = containers[config['database']['application_container_name']]
+        try:
+            query, parameters = top_k_candidates_query(job_id, top_k, fields=fields)
+            candidates = query_items(container, query, parameters, partition_key=str(job_id),
+                                     operation="fetch_top_k_candidates_by_count")
+            if len(candidates) < top_k:
+                # ORDER BY skips documents without ranking_score, so make sure none were left out
+                count_query, count_parameters = unscored_candidates_query(job_id)
+                unscored = query_items(container, count_query, count_parameters, partition_key=str(job_id),
+                                       operation="count_unscored_candidates")
+                if unscored and unscored[0]:
+                    print(f"[WARN] {unscored[0]} candidates for job {job_id} have no ranking_score; "
+                          f"run scripts/backfill_application_ranking_fields.py")
+                    candidates = None
+        except exceptions.CosmosHttpResponseError as e:
+            print(f"[WARN] Top-K query failed for job {job_id} ({e}); falling back to in-memory sort")
+            candidates = None
+        if candidates is None:
+            candidates = _fetch_top_k_candidates_in_memory(job_id, top_k, fields)
+        else:
+            emails = [(c.get('email') or '').strip() for c in candidates if c.get('email')]
+            rankings = fetch_candidate_rankings_for_emails(job_id, emails) if emails else {}
+            finalize_candidates(candidates, rankings, job_id)
+            # Rankings stored before denormalization may still differ from ranking_score
+            candidates.sort(key=lambda x: x.get('ranking', 0), reverse=True)
         print(f"Returning top {top_k} candidates for job {job_id}")
-        import json
-        return json.dumps(top_candidates)
+        return json.dumps(candidates)
     except Exception as e:
         print(f"An error occurred while fetching candidates: {e}")
         return []
 
+def fetch_candidates_page(job_id, page_size=50, continuation=None, fields=None):
+    """
+    One page of a job's candidates, best ranking_score first.
+    Candidates without ranking_score are not returned until
+    scripts/backfill_application_ranking_fields.py has been run.
+    :return: (candidates, continuation) - continuation is None on the last page
+    :raises ValueError: on a malformed continuation token
+    """
+    try:
+        query, parameters = candidates_page_query(job_id, fields)
+        candidates, next_token = query_page(containers[config['database']['application_container_name']], query, parameters,
+                                            partition_key=str(job_id), operation="fetch_candidates_page",
+                                            page_size=page_size, continuation=continuation)
+        for c in candidates:
+            c['job_id'] = c.get('job_id', job_id)
+        return candidates, next_token
+    except ValueError:
+        raise
+    except Exception as e:
+        print(f"An error occurred while fetching candidates page: {e}")
+        return [], None
+
 def fetch_top_k_candidates_by_percentage(job_id, top_percent=0.1):
     """
     Fetch the top X% of candidates for a given job_id.
@@ -321,67 +768,57 @@ def fetch_top_k_candidates_by_percentage(job_id, top_percent=0.1):
     :return: JSON string of top candidate dicts
     """
     try:
-        candidates = fetch_top_k_candidates_by_count(job_id, top_k=10000)
-        import json
-        candidates = json.loads(candidates) if isinstance(candidates, str) else candidates
-        if not candidates:
+        query, parameters = candidate_count_query(job_id)
+        counts = query_items(containers[config['database']['application_container_name']], query, parameters,
+                             partition_key=str(job_id), operation="count_candidates")
+        total = counts[0] if counts else 0
+        if not total:
             return json.dumps([])
-        count = max(1, int(len(candidates) * top_percent))
-        sorted_candidates = sorted(
-            candidates,
-            key=lambda c: c.get('ranking', 0),
-            reverse=True
-        )
-        return json.dumps(sorted_candidates[:count])
+        count = max(1, int(total * top_percent))
+        return fetch_top_k_candidates_by_count(job_id, top_k=count)
     except Exception as e:
         print(f"An error occurred in fetch_top_k_candidates_by_percentage: {e}")
         return json.dumps([])
 
+def rankings_by_email(rankings):
+    return { (r['candidate_email'] or '').strip().lower(): {
+        'ranking': r['ranking'],
+        'ranked_at': r['ranked_at'],
+        'explanation': r.get('explanation', None)
+    } for r in rankings}
+
+def fetch_candidate_rankings_for_emails(job_id, emails):
+    """Ranking container entries for just the given candidates of a job."""
+    try:
+        query, parameters = rankings_for_emails_query(job_id, emails)
+        rankings = query_items(containers[config['database']['ranking_container_name']], query, parameters,
+                               partition_key=str(job_id), operation="fetch_candidate_rankings_for_emails")
+        return rankings_by_email(rankings)
+    except Exception as e:
+        print(f"An error occurred while fetching candidate rankings: {e}")
+        return {}
+
 def fetch_candidate_rankings(job_id):
     try:
         # Include explanation in the query and returned data
-        query = f"SELECT c.candidate_email, c.ranking, c.ranked_at, c.explanation FROM c WHERE c.type = 'ranking' AND c.job_id = '{job_id}'"
-        rankings = list(containers[config['database']['ranking_container_name']].query_items(query=query, enable_cross_partition_query=True))
-        return { (r['candidate_email'] or '').strip().lower(): {
-            'ranking': r['ranking'],
-            'ranked_at': r['ranked_at'],
-            'explanation': r.get('explanation', None)
-        } for r in rankings}
+        query, parameters = candidate_rankings_query(job_id)
+        rankings = query_items(containers[config['database']['ranking_container_name']], query, parameters,
+                               partition_key=str(job_id), operation="fetch_candidate_rankings")
+        return rankings_by_email(rankings)
     except Exception as e:
         print(f"An error occurred while fetching candidate rankings: {e}")
         return {}
 
 def store_candidate_ranking(job_id, candidate_email, ranking, explanation=None):
     try:
-        from datetime import datetime
-        data = {
-            "id": f"{job_id}_{candidate_email}",
-            "type": "ranking",
-            "job_id": job_id,
-            "candidate_email": candidate_email,
-            "ranking": ranking,
-            "ranked_at": datetime.utcnow().isoformat()
-        }
-        if explanation is not None:
-            data["explanation"] = explanation
+        data = ranking_document(job_id, candidate_email, ranking, explanation)
         containers[config['database']['ranking_container_name']].upsert_item(data)
+        _denormalize_ranking_to_application(job_id, candidate_email, ranking, explanation)
         print(f"Stored ranking for job {job_id} and {candidate_email}")
     except Exception as e:
         print(f"Failed to store candidate ranking: {e}")
 
 def update_recruitment_process(job_id, candidate_email, status, additional_info=None):
-    valid_statuses = [
-        "Applied",
-        "Application Under Review",
-        "Interview Invite Sent",
-        "Interview Scheduled",
-        "Interview Feedback Under Review",
-        "Offer Extended",
-        "Rejected",
-        "Withdrawn",
-        "Shortlisted"
-    ]
-
     try:
         print(f"[DEBUG] update_recruitment_process called with job_id={job_id}, candidate_email={candidate_email}, status={status}")
         job_document = containers[config['database']['job_description_container_name']].read_item(item=str(job_id), partition_key=str(job_id))
@@ -391,20 +828,7 @@ def update_recruitment_process(job_id, candidate_email, status, additional_info=
             print(f"[DEBUG] No candidates found for job_id={job_id}")
             return f"Error: No candidates found for job ID {job_id}."
 
-        updated = False
-        for candidate in job_document["candidates"]:
-            print(f"[DEBUG] Checking candidate: {candidate.get('email')} (target: {candidate_email})")
-            if candidate["email"].lower() == candidate_email.lower():
-                print(f"[DEBUG] Found candidate, setting status to {status}")
-                if status in valid_statuses:
-                    candidate["application_status"] = status
-                    candidate["status"] = status
-                    updated = True
-                else:
-                    candidate["application_status"] = "Unknown"
-                    candidate["status"] = "Unknown"
-                    updated = True
-        if updated:
+        if set_recruitment_status(job_document, candidate_email, status):
             print(f"[DEBUG] Saving updated job_document for job_id={job_id}")
             containers[config['database']['job_description_container_name']].replace_item(item=job_document["id"], body=job_document)
             print(f"[DEBUG] Status for {candidate_email} updated to '{status}'")
@@ -426,8 +850,9 @@ def store_application(application_data):
 
 def fetch_application(application_id):
     try:
-        query = f"SELECT * FROM c WHERE c.type = 'application' AND c.id = '{application_id}'"
-        results = list(containers[config['database']['application_container_name']].query_items(query=query, enable_cross_partition_query=True))
+        query, parameters = build_query(where={"type": "application", "id": application_id})
+        results = query_items(containers[config['database']['application_container_name']], query, parameters,
+                              operation="fetch_application")
         return results[0] if results else None
     except Exception as e:
         print(f"An error occurred while fetching application: {e}")
@@ -439,13 +864,15 @@ def store_job_questionnaire(questionnaire_data):
         print(f"Storing questionnaire data for {questionnaire_data['job_id']}")
         containers[config['database']['job_description_questionnaire_container_name']].upsert_item(body=questionnaire_data)
         print(f"Questionnaire data stored successfully for {questionnaire_data['job_id']}")
+        invalidate_ranking_cache(questionnaire_data['job_id'])
     except exceptions.CosmosHttpResponseError as e:
         print(f"Failed to store Questionnaire data: {e}")
 
 def fetch_job_description_questionnaire(job_id):
     try:
-        query = f"SELECT * FROM c WHERE c.type = 'job_questionnaire' AND c.job_id = '{job_id}'"
-        results = list(containers[config['database']['job_description_questionnaire_container_name']].query_items(query=query, enable_cross_partition_query=True))
+        query, parameters = build_query(where={"type": "job_questionnaire", "job_id": str(job_id)})
+        results = query_items(containers[config['database']['job_description_questionnaire_container_name']], query, parameters,
+                              partition_key=str(job_id), operation="fetch_job_description_questionnaire")
         if results:
             print(f"Job description questionnaire fetched successfully for job ID: {job_id}")
             return results[0]
@@ -456,23 +883,21 @@ def fetch_job_description_questionnaire(job_id):
         print(f"An error occurred while fetching job description questionnaire: {e}")
         return None
 
+def fetch_candidates_for_ranking(job_id, emails=None):
+    try:
+        query, parameters = candidates_for_ranking_query(job_id, emails)
+        return query_items(containers[config['database']['application_container_name']], query, parameters,
+                           partition_key=str(job_id), operation="fetch_candidates_for_ranking")
+    except Exception as e:
+        print(f"An error occurred while fetching candidates for ranking: {e}")
+        return []
+
 def fetch_resume_with_email_and_job(job_id, email):
     try:
-        query = """
-        SELECT * 
-        FROM c
-        WHERE IS_DEFINED(c.email) AND c.email = @email AND c.job_id = @job_id AND c.type = 'candidate'
-        """
-        parameters = [
-            {"name": "@email", "value": email},
-            {"name": "@job_id", "value": job_id}
-        ]
+        query, parameters = build_query(where={"email": email, "job_id": str(job_id), "type": "candidate"})
         print(f"Executing query to fetch candidate (type='candidate') for job_id: {job_id}, email: {email}...")
-        candidates = containers[config['database']['application_container_name']].query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        )
+        candidates = query_items(containers[config['database']['application_container_name']], query, parameters,
+                                 partition_key=str(job_id), operation="fetch_resume_with_email_and_job")
         for candidate in candidates:
             print(f"Candidate application fetched successfully! Candidate: {candidate}")
             return candidate  # Return the first matched document
@@ -484,22 +909,11 @@ def fetch_resume_with_email_and_job(job_id, email):
 
 def fetch_resume_with_email(email):
     try:
-        query = """
-        SELECT * 
-        FROM c
-        WHERE IS_DEFINED(c.email) AND c.email = @email AND c.type = 'candidate'
-        """
-        parameters = [
-            {"name": "@email", "value": email}
-        ]
-
+        # Applications are partitioned by job_id, so an email-only lookup must fan out
+        query, parameters = build_query(where={"email": email, "type": "candidate"})
         print(f"Executing query to fetch candidate (type='candidate') for email: {email}...")
-
-        candidates = containers[config['database']['application_container_name']].query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        )
+        candidates = query_items(containers[config['database']['application_container_name']], query, parameters,
+                                 operation="fetch_resume_with_email")
         
         for candidate in candidates:
             print(f"Candidate application fetched successfully! Candidate: {candidate}")
@@ -512,19 +926,12 @@ def fetch_resume_with_email(email):
         print(f"An error occurred while fetching resume: {e}")
         return None
 
-def upsert_github_analysis(candidate_email, github_identifier, analysis_result):
-    """Upsert GitHub analysis for a candidate (by email + github_identifier)"""
+def upsert_github_analysis(candidate_email, github_identifier, analysis_result, watermarks=None):
+    """Upsert GitHub analysis for a candidate (by email + github_identifier).
+    watermarks are the per-repo pushed_at/SHA marks used for incremental refreshes; None drops them."""
     print(f"[DEBUG] Attempting upsert_github_analysis with candidate_email={candidate_email}, github_identifier={github_identifier}")
     print(f"[DEBUG] Analysis result: {repr(analysis_result)[:300]}")
-    item = {
-        "id": f"github_analysis_{candidate_email}_{github_identifier}",
-        "candidate_email": candidate_email,
-        "github_identifier": github_identifier,
-        "type": "github_analysis",
-        "result": analysis_result,
-        "created_at": datetime.utcnow().isoformat(),
-        "email": candidate_email  # for partition key compatibility
-    }
+    item = github_analysis_document(candidate_email, github_identifier, analysis_result, watermarks)
     try:
         containers[config['database']['github_container_name']].upsert_item(item)
         print(f"[INFO] GitHub analysis upserted for candidate_email={candidate_email}, github_identifier={github_identifier}")
@@ -533,19 +940,15 @@ def upsert_github_analysis(candidate_email, github_identifier, analysis_result):
         # If conflict, fetch existing, update, and replace
         if hasattr(e, 'status_code') and e.status_code == 409:
             print(f"[DEBUG] Conflict detected. Attempting to update existing record for candidate_email={candidate_email}, github_identifier={github_identifier}")
-            query = (
-                f"SELECT * FROM c WHERE c.type = 'github_analysis' "
-                f"AND c.candidate_email = '{candidate_email}' "
-                f"AND c.github_identifier = '{github_identifier}'"
-            )
+            query, parameters = github_analysis_query(candidate_email, github_identifier)
             print(f"[DEBUG] Running fallback query: {query}")
-            existing = list(containers[config['database']['github_container_name']].query_items(query=query, enable_cross_partition_query=True))
+            existing = query_items(containers[config['database']['github_container_name']], query, parameters,
+                                   partition_key=candidate_email, operation="upsert_github_analysis")
             print(f"[DEBUG] Fallback query returned {len(existing)} results: {existing}")
             if existing:
                 doc = existing[0]
                 print(f"[DEBUG] Existing doc id: {doc.get('id')}, partition_key: {doc.get('email')}")
-                doc['result'] = analysis_result
-                doc['created_at'] = datetime.utcnow().isoformat()
+                refresh_github_analysis(doc, analysis_result, watermarks)
                 containers[config['database']['github_container_name']].replace_item(item=doc['id'], partition_key=doc['email'], body=doc)
                 print(f"[INFO] Existing GitHub analysis updated for candidate_email={candidate_email}, github_identifier={github_identifier}")
             else:
@@ -553,22 +956,24 @@ def upsert_github_analysis(candidate_email, github_identifier, analysis_result):
         else:
             raise
 
-def fetch_github_analysis_by_candidate(email, github_username):
-    """Fetch GitHub analysis for a candidate (by email + github_identifier). Returns the nested 'result' payload."""
+def fetch_github_analysis_by_candidate(email, github_username, return_full_item=False):
+    """Fetch GitHub analysis for a candidate (by email + github_identifier).
+    Returns the nested 'result' payload, or the whole document when return_full_item is True."""
     try:
-        email_norm = (email or "").strip().lower()
-        user_norm = (github_username or "").strip().lower()
-        query = f"""
-        SELECT * FROM c
-        WHERE c.type = 'github_analysis'
-          AND LOWER(c.candidate_email) = '{email_norm}'
-          AND LOWER(c.github_identifier) = '{user_norm}'
-        """
-        items = list(containers[config['database']['github_container_name']].query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
+        query, parameters, partition_keys = github_analysis_lookup(email, github_username)
+        container = containers[config['database']['github_container_name']]
+        # Try the candidate's partition before fanning out
+        items = []
+        for partition_key in partition_keys:
+            items = query_items(container, query, parameters, partition_key=partition_key,
+                                operation="fetch_github_analysis_by_candidate")
+            if items:
+                break
+        if not items:
+            items = query_items(container, query, parameters, operation="fetch_github_analysis_by_candidate")
         if items:
+            if return_full_item:
+                return items[0]
             return items[0].get("result")  # Return nested result, not wrapper
         return None
     except Exception as e:
@@ -578,11 +983,9 @@ def fetch_github_analysis_by_candidate(email, github_username):
 def fetch_user_settings(user_email):
     """Fetch user settings by email."""
     try:
-        query = f"SELECT * FROM c WHERE c.email = '{user_email}'"
-        items = list(containers[config['database']['users_container_name']].query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
+        query, parameters = build_query(where={"email": user_email})
+        items = query_items(containers[config['database']['users_container_name']], query, parameters,
+                            partition_key=user_email, operation="fetch_user_settings")
         if items:
             return items[0]
         return None
@@ -600,11 +1003,7 @@ def update_user_settings(user_email, settings_data):
             return False
         
         # Update settings fields
-        user['company_name'] = settings_data.get('company_name', user.get('company_name', ''))
-        user['website'] = settings_data.get('website', user.get('website', ''))
-        user['email_notifications'] = settings_data.get('email_notifications', user.get('email_notifications', True))
-        user['application_alerts'] = settings_data.get('application_alerts', user.get('application_alerts', True))
-        user['weekly_digest'] = settings_data.get('weekly_digest', user.get('weekly_digest', False))
+        merge_user_settings(user, settings_data)
         
         # Upsert back to container
         containers[config['database']['users_container_name']].upsert_item(user)
@@ -617,28 +1016,13 @@ def update_user_settings(user_email, settings_data):
 def add_user_feedback(user_email, feedback_data):
     """Add feedback to user's feedback array."""
     try:
-        import uuid
         # Fetch existing user doc
         user = fetch_user_settings(user_email)
         if not user:
             print(f"User not found: {user_email}")
             return False
         
-        # Initialize feedback array if it doesn't exist
-        if 'feedback' not in user:
-            user['feedback'] = []
-        
-        # Create feedback entry with unique ID and timestamp
-        feedback_entry = {
-            'feedback_id': str(uuid.uuid4()),
-            'category': feedback_data.get('category', 'general'),
-            'message': feedback_data.get('message', ''),
-            'created_at': datetime.utcnow().isoformat(),
-            'status': 'new'
-        }
-        
-        # Append to feedback array
-        user['feedback'].append(feedback_entry)
+        feedback_entry = append_feedback(user, feedback_data)
         
         # Upsert back to container
         containers[config['database']['users_container_name']].upsert_item(user)
@@ -651,52 +1035,55 @@ def add_user_feedback(user_email, feedback_data):
 def fetch_candidates_with_github_links():
     """Fetch all candidates with GitHub links from application container."""
     try:
-        query = """
-        SELECT DISTINCT c.email, c.parsed_resume
-        FROM c
-        WHERE c.type = 'candidate'
-          AND (IS_DEFINED(c.parsed_resume.links.github) 
-               OR IS_DEFINED(c.parsed_resume.links.gitHub)
-               OR IS_DEFINED(c.parsed_resume.github))
-        """
-        items = list(containers[config['database']['application_container_name']].query_items(
-            query=query, enable_cross_partition_query=True
-        ))
-        candidates = []
-        for item in items:
-            pr = item.get('parsed_resume', {})
-            if isinstance(pr, str):
-                import json
-                try:
-                    pr = json.loads(pr)
-                except:
-                    pr = {}
-            github = (
-                pr.get('links', {}).get('github')
-                or pr.get('links', {}).get('gitHub')
-                or pr.get('github')
-            )
-            if github:
-                candidates.append({'email': item['email'], 'github': github})
+        items = query_items(containers[config['database']['application_container_name']], GITHUB_LINKS_QUERY,
+                            operation="fetch_candidates_with_github_links")
+        candidates = github_link_candidates(items)
         print(f"[INFO] Found {len(candidates)} candidates with GitHub links")
         return candidates
     except Exception as e:
         print(f"An error occurred while fetching candidates with GitHub links: {e}")
         return []
 
-def fetch_application_by_job_id(job_id):
+def github_candidates_page_query():
+    """Candidate applications projected to what GitHub analysis needs: the email and resume links."""
+    return build_query(
+        select=["email", "candidate_id", "parsed_resume.links", "parsed_resume.github"],
+        where={"type": "candidate"},
+        conditions=["(IS_DEFINED(c.parsed_resume.links) OR IS_DEFINED(c.parsed_resume.github))"]
+    )
+
+def fetch_github_candidates_page(page_size=200, continuation=None):
+    """
+    One page of candidates for the GitHub batch, across all jobs.
+    :return: (candidates, continuation) - continuation is None on the last page
+    :raises ValueError: on a malformed continuation token
+    """
+    query, parameters = github_candidates_page_query()
+    return query_page(containers[config['database']['application_container_name']], query, parameters,
+                      operation="fetch_github_candidates_page", page_size=page_size, continuation=continuation)
+
+def fetch_applications_page(job_id, page_size=100, continuation=None, fields=None):
+    """
+    One page of the candidate application documents for a job.
+    :return: (applications, continuation) - continuation is None on the last page
+    :raises ValueError: on a malformed continuation token
+    """
     try:
-        query = """
-        SELECT * 
-        FROM c
-        WHERE c.type = 'application' AND c.job_id = @job_id
-        """
-        parameters = [{"name": "@job_id", "value": job_id}]
-        results = list(containers[config['database']['application_container_name']].query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
+        query, parameters = applicants_page_query(job_id, fields)
+        return query_page(containers[config['database']['application_container_name']], query, parameters,
+                          partition_key=str(job_id), operation="fetch_applications_page",
+                          page_size=page_size, continuation=continuation)
+    except ValueError:
+        raise
+    except Exception as e:
+        print(f"An error occurred while fetching applications page: {e}")
+        return [], None
+
+def fetch_application_by_job_id(job_id, fields=None):
+    try:
+        query, parameters = build_query(select=fields or "*", where={"type": "application", "job_id": str(job_id)})
+        results = query_items(containers[config['database']['application_container_name']], query, parameters,
+                              partition_key=str(job_id), operation="fetch_application_by_job_id")
 
         if results:
             print(f"Application found for job ID: {job_id}")
@@ -710,12 +1097,7 @@ def fetch_application_by_job_id(job_id):
 
 def create_application_for_job_id(job_id, job_questionnaire_id):
     try:
-        new_application = {
-            "job_id": job_id,
-            "job_questionnaire_id": job_questionnaire_id,
-            "id": f"{job_id}_{job_questionnaire_id}",
-            "type": "application"
-        }
+        new_application = application_document(job_id, job_questionnaire_id)
 
         containers[config['database']['application_container_name']].create_item(body=new_application)
 
@@ -739,50 +1121,17 @@ def save_ranking_data_to_cosmos_db(ranking_data, candidate_email, ranking, conve
             return "Error: Ranking is None."
 
         # --- Save a flat ranking record for UI ---
-        flat_ranking_doc = {
-            "id": f"{ranking_data['job_id']}_{candidate_email}",
-            "type": "ranking",
-            "job_id": ranking_data['job_id'],
-            "candidate_email": candidate_email,
-            "ranking": ranking,
-            "ranked_at": datetime.utcnow().isoformat(),
-        }
+        flat_ranking_doc = ranking_document(ranking_data['job_id'], candidate_email, ranking)
         try:
             containers[config['database']['ranking_container_name']].upsert_item(flat_ranking_doc)
+            _denormalize_ranking_to_application(ranking_data['job_id'], candidate_email, ranking)
             print(f"[DEBUG] Flat ranking doc upserted for UI: {flat_ranking_doc}")
         except Exception as e:
             print(f"[ERROR] Failed to upsert flat ranking doc for UI: {e}")
 
         # --- Retain old logic for backward compatibility ---
-        if "candidates" not in ranking_data:
-            print("[DEBUG] 'candidates' not in ranking_data, initializing empty list.")
-            ranking_data["candidates"] = []
-
-        updated = False
-        for candidate in ranking_data["candidates"]:
-            if candidate["email"].lower() == candidate_email.lower() and candidate.get("job_id") == ranking_data.get("job_id"):
-                print(f"[DEBUG] Updating existing candidate entry for {candidate_email}")
-                candidate["ranking"] = ranking
-                candidate["conversation"] = conversation
-                candidate["resume"] = resume
-                candidate["application_status"] = "Applied"
-                updated = True
-                break
-        print(f"[DEBUG] Candidate updated: {updated}")
-
-        if not updated:
-            print(f"[DEBUG] Appending new candidate entry for {candidate_email}")
-            new_candidate = {
-                "email": candidate_email,
-                "job_id": ranking_data.get("job_id"),
-                "ranking": ranking,
-                "conversation": conversation,
-                "resume": resume,
-                "application_status": "Applied"
-            }
-            ranking_data["candidates"].append(new_candidate)
-        else:
-            print(f"[DEBUG] Did not append new candidate, already updated.")
+        updated = merge_ranking_candidate(ranking_data, candidate_email, ranking, conversation, resume)
+        print(f"[DEBUG] Candidate updated: {updated} (appended a new entry otherwise)")
 
         if "id" in ranking_data:
             print(f"[DEBUG] About to upsert to Cosmos DB: id={ranking_data['id']} candidates_count={len(ranking_data['candidates'])}")
@@ -823,11 +1172,8 @@ def execute_sql_query(query: str):
         return None
 
     try:
-        results = list(containers[config['database']['resumes_container_name']].query_items(
-            query=query,
-            enable_cross_partition_query=True
-        ))
-        return results
+        return query_items(containers[config['database']['resumes_container_name']], query,
+                           operation="execute_sql_query")
     except exceptions.CosmosHttpResponseError as e:
         print(f"Error executing SQL query: {e}")
         return None
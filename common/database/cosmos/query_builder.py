@@ -0,0 +1,248 @@
+"""
+Parameterized Cosmos DB query helpers.
+
+build_query() turns simple equality filters into SQL with bound @params (values
+are never interpolated into the query text). query_items() / query_items_async()
+run a query scoped to a single partition whenever a partition key is given and
+only fall back to a cross-partition fan-out when it is not. Each call adds the
+request-unit (RU) charge Cosmos reports for its own requests (via response_hook)
+to per-operation counters, so expensive queries are visible in get_request_charge_stats().
+query_page() / query_page_async() return a single page plus an opaque continuation
+token for cursor-based pagination.
+"""
+import base64
+import re
+import threading
+
+_FIELD_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+_stats_lock = threading.Lock()
+# operation name -> {"calls", "total_ru", "cross_partition_calls", "items"}
+ru_stats = {}
+
+
+def validate_field(field):
+    """Return the field if it is a plain (optionally dotted) property path, else raise ValueError."""
+    if not isinstance(field, str) or not _FIELD_RE.match(field):
+        raise ValueError(f"Invalid field name: {field!r}")
+    return field
+
+
+def parse_fields(fields, required=("id",)):
+    """
+    Turn a fields= request parameter into a projection list for build_query.
+
+    :param fields: comma-separated string or list of top-level property names, or None
+    :param required: fields that are always projected (prepended when missing)
+    :return: list of field names, or None when no projection was requested
+    """
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    names = []
+    for field in fields:
+        field = (field or "").strip()
+        if not field:
+            continue
+        # Nested paths would come back under their leaf name, so only top-level properties are allowed
+        if "." in validate_field(field):
+            raise ValueError(f"Only top-level fields can be projected: {field!r}")
+        if field not in names:
+            names.append(field)
+    if not names:
+        return None
+    for field in reversed(required):
+        if field not in names:
+            names.insert(0, field)
+    return names
+
+
+def project_item(item, fields):
+    """
+    Keep only the projected fields of an item (used where a query could not project server-side).
+    A dotted field such as "parsed_resume.links" is stored under its last segment, as Cosmos does.
+    """
+    if not fields:
+        return item
+    projected = {}
+    for field in fields:
+        value = item
+        for part in field.split("."):
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            projected[field.rsplit(".", 1)[-1]] = value
+    return projected
+
+
+def encode_continuation(token):
+    """Wrap a Cosmos continuation token (a JSON string) so it is safe to pass around in a URL."""
+    if not token:
+        return None
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii")
+
+
+def decode_continuation(token):
+    """Inverse of encode_continuation; raises ValueError on a malformed token."""
+    if not token:
+        return None
+    try:
+        return base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8")
+    except Exception:
+        raise ValueError("Invalid continuation token")
+
+
+def build_query(select="*", where=None, conditions=None, parameters=None, order_by=None, offset=None, limit=None):
+    """
+    Build a parameterized Cosmos SQL query.
+
+    :param select: "*", "VALUE COUNT(1)" or a list of field names to project
+    :param where: dict of field -> value, rendered as c.<field> = @<param>
+    :param conditions: extra raw conditions that only reference bound @params
+    :param parameters: dict of @param -> value for the raw conditions
+    :param order_by: list of (field, "ASC"|"DESC") tuples
+    :param offset: OFFSET value (requires limit)
+    :param limit: LIMIT value
+    :return: (query, parameters) where parameters is the list the SDK expects
+    """
+    if isinstance(select, (list, tuple)):
+        select_clause = ", ".join(f"c.{validate_field(f)}" for f in select)
+    else:
+        select_clause = select
+    clauses = []
+    params = []
+    for i, (field, value) in enumerate((where or {}).items()):
+        name = f"@p{i}_{validate_field(field).replace('.', '_')}"
+        clauses.append(f"c.{field} = {name}")
+        params.append({"name": name, "value": value})
+    clauses.extend(conditions or [])
+    for name, value in (parameters or {}).items():
+        params.append({"name": name, "value": value})
+
+    query = f"SELECT {select_clause} FROM c"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    if order_by:
+        order_parts = []
+        for field, direction in order_by:
+            direction = direction.upper()
+            if direction not in ("ASC", "DESC"):
+                raise ValueError(f"Invalid sort direction: {direction!r}")
+            order_parts.append(f"c.{validate_field(field)} {direction}")
+        query += " ORDER BY " + ", ".join(order_parts)
+    if limit is not None:
+        query += " OFFSET @offset LIMIT @limit"
+        params.append({"name": "@offset", "value": int(offset or 0)})
+        params.append({"name": "@limit", "value": int(limit)})
+    return query, params
+
+
+class RequestCharge:
+    """
+    response_hook that adds up the RU charge of every request made for one query.
+
+    The SDK calls it with the headers of each page it fetches, so concurrent queries on the
+    shared client cannot see each other's charges (unlike client_connection.last_response_headers).
+    """
+
+    def __init__(self):
+        self.total = 0.0
+
+    def __call__(self, headers, result):
+        # container.query_items also calls the hook once with the pager itself; only responses carry a charge
+        if not isinstance(result, (dict, list)):
+            return
+        try:
+            self.total += float((headers or {}).get("x-ms-request-charge", 0) or 0)
+        except (TypeError, ValueError):
+            pass
+
+
+def record_request_charge(operation, charge, cross_partition=False, items=0):
+    with _stats_lock:
+        stats = ru_stats.setdefault(operation, {"calls": 0, "total_ru": 0.0, "cross_partition_calls": 0, "items": 0})
+        stats["calls"] += 1
+        stats["total_ru"] = round(stats["total_ru"] + charge, 2)
+        stats["items"] += items
+        if cross_partition:
+            stats["cross_partition_calls"] += 1
+
+
+def get_request_charge_stats():
+    """Snapshot of the per-operation RU counters."""
+    with _stats_lock:
+        return {op: dict(stats) for op, stats in ru_stats.items()}
+
+
+def _query_kwargs(parameters, partition_key, max_item_count, charge):
+    kwargs = {"parameters": parameters or None, "response_hook": charge}
+    if partition_key is not None:
+        kwargs["partition_key"] = partition_key
+    else:
+        kwargs["enable_cross_partition_query"] = True
+    if max_item_count is not None:
+        kwargs["max_item_count"] = max_item_count
+    return kwargs
+
+
+def query_items(container, query, parameters=None, partition_key=None, operation="query", max_item_count=None):
+    """Run a query with the synchronous SDK, page by page, and record its RU charge."""
+    items = []
+    charge = RequestCharge()
+    pager = container.query_items(query=query, **_query_kwargs(parameters, partition_key, max_item_count, charge))
+    for page in pager.by_page():
+        items.extend(page)
+    record_request_charge(operation, charge.total, cross_partition=partition_key is None, items=len(items))
+    return items
+
+
+async def query_items_async(container, query, parameters=None, partition_key=None, operation="query", max_item_count=None):
+    """Run a query with the azure.cosmos.aio SDK, page by page, and record its RU charge."""
+    items = []
+    charge = RequestCharge()
+    kwargs = _query_kwargs(parameters, partition_key, max_item_count, charge)
+    # The async SDK fans out across partitions by default and takes no such flag
+    kwargs.pop("enable_cross_partition_query", None)
+    pager = container.query_items(query=query, **kwargs)
+    async for page in pager.by_page():
+        async for item in page:
+            items.append(item)
+    record_request_charge(operation, charge.total, cross_partition=partition_key is None, items=len(items))
+    return items
+
+
+def query_page(container, query, parameters=None, partition_key=None, operation="query", page_size=100, continuation=None):
+    """
+    Fetch one page of results with the synchronous SDK.
+
+    :return: (items, continuation) where continuation is None on the last page
+    """
+    charge = RequestCharge()
+    pager = container.query_items(query=query, **_query_kwargs(parameters, partition_key, page_size, charge))
+    pages = pager.by_page(decode_continuation(continuation))
+    try:
+        items = list(next(pages))
+    except StopIteration:
+        items = []
+    record_request_charge(operation, charge.total, cross_partition=partition_key is None, items=len(items))
+    return items, encode_continuation(pages.continuation_token)
+
+
+async def query_page_async(container, query, parameters=None, partition_key=None, operation="query", page_size=100, continuation=None):
+    """Async counterpart of query_page."""
+    charge = RequestCharge()
+    kwargs = _query_kwargs(parameters, partition_key, page_size, charge)
+    kwargs.pop("enable_cross_partition_query", None)
+    pager = container.query_items(query=query, **kwargs)
+    pages = pager.by_page(decode_continuation(continuation))
+    items = []
+    try:
+        page = await pages.__anext__()
+        async for item in page:
+            items.append(item)
+    except StopAsyncIteration:
+        pass
+    record_request_charge(operation, charge.total, cross_partition=partition_key is None, items=len(items))
+    return items, encode_continuation(pages.continuation_token)
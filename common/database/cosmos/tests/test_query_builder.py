@@ -0,0 +1,155 @@
+import pytest
+
+from common.database.cosmos import query_builder
+from common.database.cosmos.query_builder import (
+    build_query, decode_continuation, encode_continuation, parse_fields, project_item, query_items,
+)
+
+
+def test_select_all_without_filters():
+    assert build_query() == ("SELECT * FROM c", [])
+
+
+def test_where_values_are_bound_not_interpolated():
+    query, parameters = build_query(where={"job_id": "123456", "email": "x' OR 1=1 --"})
+    assert query == "SELECT * FROM c WHERE c.job_id = @p0_job_id AND c.email = @p1_email"
+    assert parameters == [
+        {"name": "@p0_job_id", "value": "123456"},
+        {"name": "@p1_email", "value": "x' OR 1=1 --"},
+    ]
+
+
+def test_projection_and_dotted_fields():
+    query, parameters = build_query(select=["email", "parsed_resume.links"], where={"parsed_resume.name": "Ann"})
+    assert query == "SELECT c.email, c.parsed_resume.links FROM c WHERE c.parsed_resume.name = @p0_parsed_resume_name"
+    assert parameters == [{"name": "@p0_parsed_resume_name", "value": "Ann"}]
+
+
+def test_raw_conditions_with_their_parameters():
+    query, parameters = build_query(
+        where={"type": "candidate"},
+        conditions=["ARRAY_CONTAINS(@emails, c.email)"],
+        parameters={"@emails": ["a@example.com"]},
+    )
+    assert query == "SELECT * FROM c WHERE c.type = @p0_type AND ARRAY_CONTAINS(@emails, c.email)"
+    assert parameters[-1] == {"name": "@emails", "value": ["a@example.com"]}
+
+
+def test_order_by_offset_and_limit():
+    query, parameters = build_query(select="VALUE c.email", order_by=[("ranking_score", "desc"), ("id", "ASC")],
+                                    offset=20, limit=10)
+    assert query == "SELECT VALUE c.email FROM c ORDER BY c.ranking_score DESC, c.id ASC OFFSET @offset LIMIT @limit"
+    assert parameters == [{"name": "@offset", "value": 20}, {"name": "@limit", "value": 10}]
+
+
+def test_limit_without_offset_starts_at_zero():
+    _, parameters = build_query(limit=5)
+    assert parameters == [{"name": "@offset", "value": 0}, {"name": "@limit", "value": 5}]
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"select": ["email; DROP"]},
+    {"where": {"email = 1 OR c.id": "x"}},
+    {"order_by": [("ranking_score", "SIDEWAYS")]},
+    {"order_by": [("1 OR 1", "ASC")]},
+])
+def test_rejects_unsafe_fields_and_directions(kwargs):
+    with pytest.raises(ValueError):
+        build_query(**kwargs)
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields(" , ") is None
+    assert parse_fields("email, name,email") == ["id", "email", "name"]
+    assert parse_fields(["id", "ranking"]) == ["id", "ranking"]
+    with pytest.raises(ValueError):
+        parse_fields("parsed_resume.links")
+
+
+def test_project_item():
+    item = {"id": "1", "email": "a@example.com", "parsed_resume": {}}
+    assert project_item(item, ["id", "email", "missing"]) == {"id": "1", "email": "a@example.com"}
+    assert project_item(item, None) is item
+
+
+def test_project_item_nested_field_uses_the_last_segment():
+    item = {"id": "1", "parsed_resume": {"raw_text": "long", "links": {"github": "gh"}}}
+    assert project_item(item, ["id", "parsed_resume.links"]) == {"id": "1", "links": {"github": "gh"}}
+    assert project_item({"id": "1"}, ["parsed_resume.links"]) == {}
+
+
+def test_continuation_round_trip():
+    token = '{"token":"+RID:~abc==#RT:1","range":{"min":"","max":"FF"}}'
+    encoded = encode_continuation(token)
+    assert "+" not in encoded and "/" not in encoded
+    assert decode_continuation(encoded) == token
+    assert encode_continuation(None) is None
+    with pytest.raises(ValueError):
+        decode_continuation("not base64 é")
+
+
+class FakePager:
+    def __init__(self, pages, charges, hook):
+        self.pages = pages
+        self.charges = charges
+        self.hook = hook
+
+    def by_page(self, continuation=None):
+        for page, charge in zip(self.pages, self.charges):
+            # The SDK calls response_hook with each response's headers as it fetches the page
+            self.hook({"x-ms-request-charge": charge}, {"Documents": page})
+            yield page
+
+
+class FakeContainer:
+    def __init__(self, pages, charges):
+        self.pages = pages
+        self.charges = charges
+        self.calls = []
+
+    def query_items(self, query, **kwargs):
+        self.calls.append((query, kwargs))
+        hook = kwargs["response_hook"]
+        pager = FakePager(self.pages, self.charges, hook)
+        # container.query_items also reports the pager itself, with whatever headers came last
+        hook({"x-ms-request-charge": "99"}, pager)
+        return pager
+
+
+def test_query_items_is_single_partition_when_a_key_is_given(monkeypatch):
+    monkeypatch.setattr(query_builder, "ru_stats", {})
+    container = FakeContainer([[{"id": "1"}], [{"id": "2"}]], ["2.5", "1.25"])
+
+    items = query_items(container, "SELECT * FROM c", [], partition_key="123456", operation="op")
+
+    assert items == [{"id": "1"}, {"id": "2"}]
+    kwargs = container.calls[0][1]
+    assert kwargs["partition_key"] == "123456"
+    assert "enable_cross_partition_query" not in kwargs
+    assert query_builder.ru_stats["op"] == {"calls": 1, "total_ru": 3.75, "cross_partition_calls": 0, "items": 2}
+
+
+def test_query_items_fans_out_without_a_key(monkeypatch):
+    monkeypatch.setattr(query_builder, "ru_stats", {})
+    container = FakeContainer([[]], ["1"])
+
+    query_items(container, "SELECT * FROM c", operation="op")
+
+    assert container.calls[0][1]["enable_cross_partition_query"] is True
+    assert query_builder.ru_stats["op"]["cross_partition_calls"] == 1
+
+
+def test_concurrent_queries_are_charged_separately(monkeypatch):
+    monkeypatch.setattr(query_builder, "ru_stats", {})
+    cheap = FakeContainer([[{"id": "1"}]], ["1"])
+    expensive = FakeContainer([[{"id": "2"}]], ["50"])
+    cheap_pages = cheap.query_items("SELECT * FROM c", **query_builder._query_kwargs(None, "1", None, query_builder.RequestCharge()))
+    expensive_charge = query_builder.RequestCharge()
+    expensive_pages = expensive.query_items("SELECT * FROM c", **query_builder._query_kwargs(None, "2", None, expensive_charge))
+
+    list(expensive_pages.by_page())
+    list(cheap_pages.by_page())
+
+    assert expensive_charge.total == 50.0
+    assert cheap.calls[0][1]["response_hook"].total == 1.0
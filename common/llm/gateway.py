@@ -0,0 +1,392 @@
+"""
+Shared Azure OpenAI gateway.
+
+Every chat completion in the backend goes through chat_completion(), which:
+
+- reuses one AzureOpenAI client per process instead of building a client (and re-reading
+  .env) on every call;
+- wait on a token-bucket limiter covering both requests/min and tokens/min of the deployment;
+- retry 429s after the Retry-After the service asks for (pausing every caller, since the
+  quota is shared), and transient connection/5xx errors with exponential backoff;
+- schedule interactive traffic ahead of batch traffic: batch calls leave a reserve of the
+  per-minute budget untouched and yield while interactive callers are waiting.
+
+Priority is taken from the `priority` argument or, when omitted, from the current context,
+so batch code wraps its work instead of threading a flag through every call:
+
+    with gateway.priority_scope(gateway.BATCH):
+        parse_resume_json(text, links)
+
+chat_completion() blocks while it waits for capacity or backs off, so async code calls it
+through asyncio.to_thread. autogen agents cannot be routed through the limiter; they share
+autogen_config_list().
+Limits come from the `llm:` section of config/config.yaml. They are the deployment's quota,
+not a per-process share: the bucket levels and the 429 pause live in the SQLite file
+llm.rate_limit_db, so every API worker, the ingestion pipeline and the backfill scripts on the
+host draw on one budget. With rate_limit_db unset each process keeps its own buckets, and
+requests_per_minute / tokens_per_minute must then be divided by the number of processes.
+Scheduling interactive calls ahead of batch ones only sees callers in the same process.
+"""
+import contextlib
+import contextvars
+import os
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import openai
+from dotenv import load_dotenv
+from openai import AzureOpenAI
+
+from common.utils.config_utils import load_config
+
+# Always load .env from backend root
+backend_root = Path(__file__).resolve().parent.parent.parent
+load_dotenv(backend_root / ".env")
+
+config = load_config()
+llm_config = (config.get('llm') or {}) if isinstance(config, dict) else {}
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+REQUESTS_PER_MINUTE = float(llm_config.get('requests_per_minute', 300))
+TOKENS_PER_MINUTE = float(llm_config.get('tokens_per_minute', 150000))
+# Share of each per-minute budget that batch traffic may not use
+BATCH_RESERVE_FRACTION = float(llm_config.get('batch_reserve_fraction', 0.25))
+MAX_RETRIES = int(llm_config.get('max_retries', 5))
+BACKOFF_BASE_SECONDS = float(llm_config.get('backoff_base_seconds', 1))
+BACKOFF_MAX_SECONDS = float(llm_config.get('backoff_max_seconds', 60))
+DEFAULT_COMPLETION_TOKENS = int(llm_config.get('default_completion_tokens', 1000))
+REQUEST_TIMEOUT_SECONDS = float(llm_config.get('request_timeout_seconds', 120))
+RATE_LIMIT_DB = llm_config.get('rate_limit_db')
+
+model = os.getenv("deployment_name")
+
+_priority = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextlib.contextmanager
+def priority_scope(priority):
+    """Run the enclosed LLM calls at the given priority (INTERACTIVE or BATCH)."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {priority!r} (expected one of {PRIORITIES})")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+# --- Clients ---
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _client_kwargs():
+    return dict(
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_version=os.getenv("api_version"),
+        max_retries=0,  # retries are handled here so they respect the shared limiter
+        timeout=REQUEST_TIMEOUT_SECONDS,
+    )
+
+
+def get_client():
+    """The process-wide AzureOpenAI client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AzureOpenAI(**_client_kwargs())
+        return _client
+
+
+def autogen_config_list():
+    """config_list for autogen agents, built from the same settings as the clients."""
+    return [{
+        "model": model,
+        "api_key": os.getenv("AZURE_OPENAI_API_KEY"),
+        "base_url": os.getenv("AZURE_OPENAI_ENDPOINT"),
+        "api_type": os.getenv("api_type", "azure"),
+        "api_version": os.getenv("api_version"),
+    }]
+
+
+# --- Rate limiting ---
+
+class TokenBucket:
+    def __init__(self, per_minute, now):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.rate = per_minute / 60.0
+        self.updated = now
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount, floor):
+        """Seconds until amount can be taken while keeping floor in the bucket."""
+        missing = amount + floor - self.level
+        return max(0.0, missing / self.rate) if self.rate else 0.0
+
+
+class SharedLimiterState:
+    """Bucket levels and the 429 pause of a RateLimiter, kept in a SQLite file shared by every process on the host."""
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_rate_limit (
+                    name TEXT PRIMARY KEY,
+                    requests REAL NOT NULL,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    paused_until REAL NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    @contextlib.contextmanager
+    def transaction(self, limiter):
+        """Load the shared state into limiter, run the block and write it back atomically."""
+        conn = None
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            if conn is not None:
+                conn.close()
+            # Fall back to this process's view of the budget rather than failing the LLM call
+            print(f"[WARN] Shared LLM rate limit state unavailable, using the local buckets: {e}")
+            yield
+            return
+        try:
+            row = conn.execute("SELECT requests, tokens, updated, paused_until FROM llm_rate_limit WHERE name = ?",
+                               (self.name,)).fetchone()
+            if row is not None:
+                limiter.requests.level, limiter.tokens.level, updated, limiter.paused_until = row
+                limiter.requests.updated = limiter.tokens.updated = updated
+            yield
+            conn.execute("INSERT OR REPLACE INTO llm_rate_limit (name, requests, tokens, updated, paused_until) VALUES (?, ?, ?, ?, ?)",
+                         (self.name, limiter.requests.level, limiter.tokens.level, limiter.requests.updated, limiter.paused_until))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+class RateLimiter:
+    """
+    Requests/min and tokens/min buckets shared by every caller in the process, or by every
+    process on the host when given a SharedLimiterState.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, batch_reserve_fraction, state=None):
+        self.state = state
+        # Shared state is compared across processes, so it needs wall-clock time
+        self.clock = time.time if state is not None else time.monotonic
+        now = self.clock()
+        self.requests = TokenBucket(requests_per_minute, now)
+        self.tokens = TokenBucket(tokens_per_minute, now)
+        self.batch_reserve_fraction = batch_reserve_fraction
+        self.paused_until = 0.0
+        self.interactive_waiting = 0
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _budget(self):
+        with self.lock:
+            if self.state is None:
+                yield
+            else:
+                with self.state.transaction(self):
+                    yield
+
+    def try_acquire(self, tokens, priority):
+        """Take capacity for one request of ~tokens tokens. Returns 0 on success, else seconds to wait."""
+        if priority == BATCH and self.interactive_waiting:
+            return 0.05
+        with self._budget():
+            now = self.clock()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            # A single request larger than the whole budget would otherwise wait forever
+            tokens = min(tokens, self.tokens.capacity)
+            if priority == BATCH:
+                request_floor = self.requests.capacity * self.batch_reserve_fraction
+                token_floor = self.tokens.capacity * self.batch_reserve_fraction
+            else:
+                request_floor = token_floor = 0.0
+            wait = max(self.requests.wait_for(1, request_floor), self.tokens.wait_for(tokens, token_floor))
+            if wait > 0:
+                return wait
+            self.requests.level -= 1
+            self.tokens.level -= tokens
+            return 0.0
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once the real usage of a request is known."""
+        if actual is None:
+            return
+        with self._budget():
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated - actual)
+
+    def pause(self, seconds):
+        with self._budget():
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+    @contextlib.contextmanager
+    def _waiting(self, priority):
+        if priority != INTERACTIVE:
+            yield
+            return
+        with self.lock:
+            self.interactive_waiting += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.interactive_waiting -= 1
+
+    def acquire(self, tokens, priority):
+        """Block until capacity is available. Returns the seconds spent waiting."""
+        started = time.monotonic()
+        with self._waiting(priority):
+            while True:
+                wait = self.try_acquire(tokens, priority)
+                if not wait:
+                    return time.monotonic() - started
+                time.sleep(min(wait, 1.0))
+
+
+limiter = RateLimiter(
+    REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, BATCH_RESERVE_FRACTION,
+    state=SharedLimiterState(str(backend_root / RATE_LIMIT_DB), model or "default") if RATE_LIMIT_DB else None
+)
+
+_stats_lock = threading.Lock()
+_stats = {p: {"requests": 0, "retries": 0, "rate_limited": 0, "failures": 0, "wait_seconds": 0.0,
+              "prompt_tokens": 0, "completion_tokens": 0} for p in PRIORITIES}
+
+
+def _record(priority, **counts):
+    with _stats_lock:
+        for key, value in counts.items():
+            _stats[priority][key] += value
+
+
+def gateway_stats():
+    with _stats_lock:
+        stats = {p: dict(values) for p, values in _stats.items()}
+    for values in stats.values():
+        values["wait_seconds"] = round(values["wait_seconds"], 3)
+    return stats
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """Rough prompt + completion token estimate (~4 characters per token) used to reserve TPM."""
+    chars = 0
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            chars += sum(len(part.get("text", "")) for part in content if isinstance(part, dict))
+    return chars // 4 + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+def _retry_after_seconds(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    return None
+
+
+def _backoff_seconds(attempt):
+    return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)) * random.uniform(0.8, 1.2)
+
+
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+
+def _prepare(kwargs, priority):
+    kwargs.setdefault("model", model)
+    priority = priority or current_priority()
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority: {priority!r} (expected one of {PRIORITIES})")
+    return priority, estimate_tokens(kwargs.get("messages") or [], kwargs.get("max_tokens"))
+
+
+def _handle_error(error, attempt, priority, max_retries):
+    """Seconds to wait before retrying error, or None to give up."""
+    if attempt >= max_retries:
+        return None
+    if isinstance(error, openai.RateLimitError):
+        delay = _retry_after_seconds(error) or _backoff_seconds(attempt)
+        limiter.pause(delay)
+        _record(priority, rate_limited=1, retries=1)
+        print(f"[WARN] Azure OpenAI rate limited ({priority}); retrying in {delay:.1f}s")
+        return delay
+    if isinstance(error, RETRYABLE_ERRORS):
+        delay = _backoff_seconds(attempt)
+        _record(priority, retries=1)
+        print(f"[WARN] Azure OpenAI request failed ({priority}): {error}; retrying in {delay:.1f}s")
+        return delay
+    return None
+
+
+def _settle(estimated, completion, priority):
+    usage = getattr(completion, "usage", None)
+    if usage is not None:
+        limiter.settle(estimated, getattr(usage, "total_tokens", None))
+        _record(priority, prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0)
+
+
+def chat_completion(priority=None, max_retries=None, **kwargs):
+    """client.chat.completions.create(**kwargs) through the shared limiter, with retries. model defaults to the deployment."""
+    priority, estimated = _prepare(kwargs, priority)
+    max_retries = MAX_RETRIES if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        _record(priority, wait_seconds=limiter.acquire(estimated, priority), requests=1)
+        try:
+            completion = get_client().chat.completions.create(**kwargs)
+        except Exception as e:
+            delay = _handle_error(e, attempt, priority, max_retries)
+            if delay is None:
+                _record(priority, failures=1)
+                raise
+            attempt += 1
+            time.sleep(delay)
+            continue
+        _settle(estimated, completion, priority)
+        return completion
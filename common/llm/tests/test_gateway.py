@@ -0,0 +1,44 @@
+import sqlite3
+
+from common.llm.gateway import BATCH, INTERACTIVE, RateLimiter, SharedLimiterState
+
+
+class LockedConnection:
+    """A connection whose BEGIN IMMEDIATE fails, as when another process holds the lock too long."""
+
+    def __init__(self):
+        self.closed = False
+
+    def execute(self, sql, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+    def close(self):
+        self.closed = True
+
+
+def test_shared_budget_is_spent_across_limiters(tmp_path):
+    path = str(tmp_path / "llm_rate_limit.db")
+    first = RateLimiter(2, 10000, 0.0, state=SharedLimiterState(path, "model"))
+    second = RateLimiter(2, 10000, 0.0, state=SharedLimiterState(path, "model"))
+
+    assert first.try_acquire(10, INTERACTIVE) == 0
+    assert second.try_acquire(10, INTERACTIVE) == 0
+    assert first.try_acquire(10, INTERACTIVE) > 0
+
+
+def test_batch_requests_leave_the_reserve(tmp_path):
+    limiter = RateLimiter(4, 10000, 0.5, state=SharedLimiterState(str(tmp_path / "llm_rate_limit.db"), "model"))
+    assert limiter.try_acquire(10, BATCH) == 0
+    assert limiter.try_acquire(10, BATCH) == 0
+    assert limiter.try_acquire(10, BATCH) > 0
+    assert limiter.try_acquire(10, INTERACTIVE) == 0
+
+
+def test_locked_state_falls_back_and_closes_the_connection(tmp_path, monkeypatch):
+    state = SharedLimiterState(str(tmp_path / "llm_rate_limit.db"), "model")
+    conn = LockedConnection()
+    monkeypatch.setattr(state, "_connect", lambda: conn)
+    limiter = RateLimiter(2, 10000, 0.0, state=state)
+
+    assert limiter.try_acquire(10, INTERACTIVE) == 0
+    assert conn.closed
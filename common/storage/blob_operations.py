@@ -0,0 +1,155 @@
+"""
+Shared Azure Blob Storage access.
+
+One azure.storage.blob.aio client is created lazily per process and reused by every request
+(its aiohttp session keeps connections open), plus one synchronous client for worker threads
+that have no event loop. Downloads are streamed chunk by chunk and can be limited to a byte
+range; uploads are split into blocks and sent with max_concurrency.
+
+The connection string comes from AZURE_STORAGE_CONNECTION_STRING, so pointing it at Azurite
+("UseDevelopmentStorage=true") runs everything locally; ensure_container() creates the
+container there. Settings are read from the `storage:` section of config/config.yaml.
+"""
+import asyncio
+import os
+import re
+import threading
+
+from azure.core.exceptions import ResourceExistsError
+from azure.storage.blob import BlobServiceClient as SyncBlobServiceClient, ContentSettings
+from azure.storage.blob.aio import BlobServiceClient
+
+from common.utils.config_utils import load_config
+
+config = load_config()
+storage_config = (config.get('storage') or {}) if isinstance(config, dict) else {}
+
+RESUME_CONTAINER = storage_config.get('resume_container', 'resumes')
+UPLOAD_MAX_CONCURRENCY = int(storage_config.get('upload_max_concurrency', 4))
+CLIENT_OPTIONS = {
+    "max_single_put_size": int(storage_config.get('max_single_put_size', 4 * 1024 * 1024)),
+    "max_block_size": int(storage_config.get('max_block_size', 4 * 1024 * 1024)),
+    "max_chunk_get_size": int(storage_config.get('max_chunk_get_size', 1024 * 1024)),
+    "max_single_get_size": int(storage_config.get('max_single_get_size', 1024 * 1024)),
+}
+
+_client = None
+_init_lock = None
+_sync_client = None
+_sync_lock = threading.Lock()
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _connection_string():
+    connection_string = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+    if not connection_string:
+        raise RuntimeError("AZURE_STORAGE_CONNECTION_STRING is not set")
+    return connection_string
+
+
+async def get_service_client():
+    """The process-wide async BlobServiceClient, created on first use."""
+    global _client, _init_lock
+    if _client is not None:
+        return _client
+    # The lock is created lazily so it binds to the running event loop
+    if _init_lock is None:
+        _init_lock = asyncio.Lock()
+    async with _init_lock:
+        if _client is None:
+            _client = BlobServiceClient.from_connection_string(_connection_string(), **CLIENT_OPTIONS)
+        return _client
+
+
+def get_sync_service_client():
+    """The process-wide synchronous BlobServiceClient, for worker threads."""
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is None:
+            _sync_client = SyncBlobServiceClient.from_connection_string(_connection_string(), **CLIENT_OPTIONS)
+        return _sync_client
+
+
+async def get_container_client(container=None):
+    return (await get_service_client()).get_container_client(container or RESUME_CONTAINER)
+
+
+async def close_client():
+    """Close the shared clients. Call on application shutdown."""
+    global _client, _sync_client
+    if _client is not None:
+        await _client.close()
+    _client = None
+    with _sync_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+        _sync_client = None
+
+
+async def ensure_container(container=None):
+    """Create the container if it does not exist (e.g. against a fresh Azurite)."""
+    try:
+        await (await get_container_client(container)).create_container()
+    except ResourceExistsError:
+        pass
+
+
+async def upload_bytes(blob_name, data, container=None, content_type=None, overwrite=True, max_concurrency=None):
+    """Upload data (bytes or a readable stream) as blob_name, in parallel blocks when it is large."""
+    container_client = await get_container_client(container)
+    content_settings = ContentSettings(content_type=content_type) if content_type else None
+    await container_client.upload_blob(
+        blob_name, data, overwrite=overwrite, content_settings=content_settings,
+        max_concurrency=max_concurrency or UPLOAD_MAX_CONCURRENCY
+    )
+    return blob_name
+
+
+async def get_blob_properties(blob_name, container=None):
+    """BlobProperties (size, etag, content_settings, ...). Raises ResourceNotFoundError."""
+    container_client = await get_container_client(container)
+    return await container_client.get_blob_client(blob_name).get_blob_properties()
+
+
+async def download_bytes(blob_name, container=None):
+    container_client = await get_container_client(container)
+    downloader = await container_client.download_blob(blob_name)
+    return await downloader.readall()
+
+
+async def stream_blob(blob_name, offset=None, length=None, container=None):
+    """Yield the blob (or length bytes from offset) chunk by chunk as they arrive."""
+    container_client = await get_container_client(container)
+    downloader = await container_client.download_blob(blob_name, offset=offset, length=length)
+    async for chunk in downloader.chunks():
+        yield chunk
+
+
+def download_bytes_sync(blob_name, container=None):
+    """Synchronous download for code running outside the event loop (e.g. ranking workers)."""
+    container_client = get_sync_service_client().get_container_client(container or RESUME_CONTAINER)
+    return container_client.download_blob(blob_name).readall()
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range HTTP Range header against a blob of size bytes.
+    Returns (start, end) inclusive, or None when there is no header.
+    Raises ValueError for unsatisfiable or unsupported (multi-range) requests.
+    """
+    if not header:
+        return None
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        raise ValueError(f"Unsupported Range header: {header}")
+    first, last = match.group(1), match.group(2)
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(f"Range not satisfiable: {header}")
+    return start, end
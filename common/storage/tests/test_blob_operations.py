@@ -0,0 +1,36 @@
+import pytest
+
+from common.storage.blob_operations import parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes=999-999", (999, 999)),
+    (" bytes=0-0 ", (0, 0)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=1000-",         # starts past the end
+    "bytes=500-100",       # end before start
+    "bytes=-",             # neither bound
+    "bytes=0-99,200-299",  # multi-range
+    "items=0-99",
+    "bytes=a-b",
+])
+def test_parse_range_rejects(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_parse_range_of_an_empty_blob():
+    with pytest.raises(ValueError):
+        parse_range("bytes=0-", 0)
@@ -0,0 +1,319 @@
+"""
+Content-addressed cache with pluggable backends.
+
+Keys are SHA-256 digests of everything that determines a result (see make_key), so equal
+inputs share an entry and any change to an input - including a prompt version or model
+name - misses. Values must be JSON-serializable.
+
+Backends:
+- MemoryLRUBackend: per-process OrderedDict, evicts least recently used past max_entries
+- SQLiteBackend: shared file, survives restarts, evicts least recently used past
+  max_entries or max_bytes
+
+Cache chains one or more backends (e.g. memory in front of SQLite), applies a TTL and keeps
+hit/miss/eviction counters. Entries can carry a tag (e.g. "job:<id>") so everything derived
+from a source document can be dropped with Cache.invalidate(tag) when that document changes.
+
+get_cache(name) builds caches from the `cache:` section of config/config.yaml.
+"""
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from common.utils.config_utils import load_config
+
+
+def make_key(*parts):
+    """Stable SHA-256 key for any JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryLRUBackend:
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (value, expires_at, tag) or None."""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            self._items.move_to_end(key)
+            value, expires_at, tag = entry
+            return copy.deepcopy(value), expires_at, tag
+
+    def set(self, key, value, expires_at, tag=None):
+        """Store a value; returns the number of entries evicted to make room."""
+        with self._lock:
+            self._items[key] = (copy.deepcopy(value), expires_at, tag)
+            self._items.move_to_end(key)
+            evicted = 0
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            keys = [k for k, entry in self._items.items() if entry[2] == tag]
+            for k in keys:
+                del self._items[k]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteBackend:
+    def __init__(self, path, max_entries=10000, max_bytes=None, table="cache"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table!r}")
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.table = table
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL,
+                    last_access REAL NOT NULL,
+                    tag TEXT
+                )
+            """)
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if "tag" not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN tag TEXT")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_last_access ON {table} (last_access)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_tag ON {table} (tag)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def get(self, key):
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT value, expires_at, tag FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0]), row[1], row[2]
+        finally:
+            conn.close()
+
+    def set(self, key, value, expires_at, tag=None):
+        payload = json.dumps(value, ensure_ascii=False)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, expires_at, last_access, tag) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, payload, len(payload), expires_at, time.time(), tag)
+            )
+            evicted = self._evict(conn)
+            conn.execute("COMMIT")
+            return evicted
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _evict(self, conn):
+        evicted = 0
+        # Expired entries go first, then least recently used until within the limits
+        evicted += conn.execute(f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at < ?",
+                                (time.time(),)).rowcount
+        count, total = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        while (self.max_entries and count > self.max_entries) or (self.max_bytes and total > self.max_bytes):
+            excess = max(1, count - self.max_entries) if self.max_entries and count > self.max_entries else 1
+            rows = conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_access LIMIT ?", (excess,)).fetchall()
+            if not rows:
+                break
+            conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", [(r[0],) for r in rows])
+            count -= len(rows)
+            total -= sum(r[1] for r in rows)
+            evicted += len(rows)
+        return evicted
+
+    def delete(self, key):
+        conn = self._connect()
+        try:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        finally:
+            conn.close()
+
+    def invalidate_tag(self, tag):
+        conn = self._connect()
+        try:
+            return conn.execute(f"DELETE FROM {self.table} WHERE tag = ?", (tag,)).rowcount
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            conn.execute(f"DELETE FROM {self.table}")
+        finally:
+            conn.close()
+
+    def __len__(self):
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        finally:
+            conn.close()
+
+
+class Cache:
+    """A TTL cache over one or more backends, checked in order; hits are copied to earlier backends."""
+
+    def __init__(self, name, backends, ttl_seconds=None):
+        self.name = name
+        self.backends = list(backends)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.metrics = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0, "invalidated": 0, "errors": 0}
+
+    def _count(self, metric, n=1):
+        with self._lock:
+            self.metrics[metric] += n
+
+    def get(self, key, default=None):
+        for i, backend in enumerate(self.backends):
+            try:
+                entry = backend.get(key)
+            except Exception as e:
+                print(f"[WARN] Cache {self.name} read failed: {e}")
+                self._count("errors")
+                continue
+            if entry is None:
+                continue
+            value, expires_at, tag = entry
+            if expires_at is not None and expires_at < time.time():
+                self._count("expired")
+                try:
+                    backend.delete(key)
+                except Exception as e:
+                    print(f"[WARN] Cache {self.name} delete of an expired entry failed: {e}")
+                    self._count("errors")
+                continue
+            for earlier in self.backends[:i]:
+                try:
+                    self._count("evictions", earlier.set(key, value, expires_at, tag))
+                except Exception as e:
+                    print(f"[WARN] Cache {self.name} promotion failed: {e}")
+                    self._count("errors")
+            self._count("hits")
+            return value
+        self._count("misses")
+        return default
+
+    def set(self, key, value, ttl_seconds=None, tag=None):
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.time() + ttl if ttl else None
+        for backend in self.backends:
+            try:
+                self._count("evictions", backend.set(key, value, expires_at, tag))
+            except Exception as e:
+                print(f"[WARN] Cache {self.name} write failed: {e}")
+                self._count("errors")
+        self._count("sets")
+
+    def delete(self, key):
+        for backend in self.backends:
+            backend.delete(key)
+
+    def clear(self):
+        for backend in self.backends:
+            backend.clear()
+
+    def invalidate(self, tag):
+        """Drop every entry stored with this tag. Returns the number of entries removed."""
+        removed = 0
+        for backend in self.backends:
+            try:
+                removed = max(removed, backend.invalidate_tag(tag))
+            except Exception as e:
+                print(f"[WARN] Cache {self.name} invalidation of {tag} failed: {e}")
+                self._count("errors")
+        self._count("invalidated", removed)
+        return removed
+
+    def get_or_compute(self, key, compute, ttl_seconds=None, tag=None):
+        """Return the cached value for key, or compute, store and return it. None results are not cached."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        value = compute()
+        if value is not None:
+            self.set(key, value, ttl_seconds, tag)
+        return value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.metrics)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def get_cache(name):
+    """
+    Return the named cache, built once per process from config `cache.<name>`:
+    backend ("memory", "sqlite" or "memory+sqlite"), ttl_seconds, max_entries,
+    sqlite_max_entries, sqlite_max_bytes and db_path (default data/cache.db).
+    """
+    with _caches_lock:
+        if name in _caches:
+            return _caches[name]
+        config = load_config()
+        cache_config = (config.get('cache') or {}) if isinstance(config, dict) else {}
+        settings = cache_config.get(name) or {}
+        kinds = str(settings.get('backend', 'memory+sqlite')).split('+')
+        backends = []
+        if 'memory' in kinds:
+            backends.append(MemoryLRUBackend(max_entries=int(settings.get('max_entries', 1000))))
+        if 'sqlite' in kinds:
+            db_path = os.getenv("CACHE_DB") or os.path.join(repo_root, cache_config.get('db_path', 'data/cache.db'))
+            backends.append(SQLiteBackend(db_path, max_entries=int(settings.get('sqlite_max_entries', 10000)),
+                                          max_bytes=settings.get('sqlite_max_bytes'), table=name))
+        ttl = settings.get('ttl_seconds')
+        _caches[name] = Cache(name, backends, ttl_seconds=float(ttl) if ttl else None)
+        return _caches[name]
+
+
+def cache_stats():
+    """Metrics for every cache created in this process."""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {name: cache.stats() for name, cache in caches.items()}
@@ -8,4 +8,15 @@ def load_config(config_file='config/config.yaml'):
     
     with open(config_path, 'r') as file:
         config = yaml.safe_load(file)
-    return config
\ No newline at end of file
+    return config
+
+def server_workers():
+    """Number of API worker processes on this host (WEB_CONCURRENCY, as read by gunicorn; default 1)."""
+    try:
+        return max(1, int(os.getenv("WEB_CONCURRENCY") or 1))
+    except ValueError:
+        return 1
+
+def per_worker(total):
+    """This process's share of a pool size configured for the whole host, at least 1."""
+    return max(1, -(-int(total) // server_workers()))
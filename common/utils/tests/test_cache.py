@@ -0,0 +1,160 @@
+import pytest
+
+from common.utils.cache import Cache, MemoryLRUBackend, SQLiteBackend, make_key
+
+
+class BrokenBackend(MemoryLRUBackend):
+    """Serves reads but fails every write."""
+
+    def set(self, key, value, expires_at, tag=None):
+        raise OSError("disk full")
+
+    def delete(self, key):
+        raise OSError("disk full")
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / "cache.db"))
+
+
+@pytest.fixture
+def backend(make_backend):
+    return make_backend(MemoryLRUBackend, SQLiteBackend, "cache.db")
+
+
+def test_make_key_is_stable_and_input_sensitive():
+    assert make_key("parse", {"b": 1, "a": 2}) == make_key("parse", {"a": 2, "b": 1})
+    assert make_key("parse", "v1") != make_key("parse", "v2")
+
+
+def test_set_and_get(backend, clock):
+    cache = Cache("test", [backend])
+    cache.set("k", {"score": 7})
+    assert cache.get("k") == {"score": 7}
+    assert cache.get("missing", "default") == "default"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_the_ttl(backend, clock):
+    cache = Cache("test", [backend], ttl_seconds=60)
+    cache.set("k", "v")
+    cache.set("forever", "v", ttl_seconds=0)
+
+    clock.now += 59
+    assert cache.get("k") == "v"
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.get("forever") == "v"
+    assert cache.stats()["expired"] == 1
+    assert backend.get("k") is None
+
+
+def test_invalidate_drops_only_the_tag(backend, clock):
+    cache = Cache("test", [backend])
+    cache.set("a", 1, tag="job:1")
+    cache.set("b", 2, tag="job:1")
+    cache.set("c", 3, tag="job:2")
+
+    assert cache.invalidate("job:1") == 2
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryLRUBackend(max_entries=2)
+    backend.set("a", 1, None)
+    backend.set("b", 2, None)
+    backend.get("a")
+    assert backend.set("c", 3, None) == 1
+    assert backend.get("b") is None
+    assert backend.get("a") is not None
+
+
+def test_sqlite_backend_evicts_least_recently_used(tmp_path, clock):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), max_entries=2)
+    backend.set("a", 1, None)
+    clock.now += 1
+    backend.set("b", 2, None)
+    clock.now += 1
+    backend.get("a")
+    clock.now += 1
+
+    assert backend.set("c", 3, None) == 1
+    assert backend.get("b") is None
+    assert backend.get("a") is not None
+    assert len(backend) == 2
+
+
+def test_sqlite_backend_evicts_by_size(tmp_path, clock):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), max_entries=None, max_bytes=25)
+    for key in "abc":
+        backend.set(key, "x" * 10, None)
+        clock.now += 1
+    # Each value is 12 bytes of JSON, so only the two newest fit
+    assert backend.get("a") is None
+    assert backend.get("b") is not None
+    assert backend.get("c") is not None
+
+
+def test_sqlite_backend_drops_expired_entries_first(tmp_path, clock):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), max_entries=2)
+    backend.set("old", 1, clock.now + 10)
+    backend.set("kept", 2, None)
+    clock.now += 20
+    assert backend.set("new", 3, None) == 1
+    assert backend.get("old") is None
+    assert backend.get("kept") is not None
+
+
+def test_sqlite_hit_is_promoted_to_memory(sqlite_backend, clock):
+    memory = MemoryLRUBackend()
+    Cache("test", [sqlite_backend]).set("k", "v", tag="job:1")
+
+    cache = Cache("test", [memory, sqlite_backend])
+    assert memory.get("k") is None
+    assert cache.get("k") == "v"
+    assert memory.get("k") == ("v", None, "job:1")
+
+
+def test_sqlite_backend_is_shared_between_processes(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    Cache("test", [MemoryLRUBackend(), SQLiteBackend(path)]).set("k", "v")
+    assert Cache("test", [MemoryLRUBackend(), SQLiteBackend(path)]).get("k") == "v"
+
+
+def test_get_or_compute_caches_results_but_not_none(clock):
+    cache = Cache("test", [MemoryLRUBackend()])
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"parsed": True}
+
+    assert cache.get_or_compute("k", compute) == {"parsed": True}
+    assert cache.get_or_compute("k", compute) == {"parsed": True}
+    assert len(calls) == 1
+    assert cache.get_or_compute("none", lambda: None) is None
+    assert cache.get("none", "missing") == "missing"
+
+
+def test_backend_write_errors_do_not_raise(sqlite_backend, clock):
+    broken = BrokenBackend()
+    sqlite_backend.set("k", "v", None)
+    cache = Cache("test", [broken, sqlite_backend])
+
+    assert cache.get("k") == "v"  # promotion into the broken backend fails
+    cache.set("other", "v")
+    assert cache.get("other") == "v"
+    assert cache.stats()["errors"] == 3
+
+
+def test_failed_delete_of_an_expired_entry_is_a_miss(clock):
+    broken = BrokenBackend()
+    MemoryLRUBackend.set(broken, "k", "v", clock.now - 1)
+    cache = Cache("test", [broken])
+
+    assert cache.get("k") is None
+    assert cache.stats()["errors"] == 1
@@ -0,0 +1,30 @@
+import time
+
+import pytest
+
+
+class Clock:
+    """Stand-in for time.time that only moves when a test advances it."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    """Builds the in-memory or the SQLite variant of a backend pair; tests using it run once for each."""
+    def make(memory_backend, sqlite_backend, filename="backend.db"):
+        if request.param == "memory":
+            return memory_backend()
+        return sqlite_backend(str(tmp_path / filename))
+    return make
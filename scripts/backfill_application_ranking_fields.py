@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.database.cosmos.db_operations import (
+    containers, config, ensure_application_indexes, fetch_all_jobs, fetch_candidate_rankings,
+    candidate_ranking, ranking_fields
+)
+from common.database.cosmos.query_builder import build_query, query_items
+
+# Copies rankings onto application documents (ranking, ranking_score, ranked_at, explanation)
+# so the top-K listing can sort server-side on the (job_id, ranking_score DESC) composite index.
+def main():
+    ensure_application_indexes()
+    container = containers[config['database']['application_container_name']]
+    jobs = fetch_all_jobs()
+    updated_count = 0
+    for job in jobs:
+        job_id = job.get('job_id') or job.get('id')
+        if not job_id:
+            continue
+        rankings = fetch_candidate_rankings(job_id)
+        query, parameters = build_query(where={"job_id": str(job_id)})
+        applications = query_items(container, query, parameters, partition_key=str(job_id),
+                                   operation="backfill_application_ranking_fields")
+        for app in applications:
+            if app.get('type') == 'application':
+                continue
+            email = (app.get('email') or '').strip().lower()
+            ranking_info = rankings.get(email, {})
+            fields = ranking_fields(
+                candidate_ranking(app, ranking_info),
+                explanation=ranking_info.get('explanation'),
+                ranked_at=ranking_info.get('ranked_at') or app.get('ranked_at')
+            )
+            if fields.get('explanation') is None:
+                fields.pop('explanation', None)
+            if all(app.get(k) == v for k, v in fields.items() if k != 'ranked_at') and 'ranked_at' in app:
+                continue
+            app.update(fields)
+            container.upsert_item(app)
+            print(f"Set ranking_score={fields['ranking_score']} for application {app.get('id')}")
+            updated_count += 1
+    print(f"Backfill complete. Total applications updated: {updated_count}")
+
+if __name__ == "__main__":
+    main()
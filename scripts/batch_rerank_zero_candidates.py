@@ -1,9 +1,12 @@
 """
-Batch script to re-run ranking for all candidates with ranking=0 for all jobs in the database.
+Batch script to re-run ranking for all candidates with ranking=0 (or no explanation) for all jobs in the database.
+Candidates are queued on the ranking job queue and ranked by --workers parallel workers, or with
+--batch scored several per LLM request through the batch scoring engine.
 """
 import sys
 import os
-import time
+import json
+import argparse
 from dotenv import load_dotenv
 
 # Ensure correct sys.path for absolute imports
@@ -14,62 +17,86 @@ sys.path.insert(0, project_root)
 load_dotenv(os.path.join(project_root, '.env'))
 
 from common.database.cosmos import db_operations
-from services.resume_ranking.resume_ranker.multiagent_resume_ranker import initiate_chat
+from services.resume_ranking import ranking_queue
+from services.resume_ranking.resume_ranker.scoring_engine import score_resumes_batch
 
 
-def rerank_candidates_with_zero(job_id):
-    candidates = db_operations.fetch_top_k_candidates_by_count(job_id, top_k=1000)
-    reranked = 0
+def candidates_needing_rerank(job_id):
+    candidates = db_operations.fetch_top_k_candidates_by_count(
+        job_id, top_k=1000, fields=db_operations.CANDIDATE_LIST_FIELDS + ['parsed_resume'])
+    candidates = json.loads(candidates) if isinstance(candidates, str) else candidates
+    needs = []
     for cand in candidates:
-        needs_rerank = cand.get('ranking', 0) == 0 or not cand.get('explanation') or not str(cand.get('explanation')).strip()
-        if needs_rerank:
-            try:
-                job_description = db_operations.fetch_job_description(job_id)
-                job_questionnaire_doc = db_operations.fetch_job_description_questionnaire(job_id)
-                if not job_description or not job_questionnaire_doc:
-                    print(f"[SKIP] Missing job description or questionnaire for job_id {job_id}")
-                    continue
-                questionnaire_id = job_questionnaire_doc['id']
-                questions = job_questionnaire_doc['questionnaire']
-                resume = cand.get('parsed_resume') or cand.get('resume')
-                email = cand.get('email')
-                if not resume or not email:
-                    print(f"[SKIP] Missing resume or email for candidate in job_id {job_id}")
-                    continue
-                result = initiate_chat(job_id, questionnaire_id, resume, job_description, email, questions)
-                import re
-                ranking_score = None
-                explanation = None
-                if isinstance(result, dict):
-                    ranking_score = result.get('ranking')
-                    explanation = result.get('explanation')
-                else:
-                    import re
-                    match = re.search(r"([0-9]+\.?[0-9]*)", str(result))
-                    if match:
-                        ranking_score = float(match.group(1))
-                    explanation = None
-                if explanation and str(explanation).strip():
-                    cand['ranking'] = ranking_score
-                    cand['explanation'] = explanation
-                    db_operations.upsert_candidate(cand)
-                    reranked += 1
-                    print(f"[RERANKED] {email} for job {job_id}: {ranking_score}\nExplanation: {explanation}")
-                else:
-                    print(f"[WARN] Explanation missing for {email} in job {job_id}. Candidate NOT updated.")
-            except Exception as e:
-                print(f"[ERROR] Failed to rerank candidate {cand.get('email')} for job {job_id}: {e}")
-    print(f"[INFO] Reranked {reranked} candidates for job {job_id}")
+        if cand.get('ranking', 0) == 0 or not cand.get('explanation') or not str(cand.get('explanation')).strip():
+            if not cand.get('email'):
+                print(f"[SKIP] Missing email for candidate {cand.get('id')} in job_id {job_id}")
+                continue
+            needs.append(cand)
+    return needs
+
+def enqueue_candidates_with_zero(job_id, candidates, job_questionnaire_doc):
+    for cand in candidates:
+        # force: these candidates were ranked before and need another run
+        ranking_queue.enqueue(job_id, cand['email'], job_questionnaire_doc['id'], force=True,
+                             priority=ranking_queue.BATCH)
+    print(f"[INFO] Queued {len(candidates)} candidates for job {job_id}")
+    return len(candidates)
+
+def batch_score_candidates_with_zero(job_id, candidates, job_questionnaire_doc, batch_size):
+    """Score candidates with stored resume text in batches; queue the rest. Returns how many were queued."""
+    job_description = db_operations.fetch_job_description(job_id)
+    if not job_description:
+        print(f"[SKIP] Missing job description for job_id {job_id}")
+        return 0
+    with_text, without_text = [], []
+    for cand in candidates:
+        parsed_resume = cand.get('parsed_resume')
+        resume_text = parsed_resume.get('raw_text') if isinstance(parsed_resume, dict) else None
+        (with_text if resume_text else without_text).append({"email": cand['email'], "resume": resume_text})
+    try:
+        results = score_resumes_batch(job_id, job_questionnaire_doc['id'], with_text, job_description.get('description', ''),
+                                      job_questionnaire_doc['questionnaire'], batch_size=batch_size)
+    except ValueError as e:
+        print(f"[SKIP] Cannot batch score job_id {job_id}: {e}")
+        return 0
+    for result in results:
+        if result['score'] is None:
+            print(f"[ERROR] Failed to rerank {result['email']} for job {job_id}: {result.get('error')}")
+            without_text.append({"email": result['email']})
+        else:
+            print(f"[RERANKED] {result['email']} for job {job_id}: {result['score']}")
+    # Candidates the batch could not score go through the queue, which can fetch resumes from blob storage
+    return enqueue_candidates_with_zero(job_id, without_text, job_questionnaire_doc) if without_text else 0
 
 def main():
+    parser = argparse.ArgumentParser(description="Re-rank candidates with a zero ranking or no explanation")
+    parser.add_argument("--workers", type=int, default=ranking_queue.MAX_WORKERS, help="Number of candidates ranked in parallel")
+    parser.add_argument("--batch", action="store_true", help="Score several candidates per LLM request")
+    parser.add_argument("--batch-size", type=int, default=None, help="Candidates per request with --batch")
+    args = parser.parse_args()
+
     jobs = db_operations.fetch_all_jobs()
     print(f"Found {len(jobs)} jobs in the database.")
+    total = 0
     for job in jobs:
         job_id = job.get('job_id') or job.get('id')
         if not job_id:
             print(f"[WARN] Job missing job_id: {job}")
             continue
-        rerank_candidates_with_zero(job_id)
+        job_questionnaire_doc = db_operations.fetch_job_description_questionnaire(job_id)
+        if not job_questionnaire_doc:
+            print(f"[SKIP] Missing questionnaire for job_id {job_id}")
+            continue
+        candidates = candidates_needing_rerank(job_id)
+        if not candidates:
+            continue
+        if args.batch:
+            total += batch_score_candidates_with_zero(job_id, candidates, job_questionnaire_doc, args.batch_size)
+        else:
+            total += enqueue_candidates_with_zero(job_id, candidates, job_questionnaire_doc)
+    if total:
+        counts = ranking_queue.run_until_idle(max_workers=args.workers)
+        print(f"[INFO] Ranking queue drained: {counts}")
     print("Batch reranking complete.")
 
 if __name__ == "__main__":
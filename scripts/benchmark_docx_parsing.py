@@ -0,0 +1,87 @@
+"""
+Benchmark DOCX extraction over a directory of sample resumes.
+
+Compares the legacy render-then-parse path (doc_parser.docx_to_pdf into a temporary PDF, then
+parse_pdf) with the native walker (doc_parser.parse_doc_bytes). Prints the best time of
+--repeat runs per file, the extracted characters and links for each path, and the totals
+and overall speedup.
+
+Usage:
+    python scripts/benchmark_docx_parsing.py path/to/resumes --repeat 5
+"""
+import sys
+import os
+import io
+import argparse
+import contextlib
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.resume_parser.parser.doc_parser import docx_to_pdf, parse_doc_bytes
+from services.resume_parser.parser.pdf_parser import parse_pdf
+
+
+def legacy_extract(docx_path):
+    fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    try:
+        docx_to_pdf(docx_path, pdf_path)
+        return parse_pdf(pdf_path)
+    finally:
+        os.remove(pdf_path)
+
+
+def native_extract(docx_path):
+    with open(docx_path, 'rb') as f:
+        return parse_doc_bytes(f.read())
+
+
+def best_of(fn, path, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        # Both parsers print debug lines; keep them out of the timing and the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = fn(path)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark legacy vs native DOCX extraction")
+    parser.add_argument("corpus_dir", help="Directory containing .docx resumes")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per file; the best time is reported")
+    args = parser.parse_args()
+
+    files = sorted(os.path.join(args.corpus_dir, name) for name in os.listdir(args.corpus_dir)
+                   if name.lower().endswith('.docx'))
+    if not files:
+        print(f"[ERROR] No .docx files found in {args.corpus_dir}")
+        return
+
+    totals = {"legacy": 0.0, "native": 0.0}
+    print(f"{'file':40} {'legacy ms':>10} {'chars':>7} {'links':>5} {'native ms':>10} {'chars':>7} {'links':>5}")
+    for path in files:
+        timings, row = {}, []
+        for name, fn in (("legacy", legacy_extract), ("native", native_extract)):
+            try:
+                elapsed, (text, links) = best_of(fn, path, max(1, args.repeat))
+            except Exception as e:
+                print(f"[ERROR] {name} extraction failed for {path}: {e}")
+                break
+            timings[name] = elapsed
+            row.append(f"{elapsed * 1000:>10.1f} {len(text):>7} {len(links):>5}")
+        if len(timings) == len(totals):
+            for name, elapsed in timings.items():
+                totals[name] += elapsed
+            print(f"{os.path.basename(path)[:40]:40} " + " ".join(row))
+
+    print(f"\nFiles: {len(files)}")
+    print(f"Total legacy: {totals['legacy'] * 1000:.1f} ms, native: {totals['native'] * 1000:.1f} ms")
+    if totals['native'] > 0:
+        print(f"Speedup: {totals['legacy'] / totals['native']:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Round-trip check of common/storage/blob_operations against the configured storage account.
+
+Meant for Azurite: start it (e.g. `docker run -p 10000:10000 mcr.microsoft.com/azure-storage/azurite
+azurite-blob --blobHost 0.0.0.0`) and run with AZURE_STORAGE_CONNECTION_STRING=UseDevelopmentStorage=true.
+Uploads a multi-block blob, reads it back whole, streamed and by byte range, then deletes it.
+"""
+import sys
+import os
+import asyncio
+import argparse
+import uuid
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+from dotenv import load_dotenv
+load_dotenv(os.path.join(project_root, '.env'))
+
+from common.storage import blob_operations
+
+
+async def check(container, size):
+    await blob_operations.ensure_container(container)
+    blob_name = f"check-{uuid.uuid4().hex}.bin"
+    data = os.urandom(size)
+    try:
+        await blob_operations.upload_bytes(blob_name, data, container=container, content_type="application/octet-stream")
+        properties = await blob_operations.get_blob_properties(blob_name, container=container)
+        assert properties.size == size, f"size {properties.size} != {size}"
+
+        assert await blob_operations.download_bytes(blob_name, container=container) == data, "full download differs"
+
+        chunks = [chunk async for chunk in blob_operations.stream_blob(blob_name, container=container)]
+        assert b"".join(chunks) == data, "streamed download differs"
+        print(f"[INFO] Streamed {size} bytes in {len(chunks)} chunks")
+
+        for header in ("bytes=0-99", f"bytes={size // 2}-", "bytes=-100"):
+            start, end = blob_operations.parse_range(header, size)
+            chunks = [chunk async for chunk in blob_operations.stream_blob(
+                blob_name, offset=start, length=end - start + 1, container=container)]
+            assert b"".join(chunks) == data[start:end + 1], f"range {header} differs"
+            print(f"[INFO] Range {header} -> bytes {start}-{end} OK")
+        print("Blob storage check passed")
+    finally:
+        container_client = await blob_operations.get_container_client(container)
+        await container_client.delete_blob(blob_name)
+        await blob_operations.close_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-trip check of the blob storage module")
+    parser.add_argument("--container", default="blob-check", help="Container to use (created if missing)")
+    parser.add_argument("--size", type=int, default=10 * 1024 * 1024, help="Bytes to upload")
+    args = parser.parse_args()
+    asyncio.run(check(args.container, args.size))
+
+if __name__ == "__main__":
+    main()
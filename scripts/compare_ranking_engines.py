@@ -0,0 +1,69 @@
+"""
+Compare the single-call scoring engine against the multi-agent GroupChat on a job's candidates.
+Prints score, latency and tokens per resume for each engine, plus averages.
+Both engines run with store=False, so stored rankings are left untouched.
+"""
+import sys
+import os
+import json
+import argparse
+from dotenv import load_dotenv
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+load_dotenv(os.path.join(project_root, '.env'))
+
+from common.database.cosmos import db_operations
+from services.resume_ranking.resume_ranker.scoring_engine import rank_resume, ENGINES
+
+
+def compare(job_id, limit, engines):
+    job_description = db_operations.fetch_job_description(job_id)
+    job_questionnaire_doc = db_operations.fetch_job_description_questionnaire(job_id)
+    if not job_description or not job_questionnaire_doc:
+        print(f"[ERROR] Missing job description or questionnaire for job_id {job_id}")
+        return
+    job_description_text = job_description.get('description', '')
+    candidates = db_operations.fetch_top_k_candidates_by_count(
+        job_id, top_k=limit, fields=db_operations.CANDIDATE_LIST_FIELDS + ['parsed_resume'])
+    candidates = json.loads(candidates) if isinstance(candidates, str) else candidates
+
+    totals = {engine: {"runs": 0, "latency": 0.0, "tokens": 0} for engine in engines}
+    print(f"{'candidate':40} " + " ".join(f"{engine + ' score':>18} {'latency':>8} {'tokens':>7}" for engine in engines))
+    for cand in candidates:
+        email = cand.get('email')
+        parsed_resume = cand.get('parsed_resume')
+        resume_text = parsed_resume.get('raw_text') if isinstance(parsed_resume, dict) else None
+        if not email or not resume_text:
+            continue
+        row = []
+        for engine in engines:
+            result = rank_resume(job_id, job_questionnaire_doc['id'], resume_text, job_description_text, email,
+                                 job_questionnaire_doc['questionnaire'], engine=engine, store=False,
+                                 use_cache=False) or {}
+            tokens = (result.get('usage') or {}).get('total_tokens', 0)
+            row.append(f"{str(result.get('score')):>18} {result.get('latency_seconds', 0):>8.2f} {tokens:>7}")
+            if result:
+                totals[engine]["runs"] += 1
+                totals[engine]["latency"] += result.get('latency_seconds', 0)
+                totals[engine]["tokens"] += tokens
+        print(f"{email:40} " + " ".join(row))
+
+    print("\nAverages per resume:")
+    for engine, t in totals.items():
+        if t["runs"]:
+            print(f"  {engine:12} runs={t['runs']} latency={t['latency'] / t['runs']:.2f}s tokens={t['tokens'] / t['runs']:.0f}")
+        else:
+            print(f"  {engine:12} no successful runs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ranking engines on a job's candidates")
+    parser.add_argument("job_id", help="Job ID whose candidates are scored")
+    parser.add_argument("--limit", type=int, default=5, help="Number of candidates to score")
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=ENGINES)
+    args = parser.parse_args()
+    compare(args.job_id, args.limit, args.engines)
+
+if __name__ == "__main__":
+    main()
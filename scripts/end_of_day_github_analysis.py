@@ -1,67 +1,101 @@
 """
 End-of-day GitHub analysis script.
-- Scans all candidate applications.
-- Extracts GitHub links from both resume JSON and raw text.
-- For each candidate with a GitHub link:
-    - If a github_analysis record exists for (email, github_username) and is <6 months old, skip.
-    - If not, or if older than 6 months, run GitHub analysis and update the record.
-- Logs all actions and outputs a summary.
+- Streams candidate applications page by page, projected to email and resume links only.
+- Each email is handled once, by a bounded pool of workers:
+    - If the github_analysis record for (email, github_username) carries per-repo watermarks,
+      refresh it incrementally: only repos pushed since the watermark are re-counted and only
+      repos with new commits by the candidate get a new LLM insight.
+    - Records without watermarks keep the old rule: skip if <6 months old, otherwise run a full
+      analysis, which stores watermarks for the incremental runs that follow.
+- Every finished email is appended to a checkpoint file; rerunning with the same checkpoint
+  (the default within a day) resumes an interrupted run. Failures are not checkpointed, so
+  they are retried.
+- Progress goes to stdout and a dated log file; the final summary is written as JSON.
+
+Usage:
+    python scripts/end_of_day_github_analysis.py [--workers 4] [--checkpoint PATH] [--summary PATH]
 """
+import argparse
 import json
+import os
 import re
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
-from common.database.cosmos.db_operations import ensure_containers, fetch_github_analysis_by_candidate, upsert_github_analysis
-from services.github_analysis.analyze_github import analyze_github_profile
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from common.database.cosmos.db_operations import fetch_github_candidates_page, fetch_github_analysis_by_candidate, upsert_github_analysis
+from common.utils.config_utils import load_config
+from services.github_analysis import github_client
+from services.github_analysis.analyze_github import refresh_github_profile
+
+config = load_config()
+github_config = (config.get('github') or {}) if isinstance(config, dict) else {}
+
+logs_dir = os.path.join(project_root, 'logs')
+
 
 # --- Logging Setup ---
-import os
-log_date = datetime.now().strftime('%Y%m%d')
-logs_dir = os.path.join(os.path.dirname(__file__), '../logs')
-os.makedirs(logs_dir, exist_ok=True)
-log_path = os.path.join(logs_dir, f'end_of_day_github_analysis_{log_date}.log')
 class TeeLogger:
     def __init__(self, logfile):
         self.terminal = sys.stdout
         self.log = open(logfile, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
     def write(self, message):
-        self.terminal.write(message)
-        self.log.write(message)
+        with self._lock:
+            self.terminal.write(message)
+            self.log.write(message)
     def flush(self):
-        self.terminal.flush()
-        self.log.flush()
-sys.stdout = TeeLogger(log_path)
+        with self._lock:
+            self.terminal.flush()
+            self.log.flush()
 # --- End Logging Setup ---
 
-def extract_github_link(resume):
-    """Extract GitHub link from resume JSON or raw text."""
-    if not resume:
-        return None
-    github = None
-    # Try JSON parsing if not already dict
-    resume_json = None
-    if isinstance(resume, dict):
-        resume_json = resume
-    else:
-        try:
-            resume_json = json.loads(resume)
-        except Exception:
-            resume_json = None
-    # Flexible extraction from JSON
-    if resume_json:
-        github = (
-            resume_json.get('github') or resume_json.get('gitHub') or resume_json.get('GitHub') or
-            (resume_json.get('links', {}) or resume_json.get('links') or resume_json.get('Links', {})).get('github') or
-            (resume_json.get('links', {}) or resume_json.get('links') or resume_json.get('Links', {})).get('gitHub') or
-            (resume_json.get('links', {}) or resume_json.get('links') or resume_json.get('Links', {})).get('GitHub')
-        )
-        if github:
-            return github
-    # Fallback: extract from raw text
-    text = resume if isinstance(resume, str) else json.dumps(resume_json or {})
-    github_regex = r"https?://(?:www\\.)?github\\.com/[A-Za-z0-9_.-]+(?:/[A-Za-z0-9_.-]+)?"
-    matches = re.findall(github_regex, text)
-    return matches[0] if matches else None
+
+def candidate_key(email, candidate_id):
+    """Normalized identity of a candidate: lowercased email, or candidate_id when there is no email."""
+    return (email or candidate_id or "").strip().lower()
+
+
+class Checkpoint:
+    """Append-only JSON-lines record of candidates (by candidate_key) already handled in this run."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn final line from a crash
+                    self.done[entry.get('key') or candidate_key(entry.get('email'), entry.get('candidate_id'))] = entry
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def seen(self, key):
+        return key in self.done
+
+    def record(self, outcome):
+        with self._lock:
+            self.done[outcome['key']] = outcome
+            self._file.write(json.dumps(outcome) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def github_link(candidate):
+    """GitHub link from the projected resume links (links.github/gitHub/GitHub or a top-level github)."""
+    links = candidate.get('links') if isinstance(candidate.get('links'), dict) else {}
+    return candidate.get('github') or links.get('github') or links.get('gitHub') or links.get('GitHub')
 
 def extract_github_username(github_url):
     if not github_url:
@@ -85,76 +119,125 @@ def is_analysis_recent(analysis_doc):
     except Exception:
         return False
 
-def main():
-    containers = ensure_containers()
-    container = containers['applications']
-    # Fetch all application documents
-    candidates = list(container.query_items(query="SELECT * FROM c", enable_cross_partition_query=True))
-    analyzed, skipped, failed = 0, 0, 0
-    summary = []
-    processed_emails = set()
-    for cand in candidates:
-        email = cand.get('email')
-        candidate_id = cand.get('candidate_id')
-        cand_type = cand.get('type')
-        parsed_resume = cand.get('parsed_resume')
-        resume = cand.get('resume')
-        # Only process if type == 'candidate' and email or candidate_id is present
-        if cand_type != 'candidate' or (not email and not candidate_id):
-            continue
-        # Only process each email once
-        if email in processed_emails:
-            continue
-        # Prefer parsed_resume, fallback to resume
-        github_url, source = None, None
-        if parsed_resume:
-            github_url = extract_github_link(parsed_resume)
-            if github_url:
-                source = 'parsed_resume'
-        if not github_url and resume:
-            github_url = extract_github_link(resume)
-            if github_url:
-                source = 'resume'
-        if not github_url:
-            continue
-        summary.append({
-            'email': email,
-            'candidate_id': candidate_id,
-            'github_url': github_url,
-            'source': source
-        })
-        github_username = extract_github_username(github_url)
-        print(f"[DEBUG] Candidate: {email or candidate_id} | GitHub URL: {github_url} | Extracted Username: {github_username}")
-        if not github_username:
-            print(f"[WARN] Could not extract username from {github_url} for {email or candidate_id}")
-            continue
-        # Recency check: only analyze if missing or stale
+
+def iter_candidates(page_size):
+    """Yield (email, candidate_id, github_url) for each projected candidate, one page at a time."""
+    continuation = None
+    while True:
+        page, continuation = fetch_github_candidates_page(page_size=page_size, continuation=continuation)
+        for candidate in page:
+            yield candidate.get('email'), candidate.get('candidate_id'), github_link(candidate)
+        if not continuation:
+            break
+
+
+def process_candidate(email, candidate_id, github_url):
+    """Analyze one candidate; returns an outcome dict for the checkpoint and summary."""
+    started = time.perf_counter()
+    outcome = {"key": candidate_key(email, candidate_id), "email": email, "candidate_id": candidate_id,
+               "github_url": github_url}
+    github_username = extract_github_username(github_url)
+    outcome["github_username"] = github_username
+    if not github_username:
+        print(f"[WARN] Could not extract username from {github_url} for {email or candidate_id}")
+        return dict(outcome, status="no_username")
+    try:
+        # Incremental refresh when watermarks exist; otherwise only analyze if missing or stale
         analysis_doc = fetch_github_analysis_by_candidate(email, github_username, return_full_item=True)
-        recent = is_analysis_recent(analysis_doc)
-        print(f"[DEBUG] Analysis recent for {email or candidate_id} ({github_username}): {recent}")
-        if recent:
-            skipped += 1
+        incremental = bool(analysis_doc and analysis_doc.get('watermarks'))
+        if not incremental and is_analysis_recent(analysis_doc):
             print(f"[SKIP] Recent analysis exists for {email or candidate_id} ({github_username})")
-            processed_emails.add(email)
-            continue
-        try:
-            print(f"[ANALYZE] Running GitHub analysis for {email or candidate_id} ({github_username})...")
-            analysis_result = analyze_github_profile(github_username, email)
-            upsert_github_analysis(email, github_username, analysis_result)
-            analyzed += 1
-            print(f"[DONE] Analysis complete for {email or candidate_id} ({github_username})")
-            processed_emails.add(email)
-        except Exception as e:
-            failed += 1
-            print(f"[FAIL] Analysis failed for {email or candidate_id} ({github_username}): {e}")
-    print("\n=== GitHub Link Extraction Summary ===")
-    for entry in summary:
-        print(f"Candidate: {entry['email'] or entry['candidate_id']} | GitHub: {entry['github_url']} | Source: {entry['source']}")
-    print(f"Total candidates with GitHub links: {len(summary)}")
+            return dict(outcome, status="skipped")
+        print(f"[ANALYZE] Running {'incremental' if incremental else 'full'} GitHub analysis for {email or candidate_id} ({github_username})...")
+        analysis_result, watermarks = refresh_github_profile(github_username, email, previous=analysis_doc if incremental else None)
+        upsert_github_analysis(email, github_username, analysis_result, watermarks=watermarks)
+        print(f"[DONE] Analysis complete for {email or candidate_id} ({github_username})")
+        return dict(outcome, status="incremental" if incremental else "analyzed",
+                    seconds=round(time.perf_counter() - started, 2))
+    except Exception as e:
+        print(f"[FAIL] Analysis failed for {email or candidate_id} ({github_username}): {e}")
+        return dict(outcome, status="failed", error=str(e), seconds=round(time.perf_counter() - started, 2))
+
+
+def run(workers, checkpoint_path, page_size):
+    checkpoint = Checkpoint(checkpoint_path)
+    counts = {"analyzed": 0, "incremental": 0, "skipped": 0, "no_username": 0, "failed": 0,
+              "resumed": 0, "duplicates": 0, "without_github": 0}
+    failures = []
+    seen = set()
+    started = time.perf_counter()
+
+    def finish(future):
+        outcome = future.result()
+        counts[outcome["status"]] += 1
+        if outcome["status"] == "failed":
+            failures.append(outcome)
+        else:
+            checkpoint.record(dict(outcome, at=time.time()))
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for email, candidate_id, github_url in iter_candidates(page_size):
+                key = candidate_key(email, candidate_id)
+                if not key:
+                    continue
+                if not github_url:
+                    counts["without_github"] += 1
+                    continue
+                if key in seen:
+                    counts["duplicates"] += 1
+                    continue
+                seen.add(key)
+                if checkpoint.seen(key):
+                    counts["resumed"] += 1
+                    continue
+                # Keep a bounded number of candidates queued so paging stays ahead of the workers
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        finish(future)
+                pending.add(pool.submit(process_candidate, email, candidate_id, github_url))
+            for future in wait(pending).done:
+                finish(future)
+    finally:
+        checkpoint.close()
+
+    client = github_client.get_client()
+    return {
+        "date": datetime.utcnow().isoformat(),
+        "elapsed_seconds": round(time.perf_counter() - started, 1),
+        "workers": workers,
+        "checkpoint": checkpoint_path,
+        "candidates_with_github": len(seen),
+        "counts": counts,
+        "github_api": dict(client.stats, rate_limit_remaining=client.remaining),
+        "failures": failures,
+    }
+
+
+def main():
+    log_date = datetime.now().strftime('%Y%m%d')
+    parser = argparse.ArgumentParser(description="Nightly GitHub analysis of every candidate with a GitHub link")
+    parser.add_argument("--workers", type=int, default=int(github_config.get('batch_workers', 4)),
+                        help="Candidates analyzed concurrently")
+    parser.add_argument("--page-size", type=int, default=int(github_config.get('batch_page_size', 200)))
+    parser.add_argument("--checkpoint", default=os.path.join(project_root, 'data', f'github_analysis_checkpoint_{log_date}.jsonl'),
+                        help="Checkpoint file; reuse it to resume an interrupted run")
+    parser.add_argument("--summary", default=os.path.join(logs_dir, f'end_of_day_github_analysis_{log_date}.json'),
+                        help="Where to write the JSON summary")
+    args = parser.parse_args()
+
+    os.makedirs(logs_dir, exist_ok=True)
+    sys.stdout = TeeLogger(os.path.join(logs_dir, f'end_of_day_github_analysis_{log_date}.log'))
+
+    summary = run(args.workers, args.checkpoint, args.page_size)
+    os.makedirs(os.path.dirname(args.summary) or ".", exist_ok=True)
+    with open(args.summary, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
     print("\n=== End-of-Day GitHub Analysis Summary ===")
-    print(f"Analyzed: {analyzed}")
-    print(f"Skipped (recent): {skipped}")
-    print(f"Failed: {failed}")
+    print(json.dumps({k: summary[k] for k in ("elapsed_seconds", "candidates_with_github", "counts", "github_api")}, indent=2))
+    print(f"Summary written to {args.summary}")
     print("=== Done ===")
 
 if __name__ == "__main__":
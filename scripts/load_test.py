@@ -0,0 +1,201 @@
+"""
+Load test for the API across gunicorn worker counts.
+
+For each worker count the script starts gunicorn with that many uvicorn workers on a local
+port, waits for /health, drives it with --concurrency concurrent clients for --duration
+seconds and stops it again. It prints the throughput, latency percentiles and errors of every
+run and the speedup over the smallest worker count, so scaling from 1 to 8 workers can be
+checked in one command.
+
+Modes:
+- http: GET --path in a loop (default /health).
+- chat: open /ws/chat/<new session>, send --message and wait for the final frame. With
+  --reconnect the client drops the socket after the first frame and resumes on a new
+  connection with ?lastSeq=, which may land on any worker.
+
+Pass --url to test a server that is already running instead of starting one.
+
+Usage:
+    python scripts/load_test.py --workers 1,2,4,8 --concurrency 64 --duration 20
+    python scripts/load_test.py --mode chat --message "top 5 for job 123456" --reconnect --workers 1,4
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import aiohttp
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def http_client(session, url, deadline, result):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            async with session.get(url) as response:
+                await response.read()
+                if response.status >= 400:
+                    result["errors"] += 1
+                    continue
+        except Exception:
+            result["errors"] += 1
+            continue
+        result["latencies"].append(time.perf_counter() - started)
+
+
+async def read_until_final(ws, last_seq, stop_after_first=False):
+    """Read frames until the turn's final frame; returns (last seq seen, finished)."""
+    async for message in ws:
+        if message.type != aiohttp.WSMsgType.TEXT:
+            break
+        frame = json.loads(message.data)
+        if "seq" not in frame:
+            continue  # connection confirmation and pings
+        last_seq = max(last_seq, frame["seq"])
+        if frame.get("isProcessing") is False:
+            return last_seq, True
+        if stop_after_first:
+            return last_seq, False
+    return last_seq, False
+
+
+async def chat_client(session, ws_url, message, reconnect, deadline, result):
+    while time.perf_counter() < deadline:
+        session_id = f"loadtest-{uuid.uuid4()}"
+        started = time.perf_counter()
+        try:
+            async with session.ws_connect(f"{ws_url}/ws/chat/{session_id}") as ws:
+                await ws.send_str(json.dumps({"type": "text", "content": message}))
+                last_seq, finished = await read_until_final(ws, 0, stop_after_first=reconnect)
+            if not finished:
+                async with session.ws_connect(f"{ws_url}/ws/chat/{session_id}?lastSeq={last_seq}") as ws:
+                    last_seq, finished = await read_until_final(ws, last_seq)
+                result["resumed"] += 1
+        except Exception:
+            result["errors"] += 1
+            continue
+        if not finished:
+            result["errors"] += 1
+            continue
+        result["latencies"].append(time.perf_counter() - started)
+
+
+async def drive(args, base_url):
+    result = {"latencies": [], "errors": 0, "resumed": 0}
+    deadline = time.perf_counter() + args.duration
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        if args.mode == "chat":
+            ws_url = base_url.replace("http://", "ws://").replace("https://", "wss://")
+            clients = [chat_client(session, ws_url, args.message, args.reconnect, deadline, result)
+                       for _ in range(args.concurrency)]
+        else:
+            clients = [http_client(session, f"{base_url}{args.path}", deadline, result)
+                       for _ in range(args.concurrency)]
+        started = time.perf_counter()
+        await asyncio.gather(*clients)
+        elapsed = time.perf_counter() - started
+    latencies = result["latencies"]
+    return {
+        "completed": len(latencies),
+        "errors": result["errors"],
+        "resumed": result["resumed"],
+        "per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+async def wait_until_ready(base_url, timeout):
+    deadline = time.perf_counter() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() < deadline:
+            try:
+                async with session.get(f"{base_url}/health") as response:
+                    if response.status == 200:
+                        return True
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    return False
+
+
+def start_server(workers, port):
+    command = ["gunicorn", "-k", "uvicorn.workers.UvicornWorker", "services.api.main:app",
+               "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--timeout", "120"]
+    return subprocess.Popen(command, cwd=project_root, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_for_workers(args, workers):
+    process = start_server(workers, args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        if not asyncio.run(wait_until_ready(base_url, args.startup_timeout)):
+            print(f"[ERROR] Server with {workers} workers did not become ready")
+            return None
+        if args.warmup:
+            asyncio.run(drive(argparse.Namespace(**dict(vars(args), duration=args.warmup)), base_url))
+        return asyncio.run(drive(args, base_url))
+    finally:
+        stop_server(process)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the API across gunicorn worker counts")
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker counts to compare")
+    parser.add_argument("--url", help="Test this running server instead of starting gunicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mode", choices=["http", "chat"], default="http")
+    parser.add_argument("--path", default="/health", help="Endpoint for http mode")
+    parser.add_argument("--message", default="top 5 candidates for job 123456", help="Chat message for chat mode")
+    parser.add_argument("--reconnect", action="store_true", help="Chat mode: resume every turn on a new connection")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load per run")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds of unmeasured load before each run")
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    if args.url:
+        runs = [("external", asyncio.run(drive(args, args.url.rstrip("/"))))]
+    else:
+        runs = [(workers, run_for_workers(args, workers)) for workers in [int(n) for n in args.workers.split(",")]]
+
+    print(f"\n=== Load test: {args.mode} mode, {args.concurrency} clients, {args.duration:.0f}s per run ===")
+    print(f"{'workers':>8} {'done':>8} {'per_sec':>10} {'p50_ms':>9} {'p95_ms':>9} {'errors':>7} {'resumed':>8} {'speedup':>8}")
+    baseline = next((run["per_second"] for _, run in runs if run and run["per_second"]), None)
+    for workers, run in runs:
+        if run is None:
+            print(f"{workers:>8} {'failed to start':>30}")
+            continue
+        speedup = run["per_second"] / baseline if baseline else 0.0
+        print(f"{workers:>8} {run['completed']:>8} {run['per_second']:>10.1f} {run['p50_ms']:>9.1f} "
+              f"{run['p95_ms']:>9.1f} {run['errors']:>7} {run['resumed']:>8} {speedup:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
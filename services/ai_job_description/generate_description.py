@@ -144,16 +144,9 @@ def fill_missing_fields_with_defaults(data):
     return data
 
 def call_openai_api(prompt):
-    from openai import AzureOpenAI
-    client = AzureOpenAI(
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_version=os.getenv("api_version")
-    )
-    model = os.getenv("deployment_name")
+    from common.llm import gateway
     # Use Azure OpenAI to generate text based on the prompt
-    response = client.chat.completions.create(
-        model=model,
+    response = gateway.chat_completion(
         messages=[{"role": "user", "content": prompt}],
         temperature=0.7,
         max_tokens=800,
@@ -1,5 +1,5 @@
 print("=== LOADING main.py ===")
-from fastapi import FastAPI, HTTPException, File, UploadFile, Depends, Form, BackgroundTasks, Request, Response, status
+from fastapi import FastAPI, HTTPException, File, UploadFile, Depends, Form, BackgroundTasks, Request, Response, status, Header
 from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, validator
@@ -14,6 +14,7 @@ import uuid
 import time
 import asyncio
 import logging
+import mimetypes
 
 # Configure logging
 logging.basicConfig(
@@ -25,7 +26,11 @@ logging.basicConfig(
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from common.database.cosmos import db_operations
-from azure.storage.blob import BlobServiceClient
+from common.database.cosmos import async_db_operations
+from common.database.cosmos.query_builder import parse_fields, project_item
+from services.resume_ranking import ranking_queue
+from common.storage import blob_operations
+from azure.core.exceptions import ResourceNotFoundError
 import io
 
 # Import auth router
@@ -43,6 +48,27 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_ranking_queue():
+    ranking_queue.start_workers()
+
+@app.on_event("startup")
+async def start_chat_session_reaper():
+    interval = float(session_store.store_settings().get('reap_interval_seconds', 60))
+    app.state.chat_session_reaper = asyncio.create_task(
+        session_store.run_reaper(session_store.get_session_store(), interval))
+
+@app.on_event("shutdown")
+async def close_database_clients():
+    ranking_queue.stop_workers()
+    extraction_service.shutdown()
+    chat_runner.shutdown()
+    reaper = getattr(app.state, "chat_session_reaper", None)
+    if reaper is not None:
+        reaper.cancel()
+    await blob_operations.close_client()
+    await async_db_operations.close_client()
+
 # --- Health Check Endpoint ---
 @app.get("/health")
 async def health_check():
@@ -50,7 +76,7 @@ async def health_check():
     return {"status": "ok", "timestamp": time.time()}
 
 # --- GitHub Analysis Endpoint ---
-from services.github_analysis.analyze_github import analyze_github_profile
+from services.github_analysis.analyze_github import refresh_github_profile
 from fastapi import Body
 from pydantic import BaseModel
 
@@ -76,7 +102,7 @@ def fetch_github_analysis_result(candidate_email, github_identifier):
 async def github_analysis(request: GitHubAnalysisRequest = Body(...), background_tasks: BackgroundTasks = None):
     import dateutil.parser
     from datetime import datetime, timedelta
-    existing_full = db_operations.fetch_github_analysis_by_candidate(request.candidate_email, request.github_identifier, return_full_item=True)
+    existing_full = await async_db_operations.fetch_github_analysis_by_candidate(request.candidate_email, request.github_identifier, return_full_item=True)
     if existing_full is not None:
         created_at = existing_full.get("created_at")
         is_fresh = False
@@ -91,8 +117,8 @@ async def github_analysis(request: GitHubAnalysisRequest = Body(...), background
             return {"success": True, "data": existing_full["result"], "cached": True, "age_days": (now - created_dt).days}
     def run_analysis_and_save():
         try:
-            result = analyze_github_profile(request.github_identifier, request.candidate_email)
-            db_operations.upsert_github_analysis(request.candidate_email, request.github_identifier, result)
+            result, watermarks = refresh_github_profile(request.github_identifier, request.candidate_email)
+            db_operations.upsert_github_analysis(request.candidate_email, request.github_identifier, result, watermarks=watermarks)
         except Exception as e:
             return {"success": False, "error": str(e)}
     if background_tasks is not None:
@@ -101,7 +127,7 @@ async def github_analysis(request: GitHubAnalysisRequest = Body(...), background
     else:
         run_analysis_and_save()
         # Return latest result after sync
-        latest_full = db_operations.fetch_github_analysis_by_candidate(request.candidate_email, request.github_identifier, return_full_item=True)
+        latest_full = await async_db_operations.fetch_github_analysis_by_candidate(request.candidate_email, request.github_identifier, return_full_item=True)
         if latest_full:
             return {"success": True, "data": latest_full["result"], "cached": False}
         else:
@@ -109,42 +135,30 @@ async def github_analysis(request: GitHubAnalysisRequest = Body(...), background
 
 @app.get("/api/github-analysis/result/{candidate_email}/{github_identifier}")
 async def github_analysis_result(candidate_email: str, github_identifier: str):
-    result = db_operations.fetch_github_analysis_by_candidate(candidate_email, github_identifier)
+    result = await async_db_operations.fetch_github_analysis_by_candidate(candidate_email, github_identifier)
     if result is None:
         return {"status": "processing"}
     return {"success": True, "data": result}
 
 # ------------------- Resume Parser Endpoint -------------------
 from services.resume_parser.parser.openai_resume_parser import parse_resume_json
-from services.resume_parser.parser.pdf_parser import parse_pdf
-from services.resume_parser.parser.doc_parser import parse_doc
+from services.resume_parser import extraction_service
 
 @app.post("/api/parse-resume")
 async def parse_resume(file: UploadFile = File(...)):
-    import shutil, tempfile, os
+    import os
     suffix = os.path.splitext(file.filename)[-1].lower()
-    fd, temp_path = tempfile.mkstemp(suffix=suffix)
-    os.close(fd)  # Close the file descriptor immediately
     try:
-        with open(temp_path, "wb") as out_file:
-            shutil.copyfileobj(file.file, out_file)
+        data = await file.read()
         await file.close()
-        import os
-        print(f"[DEBUG] temp_path: {temp_path}")
-        print(f"[DEBUG] os.getcwd(): {os.getcwd()}")
-        if suffix == '.pdf':
-            text, hyperlinks = parse_pdf(temp_path)
-        elif suffix in ['.doc', '.docx']:
-            text, hyperlinks = parse_doc(temp_path)
-        else:
+        if suffix not in extraction_service.SUPPORTED_SUFFIXES:
             return {"success": False, "data": None, "error": "Unsupported file format. Please upload PDF or DOCX."}
-        extracted_info = parse_resume_json(text, hyperlinks)
+        text, hyperlinks = await extraction_service.extract(data, suffix)
+        # The gateway may wait on the rate limiter or back off; keep that off the event loop
+        extracted_info = await asyncio.to_thread(parse_resume_json, text, hyperlinks)
         return {"success": True, "data": extracted_info, "error": None}
     except Exception as e:
         return {"success": False, "data": None, "error": str(e)}
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
 
 # --- Job Endpoints ---
 class JobQuestionnaire(BaseModel):
@@ -173,10 +187,46 @@ class JobDescription(BaseModel):
             raise ValueError('job_id must be a 6-digit number')
         return v
 
+# --- Listing helpers ---
+MAX_PAGE_SIZE = 1000
+# Needed server-side to resolve rankings and parse state even when the client projects them away
+RANKING_QUERY_FIELDS = ["email", "ranking", "ranking_score", "ranked_at", "explanation", "parse_status"]
+
+def _listing_fields(fields):
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _page_size(page_size, default):
+    return max(1, min(page_size or default, MAX_PAGE_SIZE))
+
+def _strip_cosmos_metadata(doc):
+    for meta_key in ['_rid', '_self', '_etag', '_attachments', '_ts']:
+        doc.pop(meta_key, None)
+    return doc
+
+async def _paged_response(fetch_page, *args, page_size=None, continuation=None, fields=None, default_page_size=100):
+    """Run a fetch_*_page call and shape it as {"items": [...], "continuation": token-or-null}."""
+    try:
+        items, next_token = await fetch_page(*args, page_size=_page_size(page_size, default_page_size),
+                                             continuation=continuation, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": [_strip_cosmos_metadata(item) for item in items], "continuation": next_token}
+
 @app.get("/jobs/")
-async def list_jobs():
+async def list_jobs(page_size: Optional[int] = None, continuation: Optional[str] = None, fields: Optional[str] = None):
+    """
+    List jobs, newest first. Passing page_size or continuation returns one page as
+    {"items": [...], "continuation": token}; fields=a,b limits each job to those properties.
+    """
+    projection = _listing_fields(fields)
+    if page_size is not None or continuation:
+        return await _paged_response(async_db_operations.fetch_jobs_page, page_size=page_size,
+                                     continuation=continuation, fields=projection)
     try:
-        jobs = db_operations.fetch_all_jobs()
+        jobs = await async_db_operations.fetch_all_jobs(fields=projection)
         return jobs if jobs else []
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -194,7 +244,7 @@ async def create_job(job: JobDescription, background_tasks: BackgroundTasks):
         print("Creating job with data:", job_data)  # Debug log
         
         # Store in Cosmos DB
-        db_operations.upsert_jobDetails(job_data)
+        await async_db_operations.upsert_jobDetails(job_data)
 
         # Trigger questionnaire generation as a background task
         background_tasks.add_task(generate_and_store_questionnaire, job.job_id)
@@ -239,7 +289,7 @@ def generate_and_store_questionnaire(job_id):
 @app.get("/jobs/{job_id}")
 async def get_job(job_id: str):
     try:
-        job = db_operations.fetch_job_description(job_id)
+        job = await async_db_operations.fetch_job_description(job_id)
         if not job:
             raise HTTPException(status_code=404, detail="Job not found")
         return job
@@ -252,11 +302,11 @@ async def get_job(job_id: str):
 @app.get("/jobs/{job_id}/questionnaire")
 async def get_job_questionnaire(job_id: str):
     try:
-        job = db_operations.fetch_job_description(job_id)
+        job = await async_db_operations.fetch_job_description(job_id)
         if job and job.get("questionnaire"):
             return job["questionnaire"]
         # If not found in job document, look in jobDescriptionQuestionnaire container
-        questionnaire_doc = db_operations.fetch_job_description_questionnaire(job_id)
+        questionnaire_doc = await async_db_operations.fetch_job_description_questionnaire(job_id)
         if questionnaire_doc and questionnaire_doc.get("questionnaire"):
             return questionnaire_doc["questionnaire"]
         raise HTTPException(status_code=404, detail="Questionnaire not found")
@@ -267,10 +317,71 @@ async def get_job_questionnaire(job_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Candidate Endpoints ---
+def _present_candidate(cand):
+    """Shape a candidate document for the dashboard: resume alias, status default, social links."""
+    cand = dict(cand)
+    cand['resume'] = cand.get('parsed_resume') or cand.get('resume')
+    # Ensure 'status' is always present
+    if 'status' not in cand or not cand['status']:
+        if 'application_status' in cand and cand['application_status']:
+            cand['status'] = cand['application_status']
+        else:
+            cand['status'] = 'applied'
+    # Patch social links for frontend rendering; listings only project parsed_resume.links
+    links = cand.pop('links', None)
+    if 'parsed_resume' in cand and isinstance(cand['parsed_resume'], dict):
+        links = cand['parsed_resume'].get('links', {})
+    if links:
+        cand['linkedin'] = links.get('linkedIn') or links.get('linkedin') or links.get('LinkedIn')
+        cand['github'] = links.get('gitHub') or links.get('github') or links.get('GitHub')
+    else:
+        cand['linkedin'] = None
+        cand['github'] = None
+    return _strip_cosmos_metadata(cand)
+
+def _ranking_percent(raw_ranking):
+    """Rankings are stored either as 0-1 fractions or 0-100 scores; the dashboard shows 0-100."""
+    if isinstance(raw_ranking, (float, int)) and 0 < raw_ranking <= 1:
+        return round(raw_ranking * 100)
+    return round(float(raw_ranking))
+
+def _set_parse_status(cand, parse_job):
+    """Report the resume parse like ranking_status: the queued parse job, else the stored status."""
+    if parse_job is not None:
+        cand['parse_status'] = parse_job['status']
+        if parse_job['status'] == ranking_queue.FAILED:
+            cand['parse_error'] = parse_job.get('last_error')
+    elif not cand.get('parse_status'):
+        # Applications stored before parsing was queued were parsed on apply
+        cand['parse_status'] = ranking_queue.DONE
+
+def _enqueue_reranks(job_id, emails):
+    job_questionnaire_doc = db_operations.fetch_job_description_questionnaire(job_id)
+    questionnaire_id = job_questionnaire_doc['id'] if job_questionnaire_doc else ''
+    for email in emails:
+        try:
+            ranking_queue.enqueue(job_id, email, questionnaire_id, priority=ranking_queue.BATCH)
+        except Exception as e:
+            print(f"[ERROR] Failed to queue re-rank for {email} on job {job_id}: {e}")
+
 @app.get("/jobs/{job_id}/candidates")
-async def get_job_candidates(job_id: str, top_k: int = 10):
+async def get_job_candidates(job_id: str, top_k: int = 10, page_size: Optional[int] = None,
+                             continuation: Optional[str] = None, fields: Optional[str] = None):
+    """
+    Top candidates for a job, best ranking first.
+    Passing page_size or continuation walks every candidate a page at a time and returns
+    {"items": [...], "continuation": token}; fields=a,b limits each candidate to those properties.
+    """
+    projection = _listing_fields(fields)
+    if page_size is not None or continuation:
+        page = await _paged_response(async_db_operations.fetch_candidates_page, job_id, page_size=page_size,
+                                     continuation=continuation, fields=projection, default_page_size=50)
+        if not projection:
+            page["items"] = [_present_candidate(c) for c in page["items"]]
+        return page
+    query_fields = projection + [f for f in RANKING_QUERY_FIELDS if f not in projection] if projection else None
     try:
-        candidates = db_operations.fetch_top_k_candidates_by_count(job_id, top_k)
+        candidates = await async_db_operations.fetch_top_k_candidates_by_count(job_id, top_k, fields=query_fields)
         # Normalize to a list in case the DB layer returns a JSON string or a single dict
         if isinstance(candidates, str):
             import json
@@ -284,78 +395,45 @@ async def get_job_candidates(job_id: str, top_k: int = 10):
             candidates = []
         if not candidates:
             return []
-        rankings_map = { (job_id, k.strip().lower()): v for k, v in db_operations.fetch_candidate_rankings(job_id).items() }
+        queue_jobs = await asyncio.to_thread(ranking_queue.job_statuses, job_id)
+        parse_jobs = await asyncio.to_thread(ranking_queue.job_statuses, job_id, ranking_queue.PARSE)
         patched_candidates = []
+        rerank_emails = []
         for cand in candidates:
             if not isinstance(cand, dict):
                 import sys
                 print(f"[SKIP NON-DICT CANDIDATE]: {cand}", file=sys.stderr)
                 continue
-            resume = cand.get('parsed_resume') or cand.get('resume')
-            cand = dict(cand)
-            cand['resume'] = resume
-            # Ensure 'status' is always present
-            if 'status' not in cand or not cand['status']:
-                if 'application_status' in cand and cand['application_status']:
-                    cand['status'] = cand['application_status']
-                else:
-                    cand['status'] = 'applied'
+            cand = _present_candidate(cand)
             email = (cand.get('email') or '').strip().lower()
-            from services.resume_ranking.resume_ranker.multiagent_resume_ranker import initiate_chat
-            import re
-            # If ranking is missing or zero, re-run ranking synchronously
-            ranking_val = 0
-            explanation = None
-            if email and (job_id, email) in rankings_map:
-                raw_ranking = rankings_map[(job_id, email)].get('ranking', 0)
-                explanation = rankings_map[(job_id, email)].get('explanation', None)
-                if isinstance(raw_ranking, (float, int)) and 0 < raw_ranking <= 1:
-                    ranking_val = round(raw_ranking * 100)
-                else:
-                    ranking_val = round(raw_ranking)
-            if ranking_val == 0:
-                # Try to re-rank synchronously
-                job_description = db_operations.fetch_job_description(job_id)
-                job_questionnaire_doc = db_operations.fetch_job_description_questionnaire(job_id)
-                job_questionnaire_id = job_questionnaire_doc['id'] if job_questionnaire_doc else None
-                questionnaire = job_questionnaire_doc['questionnaire'] if job_questionnaire_doc else None
-                job_description_text = job_description['description'] if job_description and 'description' in job_description else ''
-                resume_text = ''
-                parsed_resume = cand.get('parsed_resume')
-                if parsed_resume and isinstance(parsed_resume, dict) and 'raw_text' in parsed_resume:
-                    resume_text = parsed_resume['raw_text']
-                if all([job_id, job_questionnaire_id, resume_text, job_description_text, email, questionnaire]):
-                    try:
-                        ranking_result = initiate_chat(job_id, job_questionnaire_id, resume_text, job_description_text, email, questionnaire)
-                        if isinstance(ranking_result, dict) and 'score' in ranking_result:
-                            ranking_val = ranking_result['score']
-                        elif isinstance(ranking_result, (int, float)):
-                            ranking_val = ranking_result
-                        elif isinstance(ranking_result, str):
-                            match = re.search(r"([0-9]+\.?[0-9]*)", ranking_result)
-                            if match:
-                                ranking_val = float(match.group(1))
-                        cand['ranking'] = ranking_val
-                        db_operations.upsert_candidate(cand)
-                    except Exception as e:
-                        print(f"[ERROR] Failed to rerank candidate {email}: {e}")
+            queue_job = queue_jobs.get(email) if email else None
+            _set_parse_status(cand, parse_jobs.get(email) if email else None)
+            if cand.get('ranked_at') is not None:
+                # Ranked, possibly with a legitimate score of 0; the DB layer already merged in
+                # the ranking container entries of the returned candidates
+                cand['ranking'] = _ranking_percent(cand.get('ranking') or 0)
+                cand['ranking_status'] = ranking_queue.DONE
+            elif cand.get('ranking'):
+                cand['ranking_status'] = ranking_queue.DONE
+            elif queue_job is not None:
+                # Queued before: report where it is; failed jobs are not retried from a GET
+                cand['ranking_status'] = queue_job['status']
+                if queue_job['status'] == ranking_queue.DONE and queue_job.get('score') is not None:
+                    cand['ranking'] = _ranking_percent(queue_job['score'])
+                elif queue_job['status'] == ranking_queue.FAILED:
+                    cand['ranking_error'] = queue_job.get('last_error')
             else:
-                cand['ranking'] = ranking_val
-            cand['explanation'] = explanation
-            # Patch social links for frontend rendering
-            links = None
-            if 'parsed_resume' in cand and isinstance(cand['parsed_resume'], dict):
-                links = cand['parsed_resume'].get('links', {})
-            if links:
-                cand['linkedin'] = links.get('linkedIn') or links.get('linkedin') or links.get('LinkedIn')
-                cand['github'] = links.get('gitHub') or links.get('github') or links.get('GitHub')
-            else:
-                cand['linkedin'] = None
-                cand['github'] = None
-            # Remove CosmosDB metadata fields if present
-            for meta_key in ['_rid', '_self', '_etag', '_attachments', '_ts']:
-                cand.pop(meta_key, None)
+                # Never queued: rank in the background and let the next poll pick up the score
+                if email:
+                    rerank_emails.append(cand.get('email'))
+                cand['ranking_status'] = ranking_queue.PENDING
+            cand['explanation'] = cand.get('explanation') if cand['ranking_status'] == ranking_queue.DONE else None
+            if projection:
+                cand = project_item(cand, projection + ['ranking', 'ranking_status', 'ranking_error',
+                                                        'parse_status', 'parse_error'])
             patched_candidates.append(cand)
+        if rerank_emails:
+            await asyncio.to_thread(_enqueue_reranks, job_id, rerank_emails)
         from fastapi.encoders import jsonable_encoder
         try:
             return jsonable_encoder(patched_candidates)
@@ -378,8 +456,8 @@ async def get_job_candidates(job_id: str, top_k: int = 10):
 @app.get("/candidates/{candidate_id}")
 async def get_candidate_by_id(candidate_id: str):
     try:
-        applications_by_id = db_operations.fetch_applications_by_candidate(candidate_id) or []
-        applications_by_email = db_operations.fetch_applications_by_candidate_email(candidate_id) or []
+        applications_by_id = await async_db_operations.fetch_applications_by_candidate(candidate_id) or []
+        applications_by_email = await async_db_operations.fetch_applications_by_candidate_email(candidate_id) or []
         seen = set()
         all_applications = []
         for app in applications_by_id + applications_by_email:
@@ -399,15 +477,16 @@ async def get_candidate_by_id(candidate_id: str):
             job_title = app.get('job_title')
             email = app.get('email')
             if not job_title and job_id:
-                job_desc = db_operations.fetch_job_description(job_id)
+                job_desc = await async_db_operations.fetch_job_description(job_id)
                 job_title = job_desc['title'] if job_desc and 'title' in job_desc else job_id
             ranking = 0.0
             explanation = None
             if job_id and email:
-                rmap = db_operations.fetch_candidate_rankings(job_id)
-                if email in rmap:
-                    ranking = rmap[email].get('ranking', 0.0)
-                    explanation = rmap[email].get('explanation')
+                rmap = await async_db_operations.fetch_candidate_rankings_for_emails(job_id, [email])
+                stored = rmap.get(email.strip().lower())
+                if stored:
+                    ranking = stored.get('ranking', 0.0)
+                    explanation = stored.get('explanation')
             jobs_applied.append({
                 'job_id': job_id,
                 'title': job_title,
@@ -473,7 +552,7 @@ async def get_candidate_by_id(candidate_id: str):
         print(f"[DEBUG] Looking up github_analysis for email={candidate_profile.get('email')}, github_username={norm_github_username}")
         github_analysis = None
         if norm_github_username:
-            github_analysis = db_operations.fetch_github_analysis_by_candidate(candidate_profile.get('email'), norm_github_username)
+            github_analysis = await async_db_operations.fetch_github_analysis_by_candidate(candidate_profile.get('email'), norm_github_username)
 
         # Normalize to UI-expected shape
         def _norm_gha(doc):
@@ -528,7 +607,7 @@ from fastapi import Body
 @app.get("/settings/{user_email}")
 async def get_user_settings(user_email: str):
     try:
-        settings = db_operations.fetch_user_settings(user_email)
+        settings = await async_db_operations.fetch_user_settings(user_email)
         if not settings:
             raise HTTPException(status_code=404, detail="User not found")
         # Return only settings-related fields, not password
@@ -546,7 +625,7 @@ async def get_user_settings(user_email: str):
 @app.put("/settings/{user_email}")
 async def update_settings(user_email: str, data: dict = Body(...)):
     try:
-        success = db_operations.update_user_settings(user_email, data)
+        success = await async_db_operations.update_user_settings(user_email, data)
         if not success:
             raise HTTPException(status_code=404, detail="User not found or update failed")
         return {"message": "Settings updated successfully"}
@@ -565,7 +644,7 @@ async def submit_feedback(data: dict = Body(...)):
             "message": data.get("message", "")
         }
         
-        success = db_operations.add_user_feedback(user_email, feedback_data)
+        success = await async_db_operations.add_user_feedback(user_email, feedback_data)
         if not success:
             raise HTTPException(status_code=404, detail="User not found or feedback submission failed")
         
@@ -577,38 +656,65 @@ async def submit_feedback(data: dict = Body(...)):
 async def update_candidate_status(job_id: str, candidate_id: str, data: dict = Body(...)):
     try:
         status = data.get("status")
-        db_operations.update_candidate_status_by_id(job_id, candidate_id, status)
+        await async_db_operations.update_candidate_status_by_id(job_id, candidate_id, status)
         return {"message": "Status updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/candidates/{job_id}/{email}/resume")
-async def get_candidate_resume(job_id: str, email: str):
+async def get_candidate_resume(job_id: str, email: str, range_header: Optional[str] = Header(None, alias="Range")):
+    """Stream the candidate's resume from blob storage; honours a single-range Range header."""
     try:
-        candidate = db_operations.fetch_resume_with_email_and_job(job_id, email)
+        candidate = await async_db_operations.fetch_resume_with_email_and_job(job_id, email)
         if not candidate or "resume_blob_name" not in candidate:
             raise HTTPException(status_code=404, detail="Resume not found")
         blob_name = candidate["resume_blob_name"]
-        AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-        CONTAINER_NAME = "resumes"
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
-        blob_client = container_client.get_blob_client(blob_name)
-        stream = io.BytesIO()
-        blob_data = blob_client.download_blob()
-        blob_data.readinto(stream)
-        stream.seek(0)
-        return StreamingResponse(stream, media_type="application/pdf", headers={
-            "Content-Disposition": f"attachment; filename={os.path.basename(blob_name)}"
-        })
+        try:
+            properties = await blob_operations.get_blob_properties(blob_name)
+        except ResourceNotFoundError:
+            raise HTTPException(status_code=404, detail="Resume not found")
+        size = properties.size
+        headers = {
+            "Content-Disposition": f"attachment; filename={os.path.basename(blob_name)}",
+            "Accept-Ranges": "bytes",
+            "ETag": properties.etag,
+        }
+        try:
+            byte_range = blob_operations.parse_range(range_header, size)
+        except ValueError:
+            raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                                headers={"Content-Range": f"bytes */{size}"})
+        if byte_range:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            body = blob_operations.stream_blob(blob_name, offset=start, length=end - start + 1)
+            status_code = 206
+        else:
+            headers["Content-Length"] = str(size)
+            body = blob_operations.stream_blob(blob_name)
+            status_code = 200
+        media_type = mimetypes.guess_type(blob_name)[0] or "application/pdf"
+        return StreamingResponse(body, status_code=status_code, media_type=media_type, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Application Endpoints ---
 @app.get("/applications/{job_id}")
-async def get_job_applications(job_id: str):
+async def get_job_applications(job_id: str, page_size: Optional[int] = None, continuation: Optional[str] = None,
+                               fields: Optional[str] = None):
+    """
+    The job's application record. Passing page_size or continuation instead pages through the
+    candidate applications as {"items": [...], "continuation": token}; fields=a,b projects either.
+    """
+    projection = _listing_fields(fields)
+    if page_size is not None or continuation:
+        return await _paged_response(async_db_operations.fetch_applications_page, job_id, page_size=page_size,
+                                     continuation=continuation, fields=projection)
     try:
-        applications = db_operations.fetch_application_by_job_id(job_id)
+        applications = await async_db_operations.fetch_application_by_job_id(job_id, fields=projection)
         if not applications:
             return []
         return applications
@@ -630,91 +736,35 @@ async def apply_for_job(
             raise HTTPException(status_code=400, detail="No resume file provided.")
         if not hasattr(resume, 'filename') or resume.filename is None:
             raise HTTPException(status_code=400, detail="Resume filename is missing.")
-        AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-        CONTAINER_NAME = "resumes"
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
         ext = os.path.splitext(resume.filename)[-1]
         timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
         blob_name = f"{email}_{timestamp}{ext}"
-        blob_client = container_client.get_blob_client(blob_name)
         data = await resume.read()
         if data is None or len(data) == 0:
             raise HTTPException(status_code=400, detail="Resume file is empty.")
         try:
-            blob_client.upload_blob(data, overwrite=True)
-            resume_blob_name = blob_name
+            resume_blob_name = await blob_operations.upload_bytes(blob_name, data, content_type=resume.content_type)
         except Exception as upload_exc:
+            print(f"[ERROR] Resume upload failed for {blob_name}: {upload_exc}")
             resume_blob_name = None
-        parsed_resume = None
         if not resume_blob_name:
             raise HTTPException(status_code=500, detail="Resume upload failed. Please try again.")
-        try:
-            suffix = os.path.splitext(resume.filename)[-1].lower()
-            fd, temp_path = tempfile.mkstemp(suffix=suffix)
-            os.close(fd)
-            with open(temp_path, "wb") as out_file:
-                out_file.write(data)
-            if suffix == '.pdf':
-                text, hyperlinks = parse_pdf(temp_path)
-            elif suffix in ['.doc', '.docx']:
-                text, hyperlinks = parse_doc(temp_path)
-            else:
-                text, hyperlinks = '', []
-            print(f"[DEBUG] Uploaded file: {resume.filename}, suffix: {suffix}")
-            print(f"[DEBUG] Parsed resume_text length: {len(text) if text else 0}")
-            if not text or not str(text).strip():
-                print(f"[ERROR] Resume parsing failed or resume is empty for file: {resume.filename}")
-                raise HTTPException(status_code=400, detail="Resume could not be parsed. Please upload a valid PDF or DOCX file with readable text.")
-            try:
-                parsed_resume = parse_resume_json(text, hyperlinks)
-            except Exception as e:
-                print(f"[ERROR] Failed to parse resume JSON: {e}")
-                parsed_resume = None
-        finally:
-            try:
-                if 'temp_path' in locals() and os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except Exception:
-                pass
-        from services.resume_ranking.resume_ranker.multiagent_resume_ranker import initiate_chat
-        job_description = db_operations.fetch_job_description(job_id)
-        job_questionnaire_doc = db_operations.fetch_job_description_questionnaire(job_id)
+        suffix = os.path.splitext(resume.filename)[-1].lower()
+        if suffix in extraction_service.SUPPORTED_SUFFIXES:
+            text, hyperlinks = await extraction_service.extract(data, suffix)
+        else:
+            text, hyperlinks = '', []
+        print(f"[DEBUG] Uploaded file: {resume.filename}, suffix: {suffix}")
+        print(f"[DEBUG] Parsed resume_text length: {len(text) if text else 0}")
+        if not text or not str(text).strip():
+            print(f"[ERROR] Resume parsing failed or resume is empty for file: {resume.filename}")
+            raise HTTPException(status_code=400, detail="Resume could not be parsed. Please upload a valid PDF or DOCX file with readable text.")
+        job_description = await async_db_operations.fetch_job_description(job_id)
+        job_questionnaire_doc = await async_db_operations.fetch_job_description_questionnaire(job_id)
         job_questionnaire_id = job_questionnaire_doc['id'] if job_questionnaire_doc else None
         questionnaire = job_questionnaire_doc['questionnaire'] if job_questionnaire_doc else None
-        resume_text = text if 'text' in locals() else ''
         job_description_text = job_description['description'] if job_description and 'description' in job_description else ''
-        ranking_score = ranking
-        explanation = None
-        print("[DEBUG] Ranking eligibility check:")
-        print(f"  job_id: {job_id} (type: {type(job_id)})")
-        print(f"  job_questionnaire_id: {job_questionnaire_id} (type: {type(job_questionnaire_id)})")
-        print(f"  resume_text: {repr(resume_text)[:100]} (type: {type(resume_text)})")
-        print(f"  job_description_text: {repr(job_description_text)[:100]} (type: {type(job_description_text)})")
-        print(f"  email: {email} (type: {type(email)})")
-        print(f"  questionnaire: {repr(questionnaire)[:100]} (type: {type(questionnaire)})")
-        if all([job_id, job_questionnaire_id, resume_text, job_description_text, email, questionnaire]):
-            try:
-                ranking_result = initiate_chat(job_id, job_questionnaire_id, resume_text, job_description_text, email, questionnaire)
-                print(f"[DEBUG] Full ranking_result: {repr(ranking_result)}")
-                if isinstance(ranking_result, dict):
-                    ranking_score = ranking_result.get('score')
-                    explanation = ranking_result.get('explanation')
-                elif isinstance(ranking_result, (int, float)):
-                    ranking_score = ranking_result
-                    explanation = None
-                elif isinstance(ranking_result, str):
-                    import re
-                    match = re.search(r"([0-9]+\.?[0-9]*)", ranking_result)
-                    if match:
-                        ranking_score = float(match.group(1))
-                    explanation = None
-                if ranking_score is None or explanation is None or not str(explanation).strip():
-                    print(f"[ERROR] Ranking or explanation missing. ranking_score: {ranking_score}, explanation: {explanation}, ranking_result: {repr(ranking_result)}")
-                    raise HTTPException(status_code=500, detail=f"Ranking or explanation missing from ranking engine. Both are required. Debug: ranking_result={repr(ranking_result)}")
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Ranking failed: {e}")
-        else:
+        if not all([job_id, job_questionnaire_id, text, job_description_text, email, questionnaire]):
             raise HTTPException(status_code=500, detail="Insufficient data to perform ranking.")
         application_data = {
             "id": f"{job_id}_{email}",
@@ -722,89 +772,128 @@ async def apply_for_job(
             "name": name,
             "email": email,
             "cover_letter": cover_letter,
-            "ranking": ranking_score,
-            "explanation": explanation,
+            "ranking": ranking,
+            "ranking_status": ranking_queue.PENDING,
+            "parse_status": ranking_queue.PENDING,
             "status": "applied",
             "applied_at": datetime.utcnow().isoformat(),
             "resume_blob_name": resume_blob_name,
-            "parsed_resume": parsed_resume,
+            # The structured LLM parse runs as its own queue job; ranking only needs the extracted text
+            "parsed_resume": {"raw_text": text},
+            "resume_hyperlinks": hyperlinks,
             "type": "candidate",
         }
-        from common.database.cosmos.db_operations import upsert_candidate
-        upsert_candidate(application_data)
-        # Synchronous ranking: do not use background task
-        # rank_candidate_resume_task(job_id, email, resume_blob_name, parsed_resume)  # No longer needed; ranking is immediate
-        return {"message": "Application submitted successfully. Ranking is available immediately.", "ranking": ranking_score}
+        await async_db_operations.upsert_candidate(application_data)
+        # A new application replaces any earlier one for this job, so always parse and rank it again
+        await asyncio.to_thread(ranking_queue.enqueue, job_id, email, force=True, kind=ranking_queue.PARSE)
+        ranking_job = await asyncio.to_thread(ranking_queue.enqueue, job_id, email, job_questionnaire_id, True)
+        return {
+            "message": "Application submitted successfully. Ranking is in progress.",
+            "ranking": None,
+            "ranking_status": ranking_job["status"],
+            "ranking_job_id": ranking_job["id"],
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print(f"[ERROR] Exception in apply_for_job: {e}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
 
-def rank_candidate_resume_task(job_id, email, resume_blob_name, parsed_resume):
-    try:
-        from services.resume_ranking.resume_ranker.multiagent_resume_ranker import initiate_chat
-        job_description = db_operations.fetch_job_description(job_id)
-        job_questionnaire_doc = db_operations.fetch_job_description_questionnaire(job_id)
-        job_questionnaire_id = job_questionnaire_doc['id'] if job_questionnaire_doc else None
-        questionnaire = job_questionnaire_doc['questionnaire'] if job_questionnaire_doc else None
-        resume_text = ''
-        if parsed_resume and isinstance(parsed_resume, dict) and 'raw_text' in parsed_resume:
-            resume_text = parsed_resume['raw_text']
-        else:
-            try:
-                AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-                CONTAINER_NAME = "resumes"
-                blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-                container_client = blob_service_client.get_container_client(CONTAINER_NAME)
-                blob_client = container_client.get_blob_client(resume_blob_name)
-                stream = blob_client.download_blob().readall()
-                suffix = os.path.splitext(resume_blob_name)[-1].lower()
-                fd, temp_path = tempfile.mkstemp(suffix=suffix)
-                os.close(fd)
-                with open(temp_path, "wb") as out_file:
-                    out_file.write(stream)
-                if suffix == '.pdf':
-                    text, hyperlinks = parse_pdf(temp_path)
-                elif suffix in ['.doc', '.docx']:
-                    text, hyperlinks = parse_doc(temp_path)
-                else:
-                    text, hyperlinks = '', []
-                resume_text = text
-                os.remove(temp_path)
-            except Exception as e:
-                resume_text = ''
-        job_description_text = job_description['description'] if job_description and 'description' in job_description else ''
-        if all([job_id, job_questionnaire_id, resume_text, job_description_text, email, questionnaire]):
-            try:
-                ranking_result = initiate_chat(job_id, job_questionnaire_id, resume_text, job_description_text, email, questionnaire)
-                ranking_score = None
-                if isinstance(ranking_result, dict) and 'score' in ranking_result:
-                    ranking_score = float(ranking_result['score'])
-                elif isinstance(ranking_result, (float, int)):
-                    ranking_score = float(ranking_result)
-                else:
-                    import re
-                    match = re.search(r"([0-9]+\.?[0-9]*)", str(ranking_result))
-                    if match:
-                        ranking_score = float(match.group(1))
-                if ranking_score is not None:
-                    candidate = db_operations.fetch_resume_with_email_and_job(job_id, email)
-                    if candidate:
-                        candidate['ranking'] = ranking_score
-                        db_operations.upsert_candidate(candidate)
-            except Exception as e:
-                pass
-        else:
-            pass
-    except Exception as e:
-        pass
+# --- Ranking Job Endpoints ---
+@app.get("/ranking-jobs/{ranking_job_id}")
+async def get_ranking_job(ranking_job_id: int):
+    ranking_job = await asyncio.to_thread(ranking_queue.get_job, ranking_job_id)
+    if not ranking_job:
+        raise HTTPException(status_code=404, detail="Ranking job not found")
+    return ranking_job
+
+@app.get("/jobs/{job_id}/ranking-status")
+async def get_job_ranking_status(job_id: str, email: Optional[str] = None):
+    """
+    Per-status counts of a job's ranking and resume parse jobs, or the latest ranking job for one
+    candidate when email is given.
+    """
+    if email:
+        ranking_job = await asyncio.to_thread(ranking_queue.get_status, job_id, email)
+        if not ranking_job:
+            raise HTTPException(status_code=404, detail="No ranking job for this candidate")
+        return ranking_job
+    return {
+        "job_id": job_id,
+        "counts": await asyncio.to_thread(ranking_queue.job_summary, job_id),
+        "parse_counts": await asyncio.to_thread(ranking_queue.job_summary, job_id, ranking_queue.PARSE),
+    }
 
 # --- Debug/Admin Endpoint ---
 @app.get("/debug/candidates/{job_id}")
 async def get_candidates_for_job(job_id: str):
-    candidates = db_operations.fetch_top_k_candidates_by_count(job_id)
+    candidates = await async_db_operations.fetch_top_k_candidates_by_count(job_id)
     return {"count": len(candidates), "candidates": candidates}
 
+@app.get("/debug/ru-stats")
+async def get_ru_stats():
+    """Request-unit charge per data-access operation since process start."""
+    from common.database.cosmos.query_builder import get_request_charge_stats
+    return get_request_charge_stats()
+
+@app.get("/debug/cache-stats")
+async def get_cache_stats():
+    """Hit/miss/eviction counters for the caches used by this process."""
+    from common.utils.cache import cache_stats
+    return cache_stats()
+
+@app.get("/debug/llm-stats")
+async def get_llm_stats():
+    """Azure OpenAI gateway requests, retries, 429s, limiter wait and tokens per priority."""
+    from common.llm.gateway import gateway_stats
+    return gateway_stats()
+
+@app.get("/debug/chat-stats")
+async def get_chat_stats():
+    """How chat turns were handled: intent router fast path vs GroupChat, and agent graph pool usage."""
+    from services.chatbot import intent_router
+    from services.chatbot.multiagent_assistant import agent_pool
+    return {"router": intent_router.router_stats(), "agent_pool": agent_pool.stats(),
+            "sessions": chat_session_store.stats()}
+
+# --- Batch Ranking Endpoint ---
+class RankBatchRequest(BaseModel):
+    # Stored candidates of the job to score; all of them when neither emails nor resumes are given
+    emails: Optional[List[str]] = None
+    # Ad-hoc resumes to score as {"email": ..., "resume": ...}
+    resumes: Optional[List[Dict[str, Any]]] = None
+    batch_size: Optional[int] = None
+    store: bool = True
+
+@app.post("/jobs/{job_id}/rank-batch")
+async def rank_batch(job_id: str, request: RankBatchRequest = Body(...)):
+    """Score many resumes for one job, several per LLM request, and return per-candidate scores."""
+    from services.resume_ranking.resume_ranker.scoring_engine import score_resumes_batch
+    job_description = await async_db_operations.fetch_job_description(job_id)
+    job_questionnaire_doc = await async_db_operations.fetch_job_description_questionnaire(job_id)
+    if not job_description or not job_questionnaire_doc:
+        raise HTTPException(status_code=404, detail="Job description or questionnaire not found")
+    if request.resumes:
+        candidates = request.resumes
+    else:
+        stored = await async_db_operations.fetch_candidates_for_ranking(job_id, request.emails)
+        candidates = [{
+            "email": c.get('email'),
+            "resume": c['parsed_resume'].get('raw_text') if isinstance(c.get('parsed_resume'), dict) else None,
+        } for c in stored]
+    if not candidates:
+        return {"job_id": job_id, "results": []}
+    try:
+        results = await asyncio.to_thread(
+            score_resumes_batch, job_id, job_questionnaire_doc['id'], candidates,
+            job_description.get('description', ''), job_questionnaire_doc['questionnaire'],
+            request.batch_size, None, request.store
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"job_id": job_id, "results": results}
+
 # --- AI Job Description Endpoint ---
 class JobDescriptionRequest(BaseModel):
     title: str = None
@@ -868,66 +957,189 @@ async def api_send_email(request: SendEmailRequest):
         return {"success": False, "error": str(e)}
 
 from fastapi import WebSocket, WebSocketDisconnect
-import threading
-import queue
 import time
 import asyncio
+import weakref
+from services.chatbot import chat_runner
+from services.chatbot import session_store
+
+# Chat session state (candidate_id, recent turns, the outbox of sequence-numbered frames) lives
+# in a bounded TTL store shared by the workers; see services/chatbot/session_store.py. Turns
+# append their frames to the outbox and each connection relays the frames after the last one it
+# sent, so a client may reconnect to any worker with ?lastSeq=<seq> and resume. Per-session turn
+# semaphores and relay wake-up events only live while a turn or connection holds them.
+chat_session_store = session_store.get_session_store()
+session_turn_slots = weakref.WeakValueDictionary()
+session_frame_signals = weakref.WeakValueDictionary()
+RELAY_POLL_SECONDS = float(session_store.store_settings().get('relay_poll_seconds', 0.25))
+RELAY_IDLE_POLL_SECONDS = float(session_store.store_settings().get('relay_idle_poll_seconds', 30))
+
+def session_turn_slot(session_id):
+    """The semaphore bounding concurrent turns of a session (chat.max_turns_per_session)."""
+    turn_slots = session_turn_slots.get(session_id)
+    if turn_slots is None:
+        turn_slots = session_turn_slots[session_id] = asyncio.Semaphore(chat_runner.session_turn_limit())
+    return turn_slots
+
+def session_frame_signal(session_id):
+    """The event that wakes this worker's relays of a session when a frame is appended locally."""
+    signal = session_frame_signals.get(session_id)
+    if signal is None:
+        signal = session_frame_signals[session_id] = asyncio.Event()
+    return signal
+
+async def send_chat_frame(websocket, session_id, payload):
+    """Append one frame to the session's outbox for the relays; sent directly if the session is gone."""
+    seq = await asyncio.to_thread(chat_session_store.append_frame, session_id, payload)
+    if seq is not None:
+        signal = session_frame_signals.get(session_id)
+        if signal is not None:
+            signal.set()
+        return
+    try:
+        await websocket.send_text(json.dumps(payload))
+    except Exception as send_error:
+        logging.warning(f"[WebSocket] Could not send frame to session {session_id}: {str(send_error)}")
+
+async def relay_chat_frames(websocket, session_id, last_seq, signal):
+    """
+    Send the session's outbox frames after last_seq as they appear, whichever worker runs the
+    turn. Local turns wake the relay through signal; while a turn is running elsewhere the store
+    is polled every relay_poll_seconds, otherwise only every relay_idle_poll_seconds. A failed
+    send closes the connection, and the client resumes from its last seq.
+    """
+    while True:
+        try:
+            frames, turn_active = await asyncio.to_thread(chat_session_store.outbox, session_id, last_seq)
+        except Exception as store_error:
+            logging.error(f"[WebSocket] Could not read the outbox of session {session_id}: {str(store_error)}")
+            frames, turn_active = [], True
+        if frames:
+            try:
+                for seq, text in frames:
+                    await websocket.send_text(text)
+                    last_seq = seq
+            except Exception as send_error:
+                logging.warning(f"[WebSocket] Could not send frame to session {session_id}, closing: {str(send_error)}")
+                try:
+                    await websocket.close()
+                except Exception:
+                    pass
+                return
+            try:
+                await asyncio.to_thread(chat_session_store.mark_delivered, session_id, last_seq)
+            except Exception as store_error:
+                logging.error(f"[WebSocket] Could not record delivery for session {session_id}: {str(store_error)}")
+        try:
+            await asyncio.wait_for(signal.wait(), timeout=RELAY_POLL_SECONDS if turn_active else RELAY_IDLE_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        signal.clear()
+
+async def run_chat_turn(websocket, session_id, user_message, candidate_id):
+    """One chat turn: acknowledge, stream agent messages while the multiagent assistant runs off the loop, send the final answer."""
+    turn_slots = session_turn_slot(session_id)
+    if turn_slots.locked():
+        await send_chat_frame(websocket, session_id, {
+            "type": "text",
+            "content": "Still working on your previous message; this one is queued.",
+            "isProcessing": True
+        })
+    async with turn_slots:
+        # Marks the session busy so relays on other workers poll for its frames until it ends
+        turn_id = await asyncio.to_thread(chat_session_store.begin_turn, session_id)
+        try:
+            # Send processing acknowledgment immediately
+            processing_message = {
+                "type": "text",
+                "content": f"I received your message: '{user_message}'. Processing your request...",
+                "isProcessing": True
+            }
+            await send_chat_frame(websocket, session_id, processing_message)
+            logging.info(f"[WebSocket] Sent processing acknowledgment")
+
+            async def stream_agent_message(event):
+                await send_chat_frame(websocket, session_id, dict(event, isProcessing=True, timestamp=time.time()))
+
+            # Process the message with multiagent assistant
+            try:
+                ai_response_json = await chat_runner.run_turn(user_message, candidate_id, on_event=stream_agent_message,
+                                                               session_id=session_id)
 
-# In-memory chat session store for WebSocket chat
-chat_sessions = {}
-agent_threads = {}
-response_queues = {}
+                # Parse the JSON response from chat_step
+                try:
+                    ai_response_data = json.loads(ai_response_json)
+
+                    # Add timestamp and metadata to the response
+                    ai_response_data["timestamp"] = time.time()
+                    ai_response_data["isProcessing"] = False
+
+                    # Add or update metadata
+                    if "metadata" not in ai_response_data:
+                        ai_response_data["metadata"] = {}
+                    ai_response_data["metadata"].update({
+                        "using_fallback": False,
+                        "using_real_ai_response": True,
+                        "response_source": "multiagent_assistant"
+                    })
+
+                    # Send the final response directly
+                    await send_chat_frame(websocket, session_id, ai_response_data)
+
+                except json.JSONDecodeError as parse_error:
+                    logging.error(f"[WebSocket] Failed to parse AI response JSON: {str(parse_error)}")
+                    # Fallback: treat as plain text
+                    fallback_response = {
+                        "type": "text",
+                        "content": ai_response_json,
+                        "isProcessing": False,
+                        "timestamp": time.time(),
+                        "metadata": {
+                            "using_fallback": True,
+                            "using_real_ai_response": True,
+                            "response_source": "multiagent_assistant",
+                            "parse_error": str(parse_error)
+                        }
+                    }
+                    await send_chat_frame(websocket, session_id, fallback_response)
+                logging.info(f"[WebSocket] Sent final AI response")
+
+            except Exception as ai_error:
+                logging.error(f"[WebSocket] Error in AI processing: {str(ai_error)}")
+
+                # Send error response
+                error_response = {
+                    "type": "text",
+                    "content": "I'm sorry, I encountered an error processing your request. Please try again.",
+                    "isProcessing": False,
+                    "timestamp": time.time(),
+                    "metadata": {
+                        "error": True,
+                        "error_message": str(ai_error)
+                    }
+                }
+                await send_chat_frame(websocket, session_id, error_response)
+        finally:
+            await asyncio.to_thread(chat_session_store.end_turn, session_id, turn_id)
 
-# Function to clean up inactive chat sessions after a timeout
-async def cleanup_session_after_timeout(session_id, timeout_seconds):
-    """Clean up a chat session after a specified timeout if it's still inactive"""
-    await asyncio.sleep(timeout_seconds)
-    
-    if session_id in chat_sessions:
-        # Check if the session is still inactive
-        last_active = chat_sessions[session_id].get("last_active", 0)
-        time_since_active = time.time() - last_active
-        
-        if time_since_active >= timeout_seconds:
-            try:
-                # Put the message in the queue for the agent thread to process
-                if session_id in chat_sessions and "input_queue" in chat_sessions[session_id]:
-                    chat_sessions[session_id]["input_queue"].put(data)
-                    logging.info(f"[WebSocket] Added message to queue for processing")
-                    
-                    # Send an acknowledgment to the client that the message was received
-                    try:
-                        ack_message = json.dumps({"type": "ack", "timestamp": time.time(), "message": "Message received and being processed"})
-                        await websocket.send_text(ack_message)
-                        logging.info(f"[WebSocket] Sent acknowledgment to client")
-                    except Exception as ack_error:
-                        logging.error(f"[WebSocket] Error sending acknowledgment: {str(ack_error)}")
-                else:
-                    logging.error(f"[WebSocket] No input queue found for session {session_id}")
-                
-                # Remove the session
-                del chat_sessions[session_id]
-                logging.info(f"[WebSocket] Cleaned up inactive session: session_id={session_id}, inactive for {time_since_active:.2f} seconds")
-            except Exception as cleanup_error:
-                logging.error(f"[WebSocket] Error cleaning up session {session_id}: {str(cleanup_error)}")
-        else:
-            logging.info(f"[WebSocket] Session {session_id} still active, skipping cleanup")
-    else:
-        logging.info(f"[WebSocket] Session {session_id} no longer exists, no cleanup needed")
 
 @app.websocket("/ws/chat/{session_id}")
 async def websocket_chat(websocket: WebSocket, session_id: str):
     import logging
     logging.info(f"[WebSocket] Handler called for session_id={session_id}")
 
-    # Extract candidate ID from query parameters if present
+    # Extract candidate ID and the resume point (last frame seq the client received) from query parameters if present
     candidate_id = None
+    last_seq = None
     try:
         # Get query parameters
         query_params = websocket.query_params
         if query_params and "candidateId" in query_params:
             candidate_id = query_params.get("candidateId")
             logging.info(f"[WebSocket] Extracted candidateId from query params: {candidate_id}")
+        if query_params and query_params.get("lastSeq", "").isdigit():
+            last_seq = int(query_params.get("lastSeq"))
+            logging.info(f"[WebSocket] Resuming after frame {last_seq}")
     except Exception as query_err:
         logging.error(f"[WebSocket] Error extracting query parameters: {str(query_err)}")
     logging.info(f"[WebSocket] New connection attempt: session_id={session_id}")
@@ -939,31 +1151,18 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
     except Exception as header_err:
         logging.error(f"[WebSocket] Error accessing headers: {str(header_err)}")
     
-    # Create input queue if it doesn't exist yet
-    if session_id not in chat_sessions:
-        logging.info(f"[WebSocket] Creating new session: session_id={session_id}")
-        chat_sessions[session_id] = {
-            "input_queue": queue.Queue(),
-            "history": [],
-            "initialized": False,
-            "last_active": time.time(),
-            "connection_state": "CONNECTED",
-            "websocket": websocket,
-            "pending_messages": [],  # Initialize pending messages list
-            "candidate_id": candidate_id  # Store candidate ID in session
-        }
-        logging.info(f"[WebSocket] Stored candidateId in session: {candidate_id}")
-    elif candidate_id and ("candidate_id" not in chat_sessions[session_id] or chat_sessions[session_id]["candidate_id"] != candidate_id):
-        # Update candidate ID if it's changed
-        chat_sessions[session_id]["candidate_id"] = candidate_id
-        logging.info(f"[WebSocket] Updated candidateId in session: {candidate_id}")
-    
-    # Get or create input queue for this session
-    if "input_queue" not in chat_sessions[session_id]:
-        chat_sessions[session_id]["input_queue"] = queue.Queue()
-    
-    input_queue = chat_sessions[session_id]["input_queue"]
-    
+    # Resume the session if it is still in the store, otherwise start a new one
+    session = await asyncio.to_thread(chat_session_store.open, session_id, candidate_id)
+    if last_seq is None:
+        last_seq = session.get("delivered_seq", 0)
+    logging.info(f"[WebSocket] Session opened: session_id={session_id}, candidateId={candidate_id}")
+    ping_task = None
+    relay_task = None
+    # Held for the whole connection so local turns wake the relay instead of waiting for the next poll
+    frame_signal = session_frame_signal(session_id)
+    # Held for the whole connection so the session's turn limit survives between turns
+    turn_slots = session_turn_slot(session_id)
+
     try:
         # Accept the WebSocket connection with explicit CORS handling
         await websocket.accept()
@@ -984,21 +1183,7 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
             ping_message = json.dumps({"type": "ping", "timestamp": time.time()})
             await websocket.send_text(ping_message)
             logging.info(f"[WebSocket] Sent ping message to verify connection")
-            
-            # Check if there are any pending messages to send from previous connection
-            if session_id in chat_sessions and "pending_messages" in chat_sessions[session_id] and chat_sessions[session_id]["pending_messages"]:
-                pending_messages = chat_sessions[session_id]["pending_messages"]
-                logging.info(f"[WebSocket] Found {len(pending_messages)} pending messages to deliver")
-                
-                for pending_msg in pending_messages:
-                    try:
-                        await websocket.send_text(pending_msg)
-                        logging.info(f"[WebSocket] Delivered pending message: {pending_msg[:50]}...")
-                    except Exception as pending_error:
-                        logging.error(f"[WebSocket] Error sending pending message: {str(pending_error)}")
-                
-                # Clear pending messages after sending
-                chat_sessions[session_id]["pending_messages"] = []
+
         except Exception as confirm_error:
             logging.error(f"[WebSocket] Error sending confirmation message: {str(confirm_error)}")
             # Try a plain text message as fallback
@@ -1008,17 +1193,12 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
             except Exception as fallback_error:
                 logging.error(f"[WebSocket] Error sending fallback confirmation: {str(fallback_error)}")
         # Minimal async receive loop to keep the connection open and log messages
-        # Update last active time for the session
-        chat_sessions[session_id]["last_active"] = time.time()
     
         # Agent thread function removed - now processing messages directly in main loop
 
         # WebSocket timeout is handled by FastAPI automatically
         logging.info(f"[WebSocket] WebSocket connection established with default timeout")
             
-        # Start a background task for ping/pong
-        ping_task = None
-        
         from starlette.websockets import WebSocketState
 
         async def ping_pong():
@@ -1040,13 +1220,16 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
             except Exception as e:
                 logging.error(f"[WebSocket] Error in ping_pong: {str(e)}")
         
-        # Start the ping task
+        # Start the ping task, and the relay that delivers missed frames first, then new ones
         ping_task = asyncio.create_task(ping_pong())
+        relay_task = asyncio.create_task(relay_chat_frames(websocket, session_id, last_seq, frame_signal))
+        turn_tasks = set()
         
         try:
             while True:
                 # Wait for messages from the client
                 message = await websocket.receive_text()
+                await asyncio.to_thread(chat_session_store.touch, session_id)
                 logging.info(f"[WebSocket] Received user message from frontend: {message[:100]}...")
                 
                 try:
@@ -1061,6 +1244,11 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
                     elif data.get("type") == "pong":
                         logging.debug(f"[WebSocket] Received pong from client")
                         continue
+                    elif data.get("type") == "ack":
+                        # The client has every frame up to seq; drop them from the outbox
+                        if isinstance(data.get("seq"), int):
+                            await asyncio.to_thread(chat_session_store.mark_delivered, session_id, data["seq"], True)
+                        continue
                     
                     # Accept both {text: ...} and {type: 'text', content: ...} message formats
                     user_message = (
@@ -1078,79 +1266,10 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
                         logging.warning(f"[WebSocket] Received empty message")
                         continue
                     
-                    # Send processing acknowledgment immediately
-                    processing_message = {
-                        "type": "text",
-                        "content": f"I received your message: '{user_message}'. Processing your request...",
-                        "isProcessing": True
-                    }
-                    await websocket.send_text(json.dumps(processing_message))
-                    logging.info(f"[WebSocket] Sent processing acknowledgment")
-                    
-                    # Process the message with multiagent assistant
-                    try:
-                        from services.chatbot.multiagent_assistant import chat_step
-                        
-                        # Call chat_step with optional candidate_id
-                        ai_response_json = chat_step(
-                            user_message=user_message,
-                            chat_history=None,
-                            candidate_id=candidate_id
-                        )
-                        
-                        # Parse the JSON response from chat_step
-                        try:
-                            ai_response_data = json.loads(ai_response_json)
-                            
-                            # Add timestamp and metadata to the response
-                            ai_response_data["timestamp"] = time.time()
-                            ai_response_data["isProcessing"] = False
-                            
-                            # Add or update metadata
-                            if "metadata" not in ai_response_data:
-                                ai_response_data["metadata"] = {}
-                            ai_response_data["metadata"].update({
-                                "using_fallback": False,
-                                "using_real_ai_response": True,
-                                "response_source": "multiagent_assistant"
-                            })
-                            
-                            # Send the final response directly
-                            await websocket.send_text(json.dumps(ai_response_data))
-                            
-                        except json.JSONDecodeError as parse_error:
-                            logging.error(f"[WebSocket] Failed to parse AI response JSON: {str(parse_error)}")
-                            # Fallback: treat as plain text
-                            fallback_response = {
-                                "type": "text",
-                                "content": ai_response_json,
-                                "isProcessing": False,
-                                "timestamp": time.time(),
-                                "metadata": {
-                                    "using_fallback": True,
-                                    "using_real_ai_response": True,
-                                    "response_source": "multiagent_assistant",
-                                    "parse_error": str(parse_error)
-                                }
-                            }
-                            await websocket.send_text(json.dumps(fallback_response))
-                        logging.info(f"[WebSocket] Sent final AI response")
-                        
-                    except Exception as ai_error:
-                        logging.error(f"[WebSocket] Error in AI processing: {str(ai_error)}")
-                        
-                        # Send error response
-                        error_response = {
-                            "type": "text",
-                            "content": "I'm sorry, I encountered an error processing your request. Please try again.",
-                            "isProcessing": False,
-                            "timestamp": time.time(),
-                            "metadata": {
-                                "error": True,
-                                "error_message": str(ai_error)
-                            }
-                        }
-                        await websocket.send_text(json.dumps(error_response))
+                    # Run the turn as a task so pings and further messages keep flowing meanwhile
+                    turn_task = asyncio.create_task(run_chat_turn(websocket, session_id, user_message, candidate_id))
+                    turn_tasks.add(turn_task)
+                    turn_task.add_done_callback(turn_tasks.discard)
                         
                 except json.JSONDecodeError:
                     logging.error(f"[WebSocket] Invalid JSON received: {message}")
@@ -1170,8 +1289,9 @@ async def websocket_chat(websocket: WebSocket, session_id: str):
         # Clean up
         if ping_task:
             ping_task.cancel()
-        if session_id in chat_sessions:
-            chat_sessions[session_id]["last_active"] = time.time()
+        if relay_task:
+            relay_task.cancel()
+        await asyncio.to_thread(chat_session_store.touch, session_id)
         logging.info(f"[WebSocket] WebSocket connection closed for session {session_id}")
 
 
@@ -3,7 +3,8 @@ from common.database.cosmos import db_operations
 from services.resume_ranking.resume_ranker.multiagent_resume_ranker import initiate_chat
 
 def rerank_candidates_with_zero(job_id):
-    candidates = db_operations.fetch_top_k_candidates_by_count(job_id, top_k=1000)
+    candidates = db_operations.fetch_top_k_candidates_by_count(
+        job_id, top_k=1000, fields=db_operations.CANDIDATE_LIST_FIELDS + ['parsed_resume'])
     job_description = db_operations.fetch_job_description(job_id)
     job_questionnaire_doc = db_operations.fetch_job_description_questionnaire(job_id)
     job_questionnaire_id = job_questionnaire_doc['id'] if job_questionnaire_doc else None
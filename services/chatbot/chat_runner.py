@@ -0,0 +1,121 @@
+"""
+Chat turns off the event loop.
+
+chat_step runs a whole autogen GroupChat synchronously - several LLM round trips and backend
+calls - so calling it from the WebSocket handler blocks every other socket, health check and
+API request until the conversation ends. run_turn() executes it on a dedicated thread pool and
+relays the messages agents produce along the way back to the event loop as they happen:
+
+    response_json = await chat_runner.run_turn(message, candidate_id, on_event=send_frame)
+
+on_event is awaited on the event loop for every intermediate agent message (a dict with type
+"agent_message", sender and content). The pool is sized from config chat.max_workers or the
+CHAT_WORKERS environment variable and split across the API worker processes
+(WEB_CONCURRENCY); chat.max_turns_per_session bounds how many turns one
+session may run at once (see session_turn_limit). Each GroupChat run checks out its own agent
+graph from multiagent_assistant.agent_pool, so turns of different sessions run in parallel.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from common.utils.config_utils import load_config, per_worker
+
+config = load_config()
+chat_config = (config.get('chat') or {}) if isinstance(config, dict) else {}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _max_workers():
+    workers = os.getenv("CHAT_WORKERS") or chat_config.get('max_workers')
+    return per_worker(workers) if workers else per_worker(4)
+
+
+def session_turn_limit():
+    return max(1, int(chat_config.get('max_turns_per_session', 1)))
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = _max_workers()
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat")
+            print(f"[INFO] Chat turn pool started with {workers} threads")
+        return _executor
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _log_abandoned_turn(turn):
+    """Done-callback for a turn whose caller went away: the chat thread still runs to the end."""
+    if turn.cancelled():
+        return
+    error = turn.exception()
+    if error is not None:
+        print(f"[ERROR] Abandoned chat turn failed: {error}")
+    else:
+        print("[INFO] Abandoned chat turn finished")
+
+
+async def _relay(on_event, event, relay_error):
+    """Send one event unless an earlier send failed; returns the first send error."""
+    if relay_error is not None:
+        return relay_error
+    try:
+        await on_event(event)
+    except Exception as e:
+        print(f"[WARN] Relaying a chat event failed, finishing the turn without streaming: {e}")
+        return e
+    return None
+
+
+async def run_turn(user_message, candidate_id=None, on_event=None, session_id=None):
+    """
+    Run chat_step on the chat pool; returns its JSON response string.
+    If on_event raises, relaying stops but the turn is still awaited, then the error is raised.
+    """
+    from services.chatbot.multiagent_assistant import chat_step
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def emit(event):
+        # Called on the chat thread: hand the event over to the loop
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    turn = loop.run_in_executor(get_executor(), functools.partial(
+        chat_step, user_message, chat_history=None, candidate_id=candidate_id,
+        on_message=emit if on_event else None, session_id=session_id))
+    relay_error = None
+    next_event = None
+    try:
+        while True:
+            next_event = asyncio.ensure_future(events.get())
+            done, _ = await asyncio.wait({next_event, turn}, return_when=asyncio.FIRST_COMPLETED)
+            if next_event not in done:
+                break
+            relay_error = await _relay(on_event, next_event.result(), relay_error)
+        while not events.empty():
+            relay_error = await _relay(on_event, events.get_nowait(), relay_error)
+    finally:
+        if next_event is not None:
+            next_event.cancel()
+        if not turn.done():
+            # run_turn itself was cancelled; the thread cannot be stopped, so log how it ends
+            turn.add_done_callback(_log_abandoned_turn)
+    if relay_error is not None:
+        if not turn.cancelled() and turn.exception() is not None:
+            print(f"[ERROR] Chat turn failed after relaying stopped: {turn.exception()}")
+        raise relay_error
+    return turn.result()
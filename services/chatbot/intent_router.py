@@ -0,0 +1,223 @@
+"""
+Fast path in front of the multi-agent GroupChat.
+
+Most chat turns are simple commands ("top 5 for job 123456", "set candidate abc to shortlisted
+for job 123456") that end in a single backend call, yet the GroupChat spends several LLM rounds
+picking speakers before it gets there. route() recognises those commands and dispatch() calls
+the backend function directly:
+
+1. regular expressions extract the intent and its arguments;
+2. if none match but the message looks like such a command, one small JSON-mode LLM call
+   classifies it against the same schema (config chat.router_llm_fallback, chat.router_model);
+3. anything else - open-ended requests such as "email the top 5 ...", or an intent with
+   missing or invalid arguments - returns None and the caller escalates to the GroupChat.
+
+dispatch() returns the same response dicts chat_step produces (type topCandidates / text).
+"""
+import json
+import logging
+import re
+import threading
+from datetime import datetime
+
+from common.utils.config_utils import load_config
+
+logger = logging.getLogger(__name__)
+
+config = load_config()
+chat_config = (config.get('chat') or {}) if isinstance(config, dict) else {}
+
+LLM_FALLBACK = bool(chat_config.get('router_llm_fallback', True))
+ROUTER_MODEL = chat_config.get('router_model')
+DEFAULT_TOP_K = int(chat_config.get('router_default_top_k', 10))
+MAX_TOP_K = int(chat_config.get('router_max_top_k', 100))
+
+TOP_CANDIDATES = "top_candidates"
+UPDATE_STATUS = "update_status"
+OTHER = "other"
+
+# "job 123456", "job id: 123456", "req #REQ-42"; ids must contain a digit so words ("jobs", "required",
+# "this job") are never taken for one
+JOB_ID_FORMAT = re.compile(r"[A-Za-z0-9-]*\d[\w-]*")
+JOB_ID = r"(?:job(?:\s*id)?|req(?:uisition)?)\b\s*[:#]?\s*(?P<job>" + JOB_ID_FORMAT.pattern + ")"
+
+TOP_CANDIDATES_PATTERNS = [
+    re.compile(r"\b(?:top|best)\s+(?P<k>\d+)?\s*(?:candidates?|applicants?|profiles?)?\b.*?\b" + JOB_ID, re.IGNORECASE),
+    re.compile(r"\b(?:show|list|get|fetch)\b.*?\b(?P<k>\d+)?\s*(?:top|best)\s+(?:candidates?|applicants?)\b.*?\b" + JOB_ID, re.IGNORECASE),
+]
+UPDATE_STATUS_PATTERN = re.compile(
+    r"^\s*(?:please\s+)?(?:set|mark|move|update|change)\s+(?:the\s+)?(?:status\s+of\s+)?(?:candidate\s+(?:id\s+)?)?"
+    r"(?P<candidate>[\w.@+-]+)(?:'s)?\s+(?:status\s+)?(?:to|as)\s+(?P<status>[A-Za-z][A-Za-z ]*?)"
+    r"(?:\s+(?:for|in|on)\s+" + JOB_ID + r")?\s*[.!]?\s*$",
+    re.IGNORECASE
+)
+# Requests that ask for more than the lookup itself ("email the top 5 ...") need the agents
+OPEN_ENDED = re.compile(r"\b(e-?mail|mail|send|write|draft|schedule|compare|explain|why|summari[sz]e|analy[sz]e)\b", re.IGNORECASE)
+# Messages that might still be one of the commands above; everything else skips the LLM call
+COMMAND_HINT = re.compile(r"\b(top|best|rank\w*|status|shortlist\w*|reject\w*|interview\w*|offer|withdraw\w*|mark|set)\b", re.IGNORECASE)
+
+STATUS_ALIASES = {
+    "shortlist": "Shortlisted",
+    "reject": "Rejected",
+    "withdraw": "Withdrawn",
+    "under review": "Application Under Review",
+    "review": "Application Under Review",
+    "offer": "Offer Extended",
+    "offered": "Offer Extended",
+    "interview invite": "Interview Invite Sent",
+    "invited": "Interview Invite Sent",
+    "interview scheduled": "Interview Scheduled",
+    "scheduled": "Interview Scheduled",
+}
+
+_stats_lock = threading.Lock()
+stats = {"regex": 0, "llm": 0, "escalated": 0, "llm_errors": 0}
+
+
+def _count(metric):
+    with _stats_lock:
+        stats[metric] += 1
+
+
+def router_stats():
+    with _stats_lock:
+        return dict(stats)
+
+
+def normalize_status(status):
+    """Map free-form status text onto one of the valid application statuses, or None."""
+    from common.database.cosmos.db_operations import VALID_APPLICATION_STATUSES
+    text = (status or "").strip().lower()
+    for valid in VALID_APPLICATION_STATUSES:
+        if text == valid.lower():
+            return valid
+    if text in STATUS_ALIASES:
+        return STATUS_ALIASES[text]
+    stem = text[:-2] if text.endswith("ed") else text
+    return STATUS_ALIASES.get(stem)
+
+
+def _top_k(value):
+    try:
+        k = int(value) if value not in (None, "") else DEFAULT_TOP_K
+    except (TypeError, ValueError):
+        return None
+    return k if 0 < k <= MAX_TOP_K else None
+
+
+def _job_id(value):
+    job_id = str(value).strip() if value not in (None, "") else ""
+    return job_id if JOB_ID_FORMAT.fullmatch(job_id) else None
+
+
+def _valid(intent):
+    """The intent with normalized arguments, or None when something required is missing."""
+    args = intent.get("args") or {}
+    if intent.get("intent") == TOP_CANDIDATES:
+        top_k = _top_k(args.get("top_k"))
+        job_id = _job_id(args.get("job_id"))
+        if job_id and top_k:
+            return {"intent": TOP_CANDIDATES, "args": {"job_id": job_id, "top_k": top_k}}
+    elif intent.get("intent") == UPDATE_STATUS:
+        job_id = _job_id(args.get("job_id"))
+        if not (job_id and args.get("candidate_id")):
+            return None
+        status = normalize_status(args.get("status"))
+        if status:
+            return {"intent": UPDATE_STATUS, "args": {
+                "job_id": job_id, "candidate_id": str(args["candidate_id"]), "status": status}}
+    return None
+
+
+def match_regex(user_message):
+    match = UPDATE_STATUS_PATTERN.match(user_message)
+    if match:
+        return {"intent": UPDATE_STATUS, "args": {
+            "candidate_id": match.group("candidate"), "status": match.group("status"), "job_id": match.group("job")}}
+    for pattern in TOP_CANDIDATES_PATTERNS:
+        match = pattern.search(user_message)
+        if match:
+            return {"intent": TOP_CANDIDATES, "args": {"job_id": match.group("job"), "top_k": match.group("k")}}
+    return None
+
+
+def classify_with_llm(user_message):
+    """One small JSON-mode completion that extracts the intent and its arguments."""
+    from common.llm import gateway
+    from common.database.cosmos.db_operations import VALID_APPLICATION_STATUSES
+    system_prompt = (
+        "Classify the recruiter's request. Reply with a JSON object only: "
+        '{"intent": "top_candidates" | "update_status" | "other", '
+        '"job_id": string or null, "top_k": integer or null, "candidate_id": string or null, "status": string or null}. '
+        "Use top_candidates only for listing the best-ranked candidates of one job, and update_status only for "
+        f"changing one candidate's application status to one of: {', '.join(VALID_APPLICATION_STATUSES)}. "
+        "Never invent ids; use null when the request does not contain them. Anything else is other."
+    )
+    kwargs = {"model": ROUTER_MODEL} if ROUTER_MODEL else {}
+    completion = gateway.chat_completion(
+        priority=gateway.INTERACTIVE,
+        messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_message}],
+        temperature=0,
+        max_tokens=100,
+        response_format={"type": "json_object"},
+        **kwargs
+    )
+    data = json.loads(completion.choices[0].message.content or "{}")
+    return {"intent": data.get("intent") or OTHER, "args": {
+        "job_id": data.get("job_id"), "top_k": data.get("top_k"),
+        "candidate_id": data.get("candidate_id"), "status": data.get("status")}}
+
+
+def route(user_message):
+    """The intent to handle directly ({"intent", "args", "source"}), or None to escalate to the GroupChat."""
+    if OPEN_ENDED.search(user_message):
+        _count("escalated")
+        return None
+    intent = match_regex(user_message)
+    if intent is not None:
+        valid = _valid(intent)
+        if valid is not None:
+            _count("regex")
+            return dict(valid, source="regex")
+    if LLM_FALLBACK and COMMAND_HINT.search(user_message):
+        try:
+            valid = _valid(classify_with_llm(user_message))
+        except Exception as e:
+            _count("llm_errors")
+            logger.warning(f"[INTENT_ROUTER] Classification failed, escalating: {e}")
+            valid = None
+        if valid is not None:
+            _count("llm")
+            return dict(valid, source="llm")
+    _count("escalated")
+    return None
+
+
+def _response(payload, intent):
+    payload["timestamp"] = datetime.now().isoformat()
+    payload["metadata"] = {"source": "intent_router", "intent": intent["intent"], "classified_by": intent["source"]}
+    return payload
+
+
+def dispatch(user_message):
+    """Handle the message directly when it is a simple command; None means use the GroupChat."""
+    intent = route(user_message)
+    if intent is None:
+        return None
+    args = intent["args"]
+    logger.info(f"[INTENT_ROUTER] {intent['intent']} via {intent['source']}: {args}")
+    from common.database.cosmos.db_operations import fetch_top_k_candidates_by_count, update_candidate_status_by_id
+
+    if intent["intent"] == TOP_CANDIDATES:
+        result = fetch_top_k_candidates_by_count(args["job_id"], args["top_k"])
+        candidates = json.loads(result) if isinstance(result, str) else (result or [])
+        if not candidates:
+            return _response({"type": "text", "content": f"No candidates found for job {args['job_id']}."}, intent)
+        return _response({
+            "type": "topCandidates",
+            "candidates": candidates,
+            "message": f"Top {len(candidates)} candidates for job {args['job_id']}."
+        }, intent)
+
+    result = update_candidate_status_by_id(args["job_id"], args["candidate_id"], args["status"])
+    return _response({"type": "text", "content": result}, intent)
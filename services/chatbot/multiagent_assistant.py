@@ -4,6 +4,12 @@ import os
 sys.path.insert(0, os.getcwd())
 import json
 import logging
+import queue
+import threading
+import time
+import contextvars
+from collections import OrderedDict
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from datetime import datetime
 import autogen
@@ -16,13 +22,12 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 # Azure OpenAI config
-config_list = [{
-    "api_type": os.getenv("api_type", "azure"),
-    "api_key": os.getenv("AZURE_OPENAI_API_KEY"),
-    "base_url": os.getenv("AZURE_OPENAI_ENDPOINT"),
-    "api_version": os.getenv("api_version", "2024-08-01-preview"),
-    "model": os.getenv("deployment_name", "gpt-4o"),
-}]
+from common.llm import gateway
+config_list = gateway.autogen_config_list()
+
+from common.utils.config_utils import load_config, per_worker
+_config = load_config()
+chat_config = (_config.get('chat') or {}) if isinstance(_config, dict) else {}
 
 # === SYSTEM PROMPT STRINGS (imported from prompts module) ===
 from services.prompts.multiagent_assistant_prompts import (
@@ -46,14 +51,6 @@ from common.database.cosmos.db_operations import (
 from services.chatbot.functions import send_email
 
 
-# Canonical agent definitions
-user_proxy = autogen.UserProxyAgent(
-    name="UserProxy",
-    human_input_mode="NEVER",
-    max_consecutive_auto_reply=10,
-    system_message=initiate_chat_system_message,
-    code_execution_config={"work_dir": "./tmp", "use_docker": False},
-)
 # === OpenAI function-calling schemas for backend functions ===
 fetch_top_k_candidates_by_count_schema = {
     "name": "fetch_top_k_candidates_by_count",
@@ -105,60 +102,257 @@ execute_sql_query_schema = {
     }
 }
 
-executor_agent = autogen.AssistantAgent(
-    name="function_executor_agent",
-    system_message=executor_agent_system_message,
-    llm_config={
-        "config_list": config_list,
-        "functions": [
-            fetch_top_k_candidates_by_count_schema,
-            send_email_schema,
-            update_candidate_status_by_id_schema,
-            execute_sql_query_schema
-        ]
-    },
-)
-executor_agent.register_function(
-    function_map={
-        "fetch_top_k_candidates_by_count": fetch_top_k_candidates_by_count,
-        "send_email": send_email,
-        "update_candidate_status_by_id": update_candidate_status_by_id,
-        "execute_sql_query": execute_sql_query
-    }
-)
-fetcher_agent = autogen.AssistantAgent(
-    name="top_candidate_fetcher",
-    system_message=fetcher_agent_system_message,
-    llm_config={"config_list": config_list},
-)
-email_agent = autogen.AssistantAgent(
-    name="email_service_agent",
-    system_message=email_agent_system_message,
-    llm_config={"config_list": config_list},
-)
-job_desc_creator_agent = autogen.AssistantAgent(
-    name="job_desc_creator_agent",
-    system_message=job_desc_creator_system_message,
-    llm_config={"config_list": config_list},
-)
-sql_query_generator_agent = autogen.AssistantAgent(
-    name="sql_query_generator_agent",
-    system_message=sql_query_generator_system_message,
-    llm_config={"config_list": config_list},
-)
+# Callback for the chat_step running on this thread; receives each agent message as it is sent
+_message_callback = contextvars.ContextVar("chat_message_callback", default=None)
+
+def _stream_message(sender, message, recipient, silent):
+    callback = _message_callback.get()
+    if callback is not None:
+        content = message.get("content") if isinstance(message, dict) else message
+        if content:
+            try:
+                callback({
+                    "type": "agent_message",
+                    "sender": getattr(sender, "name", str(sender)),
+                    "content": content if isinstance(content, str) else json.dumps(content, default=str),
+                })
+            except Exception as e:
+                logger.warning(f"[CHAT_STEP] Could not stream agent message: {e}")
+    return message
+
+
+class AgentGraph:
+    """One complete set of agents with its own GroupChat; used by a single conversation at a time."""
+
+    def __init__(self):
+        # Canonical agent definitions
+        self.user_proxy = autogen.UserProxyAgent(
+            name="UserProxy",
+            human_input_mode="NEVER",
+            max_consecutive_auto_reply=10,
+            system_message=initiate_chat_system_message,
+            code_execution_config={"work_dir": "./tmp", "use_docker": False},
+        )
+        executor_agent = autogen.AssistantAgent(
+            name="function_executor_agent",
+            system_message=executor_agent_system_message,
+            llm_config={
+                "config_list": config_list,
+                "functions": [
+                    fetch_top_k_candidates_by_count_schema,
+                    send_email_schema,
+                    update_candidate_status_by_id_schema,
+                    execute_sql_query_schema
+                ]
+            },
+        )
+        executor_agent.register_function(
+            function_map={
+                "fetch_top_k_candidates_by_count": fetch_top_k_candidates_by_count,
+                "send_email": send_email,
+                "update_candidate_status_by_id": update_candidate_status_by_id,
+                "execute_sql_query": execute_sql_query
+            }
+        )
+        fetcher_agent = autogen.AssistantAgent(
+            name="top_candidate_fetcher",
+            system_message=fetcher_agent_system_message,
+            llm_config={"config_list": config_list},
+        )
+        email_agent = autogen.AssistantAgent(
+            name="email_service_agent",
+            system_message=email_agent_system_message,
+            llm_config={"config_list": config_list},
+        )
+        job_desc_creator_agent = autogen.AssistantAgent(
+            name="job_desc_creator_agent",
+            system_message=job_desc_creator_system_message,
+            llm_config={"config_list": config_list},
+        )
+        sql_query_generator_agent = autogen.AssistantAgent(
+            name="sql_query_generator_agent",
+            system_message=sql_query_generator_system_message,
+            llm_config={"config_list": config_list},
+        )
+
+        # Define the Group Chat with all agents
+        self.groupchat = autogen.GroupChat(
+            agents=[self.user_proxy, fetcher_agent, job_desc_creator_agent, email_agent, executor_agent, sql_query_generator_agent],
+            messages=[],
+            max_round=10,
+        )
+        self.manager = autogen.GroupChatManager(groupchat=self.groupchat, llm_config={"config_list": config_list})
+
+        # Every speaker sends its turn to the manager, so hooking the agents (not the manager, which
+        # re-broadcasts each message to everyone) yields each message exactly once
+        for agent in self.groupchat.agents:
+            if agent is not self.user_proxy and hasattr(agent, "register_hook"):
+                agent.register_hook("process_message_before_send", _stream_message)
+
+    def reset(self):
+        """Forget the previous conversation so the graph can serve another session."""
+        self.groupchat.reset()
+        for agent in self.groupchat.agents + [self.manager]:
+            agent.reset()
+
+    def run(self, message):
+        return self.user_proxy.initiate_chat(self.manager, message=message)
+
+
+class AgentGraphPool:
+    """
+    A bounded pool of AgentGraphs. A turn checks one out for its whole GroupChat run and returns
+    it reset, so concurrent sessions never share agents and building a graph is not paid per
+    turn. Graphs are built up to `size` on demand (`prewarm` of them up front); checkout()
+    blocks while all of them are busy.
+    """
+
+    def __init__(self, size, prewarm=0):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        for _ in range(min(prewarm, size)):
+            self._created += 1
+            self._idle.put(AgentGraph())
 
-# Define the Group Chat with all agents
-groupchat = autogen.GroupChat(
-    agents=[user_proxy, fetcher_agent, job_desc_creator_agent, email_agent, executor_agent, sql_query_generator_agent],
-    messages=[],
-    max_round=10,
+    def checkout(self, timeout=None):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if not can_create:
+            return self._idle.get(timeout=timeout)
+        try:
+            return AgentGraph()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def checkin(self, graph):
+        try:
+            graph.reset()
+        except Exception as e:
+            # A graph that cannot be reset is dropped; a fresh one is built when needed
+            logger.warning(f"[AGENT_POOL] Discarding agent graph that failed to reset: {e}")
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(graph)
+
+    @contextmanager
+    def graph(self, timeout=None):
+        graph = self.checkout(timeout)
+        try:
+            yield graph
+        finally:
+            self.checkin(graph)
+
+    def stats(self):
+        with self._lock:
+            return {"size": self.size, "created": self._created, "idle": self._idle.qsize()}
+
+
+class SessionMemory:
+    """Recent (user message, answer) turns per session_id; sessions idle for idle_seconds are dropped."""
+
+    def __init__(self, max_turns, idle_seconds, max_sessions):
+        self.max_turns = max_turns
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Oldest first: stop at the first session that is neither idle nor over the cap
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry["last_used"] < self.idle_seconds and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def history(self, session_id):
+        with self._lock:
+            self._evict(time.time())
+            entry = self._sessions.get(session_id)
+            return list(entry["turns"]) if entry else []
+
+    def remember(self, session_id, user_message, answer):
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None) or {"turns": []}
+            entry["turns"] = (entry["turns"] + [(user_message, answer)])[-self.max_turns:]
+            entry["last_used"] = now
+            self._sessions[session_id] = entry
+            self._evict(now)
+
+    def forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+class SharedSessionMemory:
+    """SessionMemory kept in the chat session store, so any worker process can continue a session."""
+
+    def __init__(self, store, max_turns):
+        self.store = store
+        self.max_turns = max_turns
+
+    def history(self, session_id):
+        return self.store.turns(session_id)
+
+    def remember(self, session_id, user_message, answer):
+        self.store.remember_turn(session_id, user_message, answer, self.max_turns)
+
+    def forget(self, session_id):
+        self.store.backend.update(session_id, lambda session: session.__setitem__("turns", []))
+
+    def __len__(self):
+        return len(self.store.backend)
+
+
+def _session_memory():
+    from services.chatbot.session_store import get_session_store
+    max_turns = int(chat_config.get('memory_turns', 6))
+    store = get_session_store()
+    if store.backend.shared:
+        return SharedSessionMemory(store, max_turns)
+    return SessionMemory(
+        max_turns=max_turns,
+        idle_seconds=float(chat_config.get('session_idle_seconds', 1800)),
+        max_sessions=int(chat_config.get('max_sessions', 1000))
+    )
+
+
+# agent_pool_size is for the whole host, like chat.max_workers
+_agent_pool_size = per_worker(max(1, int(chat_config.get('agent_pool_size', 4))))
+agent_pool = AgentGraphPool(
+    size=_agent_pool_size,
+    prewarm=min(_agent_pool_size, int(chat_config.get('agent_pool_prewarm', 0)))
 )
+session_memory = _session_memory()
 
-manager = autogen.GroupChatManager(groupchat=groupchat, llm_config={"config_list": config_list})
+def message_with_memory(session_id, user_message):
+    """Prefix the session's recent turns so a pooled (stateless) agent graph can follow up on them."""
+    turns = session_memory.history(session_id) if session_id else []
+    if not turns:
+        return user_message
+    previous = "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in turns)
+    return f"Conversation so far:\n{previous}\n\nCurrent request: {user_message}"
 
 def initiate_chat():
     """Initiate the conversation with the User Proxy (single entry point)"""
-    user_proxy.initiate_chat(manager, message=initiate_chat_system_message)
+    with agent_pool.graph() as graph:
+        graph.run(initiate_chat_system_message)
 
 def extract_job_info_from_message(user_message):
     # Very basic extraction for demo: look for job title after 'for' or 'as'
@@ -173,7 +367,7 @@ def extract_job_info_from_message(user_message):
         # Add more fields as needed
     }
 
-def chat_step(user_message: str, chat_history=None, candidate_id=None):
+def chat_step(user_message: str, chat_history=None, candidate_id=None, on_message=None, session_id=None):
     # Detect job description generation intent
     if any(kw in user_message.lower() for kw in ['generate job description', 'job description for', 'create job description']):
         # Extract info from user message
@@ -193,6 +387,17 @@ def chat_step(user_message: str, chat_history=None, candidate_id=None):
                 'autofill': True
             }
         })
+    # Simple commands (top-K lookups, status changes) call the backend directly
+    from services.chatbot import intent_router
+    try:
+        routed = intent_router.dispatch(user_message)
+    except Exception as e:
+        logger.warning(f"[CHAT_STEP] Intent router failed, using the groupchat: {e}")
+        routed = None
+    if routed is not None:
+        if session_id:
+            session_memory.remember(session_id, user_message, routed.get("message") or routed.get("content") or "")
+        return json.dumps(routed)
     # ... (existing logic for other agents/tasks) ...
     """
     Process a single user message and return a JSON-formatted response for the frontend.
@@ -200,6 +405,8 @@ def chat_step(user_message: str, chat_history=None, candidate_id=None):
         user_message (str): The user's message
         chat_history (list, optional): Previous chat messages
         candidate_id (str, optional): Candidate context ID
+        on_message (callable, optional): Called with each intermediate agent message (a dict)
+        session_id (str, optional): Chat session whose recent turns are given to the agents as memory
     Returns:
         str: JSON string with AI response (type, content, and candidate info if relevant)
     """
@@ -235,12 +442,16 @@ def chat_step(user_message: str, chat_history=None, candidate_id=None):
         logger.info("[CHAT_STEP] Running message through groupchat...")
         ai_response = None
         # Main multiagent workflow using autogen API (reference style)
-        ai_response = user_proxy.initiate_chat(
-            manager,
-            message=user_message
-        )
+        callback_token = _message_callback.set(on_message)
+        try:
+            with agent_pool.graph() as graph:
+                ai_response = graph.run(message_with_memory(session_id, user_message))
+                # Copy before the graph is reset and handed to another session
+                chat_history = getattr(ai_response, "chat_history", None)
+                chat_history = list(chat_history) if isinstance(chat_history, list) else chat_history
+        finally:
+            _message_callback.reset(callback_token)
         # Extract the last non-empty message from the chat history for the frontend
-        chat_history = getattr(ai_response, "chat_history", None)
         if chat_history and isinstance(chat_history, list):
             last_message = next((msg for msg in reversed(chat_history) if msg.get('content')), None)
             if last_message:
@@ -249,6 +460,8 @@ def chat_step(user_message: str, chat_history=None, candidate_id=None):
                 response_content = "No response generated."
         else:
             response_content = str(ai_response)
+        if session_id:
+            session_memory.remember(session_id, user_message, response_content)
         # Try to extract a candidate list from the function call result in chat history
         candidate_list = None
         if chat_history and isinstance(chat_history, list):
@@ -0,0 +1,415 @@
+"""
+Bounded store for WebSocket chat session state.
+
+A session is a small JSON document - candidate_id, created_at, last_active, the recent
+conversation turns and an outbox of chat frames. Every frame a turn produces is appended to
+the outbox with the session's next sequence number (append_frame) and the newest
+frame_buffer_size frames are kept. A connection delivers frames_after(the last sequence number
+it sent), so a client that reconnects - to any worker - passes the last seq it received and gets
+exactly the frames it missed, including those of a turn still running on another worker.
+
+Sessions expire ttl_seconds after their last activity, and once there are more than
+max_sessions the least recently active ones are evicted. reap() applies both; run_reaper()
+calls it periodically from the API's event loop.
+
+Backends:
+- SQLiteSessionBackend: a shared file, so sessions survive a worker restart and are visible
+  to every worker on the host (the default)
+- MemorySessionBackend: per-process OrderedDict in LRU order, for a single worker
+
+Live objects (the WebSocket, per-turn semaphores) are not session state and stay with the
+connection. Settings come from the `chat.session_store` section of config/config.yaml.
+"""
+import asyncio
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from common.utils.config_utils import load_config
+
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class MemorySessionBackend:
+    shared = False
+
+    def __init__(self):
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return copy.deepcopy(session) if session is not None else None
+
+    def put(self, session_id, session):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = copy.deepcopy(session)
+
+    def update(self, session_id, change):
+        """Apply change(session) atomically; returns the new session or None if it does not exist."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return None
+            change(session)
+            self._sessions[session_id] = session
+            return copy.deepcopy(session)
+
+    def get_or_create(self, session_id, change, new_session, is_live):
+        """
+        Apply change(session) to a live session, or store new_session in place of a missing or
+        dead one, atomically. Returns (session, outcome), outcome being "updated", "created" or
+        "replaced" (a dead session was replaced).
+        """
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None and is_live(session):
+                change(session)
+                outcome = "updated"
+            else:
+                outcome = "created" if session is None else "replaced"
+                session = copy.deepcopy(new_session)
+            self._sessions[session_id] = session
+            return copy.deepcopy(session), outcome
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def evict(self, expired_before, max_sessions):
+        with self._lock:
+            removed = 0
+            # LRU order: the first entries are the least recently active
+            while self._sessions:
+                session_id, session = next(iter(self._sessions.items()))
+                if session.get("last_active", 0) >= expired_before and len(self._sessions) <= max_sessions:
+                    break
+                del self._sessions[session_id]
+                removed += 1
+            return removed
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+class SQLiteSessionBackend:
+    shared = True
+
+    def __init__(self, path, table="chat_sessions"):
+        self.path = path
+        self.table = table
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    session_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    last_active REAL NOT NULL
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_last_active ON {table} (last_active)")
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def get(self, session_id):
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT data FROM {self.table} WHERE session_id = ?", (session_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+        finally:
+            conn.close()
+
+    def put(self, session_id, session):
+        conn = self._connect()
+        try:
+            conn.execute(f"INSERT OR REPLACE INTO {self.table} (session_id, data, last_active) VALUES (?, ?, ?)",
+                         (session_id, json.dumps(session), session.get("last_active", time.time())))
+        finally:
+            conn.close()
+
+    def update(self, session_id, change):
+        conn = self._connect()
+        try:
+            # BEGIN IMMEDIATE serializes read-modify-write across workers
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(f"SELECT data FROM {self.table} WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            session = json.loads(row[0])
+            change(session)
+            conn.execute(f"UPDATE {self.table} SET data = ?, last_active = ? WHERE session_id = ?",
+                         (json.dumps(session), session.get("last_active", time.time()), session_id))
+            conn.execute("COMMIT")
+            return session
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get_or_create(self, session_id, change, new_session, is_live):
+        """See MemorySessionBackend.get_or_create; one BEGIN IMMEDIATE transaction across workers."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(f"SELECT data FROM {self.table} WHERE session_id = ?", (session_id,)).fetchone()
+            session = json.loads(row[0]) if row else None
+            if session is not None and is_live(session):
+                change(session)
+                outcome = "updated"
+            else:
+                outcome = "created" if session is None else "replaced"
+                session = copy.deepcopy(new_session)
+            conn.execute(f"INSERT OR REPLACE INTO {self.table} (session_id, data, last_active) VALUES (?, ?, ?)",
+                         (session_id, json.dumps(session), session.get("last_active", time.time())))
+            conn.execute("COMMIT")
+            return session, outcome
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def delete(self, session_id):
+        conn = self._connect()
+        try:
+            return conn.execute(f"DELETE FROM {self.table} WHERE session_id = ?", (session_id,)).rowcount > 0
+        finally:
+            conn.close()
+
+    def evict(self, expired_before, max_sessions):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            removed = conn.execute(f"DELETE FROM {self.table} WHERE last_active < ?", (expired_before,)).rowcount
+            (count,) = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+            if count > max_sessions:
+                removed += conn.execute(f"""
+                    DELETE FROM {self.table} WHERE session_id IN (
+                        SELECT session_id FROM {self.table} ORDER BY last_active ASC LIMIT ?
+                    )
+                """, (count - max_sessions,)).rowcount
+            conn.execute("COMMIT")
+            return removed
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def __len__(self):
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        finally:
+            conn.close()
+
+
+class SessionStore:
+    def __init__(self, backend, ttl_seconds=3600, max_sessions=1000, frame_buffer_size=100, max_turn_seconds=600):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.frame_buffer_size = frame_buffer_size
+        self.max_turn_seconds = max_turn_seconds
+        self._stats = {"created": 0, "expired": 0, "evicted": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, metric, n=1):
+        with self._stats_lock:
+            self._stats[metric] += n
+
+    def _expired(self, session, now):
+        return now - session.get("last_active", 0) >= self.ttl_seconds
+
+    def get(self, session_id):
+        session = self.backend.get(session_id)
+        if session is not None and self._expired(session, time.time()):
+            self.backend.delete(session_id)
+            self._count("expired")
+            return None
+        return session
+
+    def open(self, session_id, candidate_id=None):
+        """
+        Return the live session (updating candidate_id when given) or create a new one. Both
+        happen in one backend transaction, so workers opening the same session concurrently
+        never overwrite each other's frames with a fresh session.
+        """
+        now = time.time()
+
+        def change(session):
+            session["last_active"] = now
+            if candidate_id:
+                session["candidate_id"] = candidate_id
+
+        new_session = {"candidate_id": candidate_id, "created_at": now, "last_active": now,
+                       "turns": [], "frames": [], "last_seq": 0, "delivered_seq": 0}
+        session, outcome = self.backend.get_or_create(session_id, change, new_session,
+                                                      lambda existing: not self._expired(existing, now))
+        if outcome == "updated":
+            return session
+        if outcome == "replaced":
+            self._count("expired")
+        self._count("created")
+        if len(self.backend) > self.max_sessions:
+            self.reap()
+        return session
+
+    def touch(self, session_id):
+        now = time.time()
+        return self.backend.update(session_id, lambda session: session.__setitem__("last_active", now))
+
+    def append_frame(self, session_id, payload):
+        """
+        Add a frame to the session's outbox and return its sequence number, which is also set
+        as payload["seq"]. None when the session no longer exists.
+        """
+        appended = {}
+
+        def change(session):
+            seq = session.get("last_seq", 0) + 1
+            session["last_seq"] = seq
+            frames = session.setdefault("frames", [])
+            frames.append([seq, json.dumps(dict(payload, seq=seq))])
+            del frames[:-self.frame_buffer_size]
+            appended["seq"] = seq
+        if self.backend.update(session_id, change) is None:
+            return None
+        payload["seq"] = appended["seq"]
+        return appended["seq"]
+
+    def frames_after(self, session_id, seq):
+        """The buffered frames (JSON text) with a sequence number above seq, oldest first."""
+        session = self.backend.get(session_id)
+        if session is None:
+            return []
+        return [(frame_seq, text) for frame_seq, text in session.get("frames") or [] if frame_seq > seq]
+
+    def outbox(self, session_id, seq):
+        """(frames after seq, whether a turn of the session is running on any worker) in one read."""
+        session = self.backend.get(session_id)
+        if session is None:
+            return [], False
+        frames = [(frame_seq, text) for frame_seq, text in session.get("frames") or [] if frame_seq > seq]
+        return frames, self._turn_active(session, time.time())
+
+    def _turn_active(self, session, now):
+        # Turns of a worker that died never end; ignore them after max_turn_seconds
+        return any(now - started < self.max_turn_seconds for started in (session.get("active_turns") or {}).values())
+
+    def begin_turn(self, session_id):
+        """Record a running turn; returns its id for end_turn."""
+        turn_id = uuid.uuid4().hex
+        now = time.time()
+
+        def change(session):
+            turns = session.setdefault("active_turns", {})
+            for stale in [t for t, started in turns.items() if now - started >= self.max_turn_seconds]:
+                del turns[stale]
+            turns[turn_id] = now
+        self.backend.update(session_id, change)
+        return turn_id
+
+    def end_turn(self, session_id, turn_id):
+        return self.backend.update(session_id, lambda session: (session.get("active_turns") or {}).pop(turn_id, None)) is not None
+
+    def mark_delivered(self, session_id, seq, acknowledged=False):
+        """
+        Record that frames up to seq reached a client; new connections without an explicit
+        resume point start after it. Acknowledged frames are also dropped from the outbox.
+        """
+        def change(session):
+            session["delivered_seq"] = max(session.get("delivered_seq", 0), seq)
+            if acknowledged:
+                session["frames"] = [frame for frame in session.get("frames") or [] if frame[0] > seq]
+        return self.backend.update(session_id, change) is not None
+
+    def turns(self, session_id):
+        """Recent (user message, answer) turns of the session."""
+        session = self.get(session_id)
+        return [tuple(turn) for turn in session.get("turns") or []] if session else []
+
+    def remember_turn(self, session_id, user_message, answer, max_turns):
+        def change(session):
+            turns = session.setdefault("turns", [])
+            turns.append([user_message, answer])
+            del turns[:-max_turns]
+        return self.backend.update(session_id, change) is not None
+
+    def delete(self, session_id):
+        return self.backend.delete(session_id)
+
+    def reap(self):
+        """Drop expired sessions, then the least recently active ones beyond max_sessions."""
+        before = len(self.backend)
+        removed = self.backend.evict(time.time() - self.ttl_seconds, self.max_sessions)
+        if removed:
+            self._count("evicted", removed)
+            print(f"[INFO] Chat session reaper removed {removed} of {before} sessions")
+        return removed
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({"sessions": len(self.backend), "max_sessions": self.max_sessions,
+                      "ttl_seconds": self.ttl_seconds, "backend": type(self.backend).__name__,
+                      "pid": os.getpid()})
+        return stats
+
+
+async def run_reaper(store, interval_seconds):
+    """Reap the store every interval_seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(store.reap)
+        except Exception as e:
+            print(f"[ERROR] Chat session reaper failed: {e}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def store_settings():
+    config = load_config()
+    chat_config = (config.get('chat') or {}) if isinstance(config, dict) else {}
+    return chat_config.get('session_store') or {}
+
+
+def get_session_store():
+    """The process-wide SessionStore, built from config chat.session_store on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            settings = store_settings()
+            backend_name = os.getenv("CHAT_SESSION_BACKEND") or settings.get('backend', 'sqlite')
+            if backend_name == 'sqlite':
+                db_path = os.getenv("CHAT_SESSION_DB") or os.path.join(
+                    repo_root, settings.get('db_path', 'data/chat_sessions.db'))
+                backend = SQLiteSessionBackend(db_path)
+            else:
+                backend = MemorySessionBackend()
+            _store = SessionStore(
+                backend,
+                ttl_seconds=float(settings.get('ttl_seconds', 3600)),
+                max_sessions=int(settings.get('max_sessions', 1000)),
+                frame_buffer_size=int(settings.get('frame_buffer_size', 100)),
+                max_turn_seconds=float(settings.get('max_turn_seconds', 600)),
+            )
+        return _store
@@ -0,0 +1,69 @@
+import asyncio
+import sys
+import threading
+import types
+
+import pytest
+
+from services.chatbot import chat_runner
+
+
+@pytest.fixture
+def chat_step(monkeypatch):
+    """Stand-in for multiagent_assistant.chat_step that emits the given events, then returns."""
+    calls = {"events": [], "finished": threading.Event(), "error": None}
+
+    def fake_chat_step(user_message, chat_history=None, candidate_id=None, on_message=None, session_id=None):
+        try:
+            for event in calls["events"]:
+                if on_message:
+                    on_message(event)
+            if calls["error"]:
+                raise calls["error"]
+            return f'{{"reply": "{user_message}"}}'
+        finally:
+            calls["finished"].set()
+
+    module = types.ModuleType("services.chatbot.multiagent_assistant")
+    module.chat_step = fake_chat_step
+    monkeypatch.setitem(sys.modules, "services.chatbot.multiagent_assistant", module)
+    yield calls
+    chat_runner.shutdown()
+
+
+def test_events_are_relayed_in_order(chat_step):
+    chat_step["events"] = [{"content": n} for n in range(3)]
+    received = []
+
+    async def on_event(event):
+        received.append(event["content"])
+
+    result = asyncio.run(chat_runner.run_turn("hi", on_event=on_event))
+
+    assert result == '{"reply": "hi"}'
+    assert received == [0, 1, 2]
+
+
+def test_failed_relay_stops_relaying_but_waits_for_the_turn(chat_step):
+    chat_step["events"] = [{"content": n} for n in range(3)]
+    received = []
+
+    async def on_event(event):
+        received.append(event["content"])
+        raise ConnectionError("socket closed")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(chat_runner.run_turn("hi", on_event=on_event))
+
+    assert received == [0]
+    assert chat_step["finished"].is_set()
+
+
+def test_turn_error_is_raised(chat_step):
+    chat_step["error"] = RuntimeError("agent crashed")
+
+    async def on_event(event):
+        pass
+
+    with pytest.raises(RuntimeError, match="agent crashed"):
+        asyncio.run(chat_runner.run_turn("hi", on_event=on_event))
@@ -0,0 +1,55 @@
+import pytest
+
+from services.chatbot import intent_router
+
+
+@pytest.fixture(autouse=True)
+def no_llm_fallback(monkeypatch):
+    # Only the regular-expression path is under test; never reach the gateway
+    monkeypatch.setattr(intent_router, "LLM_FALLBACK", False)
+
+
+@pytest.mark.parametrize("message, job_id, top_k", [
+    ("top 5 for job 123456", "123456", 5),
+    ("Show me the best 3 candidates for job id: 654321", "654321", 3),
+    ("best candidates for req #REQ-42", "REQ-42", intent_router.DEFAULT_TOP_K),
+])
+def test_top_candidates(message, job_id, top_k):
+    intent = intent_router.route(message)
+    assert intent == {"intent": intent_router.TOP_CANDIDATES, "args": {"job_id": job_id, "top_k": top_k}, "source": "regex"}
+
+
+@pytest.mark.parametrize("message", [
+    "what are the top 3 skills required for this job",
+    "show me the best 2 candidates for jobs in Berlin",
+    "top candidates for this job",
+    "best practices for job interviews",
+])
+def test_words_are_not_job_ids(message):
+    intent = intent_router.match_regex(message)
+    assert intent is None or intent["args"]["job_id"] is None
+    assert intent_router.route(message) is None
+
+
+def test_update_status():
+    intent = intent_router.route("set candidate abc-123 to shortlisted for job 123456")
+    assert intent["intent"] == intent_router.UPDATE_STATUS
+    assert intent["args"] == {"job_id": "123456", "candidate_id": "abc-123", "status": "Shortlisted"}
+
+
+def test_update_status_needs_a_job_id():
+    assert intent_router.route("mark candidate abc-123 as rejected for this job") is None
+
+
+def test_open_ended_requests_escalate():
+    assert intent_router.route("email the top 5 candidates for job 123456") is None
+
+
+@pytest.mark.parametrize("status, expected", [
+    ("shortlisted", "Shortlisted"),
+    ("Offer Extended", "Offer Extended"),
+    ("under review", "Application Under Review"),
+    ("promoted", None),
+])
+def test_normalize_status(status, expected):
+    assert intent_router.normalize_status(status) == expected
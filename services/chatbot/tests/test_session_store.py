@@ -0,0 +1,180 @@
+import json
+import threading
+
+import pytest
+
+from services.chatbot.session_store import MemorySessionBackend, SQLiteSessionBackend, SessionStore
+
+
+@pytest.fixture
+def backend(make_backend):
+    return make_backend(MemorySessionBackend, SQLiteSessionBackend, "chat_sessions.db")
+
+
+def make_store(backend, **settings):
+    settings = dict({"ttl_seconds": 60, "max_sessions": 10, "frame_buffer_size": 3}, **settings)
+    return SessionStore(backend, **settings)
+
+
+def test_open_creates_then_reuses_the_session(backend, clock):
+    store = make_store(backend)
+    session = store.open("s1", candidate_id="c1")
+    assert session["candidate_id"] == "c1"
+    assert session["last_seq"] == 0
+
+    clock.now += 10
+    session = store.open("s1")
+    assert session["candidate_id"] == "c1"
+    assert session["last_active"] == clock.now
+    assert store.stats()["created"] == 1
+
+
+def test_append_frame_numbers_frames_and_keeps_the_newest(backend, clock):
+    store = make_store(backend)
+    store.open("s1")
+    payloads = [{"text": f"frame {n}"} for n in range(5)]
+
+    seqs = [store.append_frame("s1", payload) for payload in payloads]
+
+    assert seqs == [1, 2, 3, 4, 5]
+    assert payloads[0]["seq"] == 1
+    frames = store.frames_after("s1", 0)
+    assert [seq for seq, _ in frames] == [3, 4, 5]
+    assert json.loads(frames[-1][1]) == {"text": "frame 4", "seq": 5}
+    assert [seq for seq, _ in store.frames_after("s1", 4)] == [5]
+
+
+def test_append_frame_to_missing_session(backend, clock):
+    store = make_store(backend)
+    payload = {"text": "lost"}
+    assert store.append_frame("missing", payload) is None
+    assert "seq" not in payload
+    assert store.frames_after("missing", 0) == []
+
+
+def test_mark_delivered_only_drops_acknowledged_frames(backend, clock):
+    store = make_store(backend)
+    store.open("s1")
+    for n in range(3):
+        store.append_frame("s1", {"text": n})
+
+    assert store.mark_delivered("s1", 2)
+    assert store.get("s1")["delivered_seq"] == 2
+    assert [seq for seq, _ in store.frames_after("s1", 0)] == [1, 2, 3]
+
+    assert store.mark_delivered("s1", 2, acknowledged=True)
+    assert [seq for seq, _ in store.frames_after("s1", 0)] == [3]
+
+    # delivered_seq never moves backwards
+    store.mark_delivered("s1", 1)
+    assert store.get("s1")["delivered_seq"] == 2
+    assert not store.mark_delivered("missing", 1)
+
+
+def test_outbox_reports_running_turns(backend, clock):
+    store = make_store(backend, max_turn_seconds=30)
+    store.open("s1")
+    turn_id = store.begin_turn("s1")
+    store.append_frame("s1", {"text": "working"})
+
+    frames, turn_active = store.outbox("s1", 0)
+    assert [seq for seq, _ in frames] == [1]
+    assert turn_active
+
+    store.end_turn("s1", turn_id)
+    assert store.outbox("s1", 1) == ([], False)
+
+
+def test_turn_of_a_dead_worker_stops_counting(backend, clock):
+    store = make_store(backend, ttl_seconds=3600, max_turn_seconds=30)
+    store.open("s1")
+    store.begin_turn("s1")
+    clock.now += 31
+    assert store.outbox("s1", 0) == ([], False)
+
+
+def test_remember_turn_keeps_the_last_turns(backend, clock):
+    store = make_store(backend)
+    store.open("s1")
+    for n in range(4):
+        store.remember_turn("s1", f"question {n}", f"answer {n}", max_turns=2)
+    assert store.turns("s1") == [("question 2", "answer 2"), ("question 3", "answer 3")]
+
+
+def test_get_expires_idle_sessions(backend, clock):
+    store = make_store(backend, ttl_seconds=60)
+    store.open("s1")
+
+    clock.now += 59
+    assert store.get("s1") is not None
+    clock.now += 1
+    assert store.get("s1") is None
+    assert store.stats()["expired"] == 1
+    assert len(backend) == 0
+
+
+def test_reap_removes_expired_sessions(backend, clock):
+    store = make_store(backend, ttl_seconds=60)
+    store.open("old")
+    clock.now += 50
+    store.open("new")
+    clock.now += 20
+
+    assert store.reap() == 1
+    assert backend.get("old") is None
+    assert backend.get("new") is not None
+
+
+def test_max_sessions_evicts_the_least_recently_active(backend, clock):
+    store = make_store(backend, ttl_seconds=3600, max_sessions=2)
+    store.open("s1")
+    clock.now += 1
+    store.open("s2")
+    clock.now += 1
+    store.touch("s1")
+    clock.now += 1
+    store.open("s3")
+
+    assert len(backend) == 2
+    assert backend.get("s2") is None
+    assert backend.get("s1") is not None
+    assert store.stats()["evicted"] == 1
+
+
+def test_sqlite_sessions_are_shared_between_stores(tmp_path, clock):
+    path = str(tmp_path / "chat_sessions.db")
+    writer = make_store(SQLiteSessionBackend(path))
+    reader = make_store(SQLiteSessionBackend(path))
+    writer.open("s1")
+    writer.append_frame("s1", {"text": "from another worker"})
+
+    assert [json.loads(text)["text"] for _, text in reader.frames_after("s1", 0)] == ["from another worker"]
+
+
+def test_open_replaces_an_expired_session(backend, clock):
+    store = make_store(backend, ttl_seconds=60)
+    store.open("s1", candidate_id="c1")
+    store.append_frame("s1", {"text": "old"})
+    clock.now += 60
+
+    session = store.open("s1")
+    assert session["candidate_id"] is None
+    assert store.frames_after("s1", 0) == []
+    assert store.stats()["created"] == 2
+    assert store.stats()["expired"] == 1
+
+
+def test_concurrent_opens_keep_one_session(tmp_path, clock):
+    path = str(tmp_path / "chat_sessions.db")
+    stores = [make_store(SQLiteSessionBackend(path)) for _ in range(4)]
+    stores[0].open("s1")
+    stores[0].append_frame("s1", {"text": "kept"})
+
+    threads = [threading.Thread(target=store.open, args=("s1",)) for store in stores for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [seq for seq, _ in stores[1].frames_after("s1", 0)] == [1]
+    assert sum(store.stats()["created"] for store in stores) == 1
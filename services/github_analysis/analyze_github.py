@@ -1,8 +1,10 @@
-import github
-from github import Github
 import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
 from common.utils.config_utils import load_config
-from services.github_analysis.helper import extract_github_username, fetch_candidate_commits, analyze_contributions_with_llm
+from services.github_analysis.helper import extract_github_username, analyze_contributions_with_llm
+from services.github_analysis import github_client
 from dotenv import load_dotenv
 
 # Load environment variables from .env file in the project directory
@@ -13,67 +15,137 @@ load_dotenv(backend_root / ".env")
 
 # Load configuration
 config = load_config()
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+github_config = (config.get('github') or {}) if isinstance(config, dict) else {}
+MAX_WORKERS = int(github_config.get('max_workers', 8))
+COMMIT_PAGE_CAP = int(github_config.get('commit_page_cap', 3))
+TOP_REPOSITORIES = int(github_config.get('top_repositories', 5))
+LARGE_REPO_COMMITS = int(github_config.get('large_repo_commit_threshold', 10000))
 
-# GitHub authentication using a personal access token
-g = Github(GITHUB_TOKEN)
 
+def _isoformat(timestamp):
+    """GitHub's "2024-01-02T03:04:05Z" in the datetime.isoformat() form stored so far."""
+    if not timestamp:
+        return None
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).isoformat()
 
-def analyze_github_profile(github_identifier, candidate_email):
+
+def _repo_data(repo, commit_count):
+    return {
+        "name": repo["name"],
+        "description": repo.get("description"),
+        "language": repo.get("language"),
+        "topics": repo.get("topics", []),
+        "created_at": _isoformat(repo.get("created_at")),
+        "updated_at": _isoformat(repo.get("updated_at")),
+        "pushed_at": _isoformat(repo.get("pushed_at")),
+        "commit_count": commit_count,
+        "stars": repo.get("stargazers_count"),
+        "forks": repo.get("forks_count"),
+        "open_issues": repo.get("open_issues_count"),
+        "watchers": repo.get("watchers_count")
+    }
+
+
+def _summarize_repo(client, repo, mark):
+    """
+    (repo, watermark, changed) for one repo. A repo whose pushed_at matches its watermark is
+    reused without any API call; otherwise its commit count and head SHA are fetched again.
+    The watermark is None when the count could not be fetched and there is nothing to fall back on.
+    """
+    if mark and mark.get("pushed_at") == repo.get("pushed_at"):
+        return repo, dict(mark), False
+    try:
+        commit_count, head_sha = client.commit_summary(repo["owner"]["login"], repo["name"])
+    except github_client.RateLimitExceeded:
+        raise
+    except Exception as e:
+        print(f"Error fetching commit count for {repo['name']}: {e}")
+        return repo, (dict(mark) if mark else None), False
+    changed = not mark or mark.get("head_sha") != head_sha
+    return repo, {
+        "pushed_at": repo.get("pushed_at"),
+        "head_sha": head_sha,
+        "commit_count": commit_count,
+        "author_sha": mark.get("author_sha") if mark else None,
+    }, changed
+
+
+def _contribution_insights(client, repo, mark, changed, previous, username, candidate_email, counters):
+    """
+    LLM insight for one of the top repositories. The previous insight is kept when the repo did
+    not change, or when its newest commit by the candidate (mark["author_sha"]) is still the same.
+    """
+    if previous is not None and not changed:
+        counters["reused"] += 1
+        return previous.get("contribution_insights")
+    commits = client.author_commits(repo["owner"]["login"], repo["name"], username, max_pages=COMMIT_PAGE_CAP)
+    author_sha = commits[0]["sha"] if commits else None
+    previous_author_sha, mark["author_sha"] = mark.get("author_sha"), author_sha
+    if previous is not None and author_sha == previous_author_sha:
+        counters["reused"] += 1
+        return previous.get("contribution_insights")
+    candidate_commits = [commit["commit"]["message"] for commit in commits]
+    if not candidate_commits:
+        return None
+    counters["analyzed"] += 1
+    summary = SimpleNamespace(name=repo["name"], description=repo.get("description"))
+    return analyze_contributions_with_llm(summary, candidate_email, candidate_commits)
+
+
+def refresh_github_profile(github_identifier, candidate_email, previous=None):
+    """
+    Analyze a GitHub profile, reusing the stored github_analysis document `previous` (if any).
+
+    Per-repo watermarks (pushed_at, default-branch head SHA, commit count and the SHA of the
+    candidate's newest commit) from previous["watermarks"] let unchanged repositories skip
+    every API call, and LLM insights are only recomputed for repositories with new commits
+    by the candidate. Returns (analysis_data, watermarks) for upsert_github_analysis.
+    """
     print(f"Analyzing profile for GitHub identifier: {github_identifier}")
 
     username = extract_github_username(github_identifier)
-    user = g.get_user(username)
-    repos = list(user.get_repos())
+    client = github_client.get_client()
+    previous = previous or {}
+    old_marks = previous.get("watermarks") or {}
+    previous_repos = {r.get("name"): r for r in (previous.get("result") or {}).get("repositories", [])}
+    if not old_marks:
+        previous_repos = {}  # Without watermarks there is no way to tell what changed
+    # The listing already carries topics, counters and pushed_at, so no per-repo metadata calls are needed
+    repos = [repo for repo in client.list_public_repos(username) if not repo.get("private")]
 
-    # Efficient total repo and commit counting
     total_repos = 0
     total_commits = 0
-    repo_commit_counts = []
-    repo_data_list = []
-
-    for repo in repos:
-        if repo.private:
-            continue  # Skip private repositories
-        try:
-            commit_count = repo.get_commits().totalCount
-        except Exception as e:
-            print(f"Error fetching commit count for {repo.name}: {e}")
-            continue
-        if commit_count == 0:
-            continue
-        # Always count towards totals if public and non-empty
-        total_repos += 1
-        total_commits += commit_count
-        if commit_count > 10000:
-            print(f"Large repository {repo.name} (commits: {commit_count}) counted in totals, but excluded from detailed analysis.")
-            continue  # Do not include in detailed/top-5 analysis
-        repo_data = {
-            "name": repo.name,
-            "description": repo.description,
-            "language": repo.language,
-            "topics": repo.get_topics(),
-            "created_at": repo.created_at.isoformat(),
-            "updated_at": repo.updated_at.isoformat(),
-            "pushed_at": repo.pushed_at.isoformat(),
-            "commit_count": commit_count,
-            "stars": repo.stargazers_count,
-            "forks": repo.forks_count,
-            "open_issues": repo.open_issues_count,
-            "watchers": repo.watchers_count
-        }
-        # Fetch commits by the candidate
-        candidate_commits = fetch_candidate_commits(repo, username)
-        # Always include contribution_insights
-        if candidate_commits:
-            contribution_insights = analyze_contributions_with_llm(repo, candidate_email, candidate_commits)
-        else:
-            contribution_insights = None
-        repo_data["contribution_insights"] = contribution_insights
-        repo_data_list.append(repo_data)
-
-    # Select top 5 repositories by most recent activity (pushed_at)
-    top_repos = sorted(repo_data_list, key=lambda r: r["pushed_at"], reverse=True)[:5]
+    watermarks = {}
+    candidates = []
+    counters = {"recounted": 0, "reused": 0, "analyzed": 0}
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        summaries = pool.map(lambda r: _summarize_repo(client, r, old_marks.get(r["name"])), repos)
+        for repo, mark, changed in summaries:
+            if mark is None:
+                continue
+            watermarks[repo["name"]] = mark
+            counters["recounted"] += mark.get("pushed_at") != (old_marks.get(repo["name"]) or {}).get("pushed_at")
+            commit_count = mark["commit_count"]
+            if not commit_count:
+                continue
+            # Always count towards totals if public and non-empty
+            total_repos += 1
+            total_commits += commit_count
+            if commit_count > LARGE_REPO_COMMITS:
+                print(f"Large repository {repo['name']} (commits: {commit_count}) counted in totals, but excluded from detailed analysis.")
+                continue  # Do not include in detailed/top-5 analysis
+            candidates.append((repo, mark, changed, _repo_data(repo, commit_count)))
+
+        # Select top repositories by most recent activity (pushed_at); only those get commit and LLM analysis
+        top = sorted(candidates, key=lambda item: item[3]["pushed_at"] or "", reverse=True)[:TOP_REPOSITORIES]
+        insights = pool.map(lambda item: _contribution_insights(
+            client, item[0], item[1], item[2], previous_repos.get(item[0]["name"]),
+            username, candidate_email, counters), top)
+        top_repos = []
+        for (_, _, _, repo_data), contribution_insights in zip(top, insights):
+            repo_data["contribution_insights"] = contribution_insights
+            top_repos.append(repo_data)
 
     analysis_data = {
         "github_url": f"https://github.com/{username}",
@@ -81,5 +153,13 @@ def analyze_github_profile(github_identifier, candidate_email):
         "total_commits": total_commits,
         "repositories": top_repos
     }
-    print(f"Analysis complete for {github_identifier}")
+    print(f"Analysis complete for {github_identifier}: {len(repos)} repos, {counters['recounted']} recounted, "
+          f"{counters['analyzed']} LLM insights, {counters['reused']} reused "
+          f"({client.stats['requests']} API requests so far, {client.stats['not_modified']} not modified, "
+          f"{client.stats['fresh_hits']} served from cache)")
+    return analysis_data, watermarks
+
+
+def analyze_github_profile(github_identifier, candidate_email):
+    analysis_data, _ = refresh_github_profile(github_identifier, candidate_email)
     return analysis_data
@@ -0,0 +1,203 @@
+"""
+Thin GitHub REST client used by the profile analyzer.
+
+All requests share one pooled requests.Session and go through request(), which
+- answers from the `github_http` cache without any request while a cached response is still
+  within its Cache-Control max-age,
+- otherwise revalidates cached responses with If-None-Match / If-Modified-Since; a 304 reuses
+  the cached body and does not count against the rate limit,
+- tracks X-RateLimit-Remaining / X-RateLimit-Reset and, once the remaining budget drops to
+  github.min_rate_limit_remaining, blocks new calls until the window resets,
+- caps the number of requests in flight across threads (github.max_concurrent_requests).
+
+The cache is persistent (memory in front of SQLite, see cache.github_http) and shared by every
+candidate and process, so organisation repos listed by many candidates and re-analyses of the
+same user are served by revalidation. Entries are keyed by URL, query parameters and a hash of
+the token, so responses fetched with one credential are never served to another.
+
+Settings come from the `github:` section of config/config.yaml; GITHUB_TOKEN from the environment.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.utils.cache import get_cache, make_key
+from common.utils.config_utils import load_config
+
+config = load_config()
+github_config = (config.get('github') or {}) if isinstance(config, dict) else {}
+
+API_URL = "https://api.github.com"
+MAX_CONCURRENT_REQUESTS = int(github_config.get('max_concurrent_requests', 8))
+MIN_RATE_LIMIT_REMAINING = int(github_config.get('min_rate_limit_remaining', 50))
+MAX_RATE_LIMIT_WAIT = float(github_config.get('max_rate_limit_wait_seconds', 900))
+REQUEST_TIMEOUT = float(github_config.get('request_timeout_seconds', 30))
+PER_PAGE = int(github_config.get('per_page', 100))
+
+LAST_PAGE_PATTERN = re.compile(r'[?&]page=(\d+)[^>]*>;\s*rel="last"')
+MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class GitHubClient:
+    def __init__(self, token=None):
+        self.token = token if token is not None else os.getenv("GITHUB_TOKEN")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_CONCURRENT_REQUESTS)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        })
+        if self.token:
+            self.session.headers["Authorization"] = f"Bearer {self.token}"
+        # Never the token itself: only a digest that separates credentials in cache keys
+        self.auth_scope = hashlib.sha256(self.token.encode("utf-8")).hexdigest()[:16] if self.token else "anonymous"
+        self.cache = get_cache("github_http")
+        self._slots = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+        self._lock = threading.Lock()
+        self.remaining = None
+        self.reset_at = None
+        self.stats = {"requests": 0, "not_modified": 0, "fresh_hits": 0}
+
+    def _wait_for_budget(self):
+        with self._lock:
+            remaining, reset_at = self.remaining, self.reset_at
+        if remaining is None or remaining > MIN_RATE_LIMIT_REMAINING or reset_at is None:
+            return
+        delay = reset_at - time.time() + 1
+        if delay <= 0:
+            return
+        if delay > MAX_RATE_LIMIT_WAIT:
+            raise RateLimitExceeded(f"GitHub rate limit budget exhausted, resets in {delay:.0f}s")
+        print(f"[WARN] GitHub rate limit budget low ({remaining} left), waiting {delay:.0f}s for reset")
+        time.sleep(delay)
+
+    def _record_rate_limit(self, response):
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset_at = response.headers.get("X-RateLimit-Reset")
+        with self._lock:
+            self.stats["requests"] += 1
+            if remaining is not None:
+                self.remaining = int(remaining)
+            if reset_at is not None:
+                self.reset_at = int(reset_at)
+
+    def request(self, path, params=None):
+        """
+        GET path (relative to the API or absolute) and return (status, body, headers).
+        200 responses with an ETag or Last-Modified are cached, served as-is while fresh and
+        revalidated after that.
+        """
+        url = path if path.startswith("http") else f"{API_URL}{path}"
+        key = make_key(url, sorted((params or {}).items()), self.auth_scope)
+        cached = self.cache.get(key)
+        headers = {}
+        if cached:
+            if time.time() < cached.get("fresh_until", 0):
+                with self._lock:
+                    self.stats["fresh_hits"] += 1
+                return 200, cached["body"], cached["headers"]
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        self._wait_for_budget()
+        with self._slots:
+            response = self.session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+        self._record_rate_limit(response)
+
+        if response.status_code == 304 and cached:
+            with self._lock:
+                self.stats["not_modified"] += 1
+            self.cache.set(key, dict(cached, fresh_until=self._fresh_until(response)))
+            return 200, cached["body"], cached["headers"]
+        if response.status_code in (403, 429) and response.headers.get("X-RateLimit-Remaining") == "0":
+            raise RateLimitExceeded(f"GitHub rate limit exceeded for {url}")
+        if response.status_code >= 400:
+            return response.status_code, None, response.headers
+
+        body = response.json()
+        kept_headers = {name: response.headers[name] for name in ("Link",) if name in response.headers}
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self.cache.set(key, {"etag": etag, "last_modified": last_modified, "body": body,
+                                 "headers": kept_headers, "fresh_until": self._fresh_until(response)})
+        return response.status_code, body, kept_headers
+
+    @staticmethod
+    def _fresh_until(response):
+        cache_control = response.headers.get("Cache-Control", "")
+        match = MAX_AGE_PATTERN.search(cache_control)
+        if not match or "no-cache" in cache_control or "no-store" in cache_control:
+            return 0
+        return time.time() + int(match.group(1))
+
+    def get(self, path, params=None):
+        status, body, _ = self.request(path, params)
+        if status >= 400:
+            raise requests.HTTPError(f"GitHub API returned {status} for {path}")
+        return body
+
+    def get_pages(self, path, params=None, max_pages=None):
+        """Collect the items of a paginated list endpoint, stopping after max_pages pages."""
+        params = dict(params or {}, per_page=PER_PAGE)
+        items = []
+        page = 1
+        while max_pages is None or page <= max_pages:
+            status, body, _ = self.request(path, dict(params, page=page))
+            if status >= 400:
+                raise requests.HTTPError(f"GitHub API returned {status} for {path}")
+            items.extend(body)
+            if len(body) < PER_PAGE:
+                break
+            page += 1
+        return items
+
+    def list_public_repos(self, username):
+        return self.get_pages(f"/users/{username}/repos", {"type": "owner", "sort": "pushed"})
+
+    def commit_summary(self, owner, repo):
+        """
+        (commit count, head SHA) of the default branch in a single request: with per_page=1 the
+        page number of the rel="last" link is the count. Empty repositories (409) give (0, None).
+        """
+        status, body, headers = self.request(f"/repos/{owner}/{repo}/commits", {"per_page": 1})
+        if status == 409:
+            return 0, None
+        if status >= 400:
+            raise requests.HTTPError(f"GitHub API returned {status} for commits of {owner}/{repo}")
+        match = LAST_PAGE_PATTERN.search(headers.get("Link", ""))
+        return (int(match.group(1)) if match else len(body)), (body[0]["sha"] if body else None)
+
+    def commit_count(self, owner, repo):
+        return self.commit_summary(owner, repo)[0]
+
+    def author_commits(self, owner, repo, author, max_pages=None):
+        """Commits authored by author, newest first, at most max_pages pages of them."""
+        try:
+            return self.get_pages(f"/repos/{owner}/{repo}/commits", {"author": author}, max_pages=max_pages)
+        except requests.HTTPError:
+            return []
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide GitHubClient, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GitHubClient()
+        return _client
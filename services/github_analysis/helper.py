@@ -19,23 +19,15 @@ def extract_github_username(github_identifier):
         return github_identifier.split('/')[-1]
     return github_identifier
 
-def fetch_candidate_commits(repo, username):
-    """ Fetches commits from the repository authored by the specified GitHub username. """
-    commits = repo.get_commits()
-    candidate_commits = [commit.commit.message for commit in commits if commit.author and commit.author.login == username]
-    
-    return candidate_commits
+def fetch_candidate_commits(repo, username, max_commits=300):
+    """ Fetches up to max_commits commit messages authored by the specified GitHub username (PyGithub repo). """
+    from itertools import islice
+    commits = repo.get_commits(author=username)
+    return [commit.commit.message for commit in islice(commits, max_commits)]
 
 def analyze_contributions_with_llm(repo, candidate_email, candidate_commits):
     """ Uses an LLM to analyze the candidate's contributions. """
-    from openai import AzureOpenAI
-    # Initialize the client only when needed
-    client = AzureOpenAI(
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_version=os.getenv("api_version")
-    )
-    model = os.getenv("deployment_name")
+    from common.llm import gateway
     # Prepare data for LLM
     context = f"""
     Repository Name: {repo.name}
@@ -45,8 +37,7 @@ def analyze_contributions_with_llm(repo, candidate_email, candidate_commits):
     """
 
     
-    response = client.chat.completions.create(
-        model=model,
+    response = gateway.chat_completion(
         messages=[{"role": "system", "content": "You are a github repository analyzer. You have been provided with the data in the repository and the candidate's commit messages. Your job is to understand the data and provide insights on the candidate's role, responsibilities, and impact based on their commits."},
                 {"role": "system", "content": "The anakysis should be of short to medium length and should cover the key aspects of the candidate's contributions. Please provide the insights in a clear and concise manner. Do not "},
                 {"role": "user", "content": context}
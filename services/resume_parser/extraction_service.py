@@ -0,0 +1,88 @@
+"""
+Resume text extraction on a process pool.
+
+PDF and DOCX extraction is CPU-bound, so running it inside an async handler blocks the event
+loop and a bulk import only ever uses one core. This module runs the in-memory parsers
+(parse_pdf_bytes / parse_doc_bytes) in a ProcessPoolExecutor:
+
+    text, links = await extraction_service.extract(data, ".pdf")      # from async code
+    results = extraction_service.extract_many([(data, ".docx"), ...])  # bulk, in order
+
+The pool is created on first use with the "spawn" start method (the API process already runs
+threads, which do not survive fork safely) and sized from config extraction.max_workers,
+the EXTRACTION_WORKERS environment variable, or the CPU count. The CPU count is split across
+the API worker processes (WEB_CONCURRENCY) so they do not each spawn one process per core.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from common.utils.config_utils import load_config, per_worker
+
+SUPPORTED_SUFFIXES = ('.pdf', '.doc', '.docx')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _max_workers():
+    config = load_config()
+    extraction_config = (config.get('extraction') or {}) if isinstance(config, dict) else {}
+    workers = os.getenv("EXTRACTION_WORKERS") or extraction_config.get('max_workers')
+    return max(1, int(workers)) if workers else per_worker(os.cpu_count() or 1)
+
+
+def extract_bytes(data, suffix):
+    """Extract (text, links) from resume content in this process. Raises ValueError for unsupported formats."""
+    suffix = (suffix or '').lower()
+    if suffix == '.pdf':
+        from services.resume_parser.parser.pdf_parser import parse_pdf_bytes
+        return parse_pdf_bytes(data)
+    if suffix in ('.doc', '.docx'):
+        from services.resume_parser.parser.doc_parser import parse_doc_bytes
+        return parse_doc_bytes(data)
+    raise ValueError(f"Unsupported file format: {suffix or 'unknown'}")
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = _max_workers()
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            print(f"[INFO] Resume extraction pool started with {workers} processes")
+        return _executor
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def extract(data, suffix):
+    """Extract (text, links) from resume bytes on the process pool without blocking the event loop."""
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), extract_bytes, data, suffix)
+
+
+def extract_many(items):
+    """
+    Extract a batch of (data, suffix) pairs across the pool.
+    Returns a list in input order of (text, links), or the exception raised for that item.
+    """
+    executor = get_executor()
+    futures = [executor.submit(extract_bytes, data, suffix) for data, suffix in items]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
@@ -0,0 +1,314 @@
+"""
+Streaming bulk resume ingestion.
+
+Blobs (or local files) flow through four stages connected by bounded asyncio queues, so a
+slow stage applies backpressure instead of letting work pile up in memory:
+
+    list -> download (async, pooled) -> extract (process pool) -> LLM parse (rate limited)
+         -> upsert (batched, concurrent)
+
+Every resume that reaches Cosmos DB is appended to a checkpoint file (name + etag); a rerun
+after a crash skips everything already recorded. Per-stage counts, errors, busy time and
+throughput are printed periodically and at the end.
+
+Usage:
+    python -m services.resume_parser.ingestion_pipeline --container resumes --prefix 2024/
+    python -m services.resume_parser.ingestion_pipeline --dir ./sample_resumes
+
+Settings come from the `ingestion:` section of config/config.yaml; command-line flags win.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(project_root, '.env'))
+
+from common.utils.config_utils import load_config
+from common.llm import gateway
+from common.storage import blob_operations
+from services.resume_parser import extraction_service
+
+config = load_config()
+ingestion_config = (config.get('ingestion') or {}) if isinstance(config, dict) else {}
+
+DONE = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+    def summary(self, elapsed):
+        rate = self.processed / elapsed if elapsed > 0 else 0.0
+        return (f"{self.name:9} processed={self.processed:<6} errors={self.errors:<4} "
+                f"busy={self.busy_seconds:8.1f}s throughput={rate:6.2f}/s")
+
+
+class RateLimiter:
+    """Spaces out calls to at most requests_per_minute across all callers."""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Checkpoint:
+    """Append-only JSON-lines record of ingested sources, keyed by name and etag."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn final line from a crash
+                    self.done.add((entry.get('name'), entry.get('etag')))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def seen(self, name, etag):
+        return (name, etag) in self.done
+
+    def record(self, name, etag, email):
+        self.done.add((name, etag))
+        self._file.write(json.dumps({"name": name, "etag": etag, "email": email, "at": time.time()}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BlobSource:
+    def __init__(self, container_name, prefix=None):
+        self.container_name = container_name
+        self.prefix = prefix
+
+    async def list(self):
+        container = await blob_operations.get_container_client(self.container_name)
+        async for blob in container.list_blobs(name_starts_with=self.prefix):
+            yield blob.name, blob.etag
+
+    async def read(self, name):
+        return await blob_operations.download_bytes(name, container=self.container_name)
+
+    async def close(self):
+        await blob_operations.close_client()
+
+
+class DirectorySource:
+    def __init__(self, directory):
+        self.directory = directory
+
+    async def list(self):
+        for root, _, files in os.walk(self.directory):
+            for file in sorted(files):
+                path = os.path.join(root, file)
+                stat = os.stat(path)
+                yield os.path.relpath(path, self.directory), f"{stat.st_size}-{int(stat.st_mtime)}"
+
+    async def read(self, name):
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            return f.read()
+
+    async def close(self):
+        pass
+
+
+async def run_pipeline(source, checkpoint_path=None, download_concurrency=None, extract_concurrency=None,
+                       llm_concurrency=None, requests_per_minute=None, upsert_batch_size=None,
+                       queue_size=None, limit=None, report_interval=None):
+    """Ingest every supported resume from source. Returns {stage name: StageStats}."""
+    from services.resume_parser.parser.openai_resume_parser import parse_resume_json
+    from common.database.cosmos import async_db_operations
+
+    download_concurrency = download_concurrency or int(ingestion_config.get('download_concurrency', 8))
+    extract_concurrency = extract_concurrency or int(ingestion_config.get('extract_concurrency', os.cpu_count() or 1))
+    llm_concurrency = llm_concurrency or int(ingestion_config.get('llm_concurrency', 4))
+    requests_per_minute = requests_per_minute or ingestion_config.get('requests_per_minute', 60)
+    upsert_batch_size = upsert_batch_size or int(ingestion_config.get('upsert_batch_size', 25))
+    queue_size = queue_size or int(ingestion_config.get('queue_size', 32))
+    report_interval = report_interval or float(ingestion_config.get('report_interval_seconds', 30))
+    checkpoint = Checkpoint(checkpoint_path or os.path.join(
+        project_root, ingestion_config.get('checkpoint_path', 'data/ingestion_checkpoint.jsonl')))
+
+    stats = {name: StageStats(name) for name in ("list", "download", "extract", "llm", "upsert")}
+    download_q = asyncio.Queue(maxsize=queue_size)
+    extract_q = asyncio.Queue(maxsize=queue_size)
+    llm_q = asyncio.Queue(maxsize=queue_size)
+    upsert_q = asyncio.Queue(maxsize=queue_size)
+    limiter = RateLimiter(float(requests_per_minute) if requests_per_minute else None)
+    start = time.perf_counter()
+
+    async def lister():
+        skipped = 0
+        async for name, etag in source.list():
+            if os.path.splitext(name)[1].lower() not in extraction_service.SUPPORTED_SUFFIXES:
+                continue
+            if checkpoint.seen(name, etag):
+                skipped += 1
+                continue
+            await download_q.put((name, etag))
+            stats["list"].processed += 1
+            if limit and stats["list"].processed >= limit:
+                break
+        print(f"[INFO] Listed {stats['list'].processed} resumes to ingest, {skipped} already in checkpoint")
+
+    async def worker(stage_name, inbox, outbox, handle):
+        while True:
+            item = await inbox.get()
+            if item is DONE:
+                break
+            name = item[0]
+            began = time.perf_counter()
+            try:
+                result = await handle(*item)
+            except Exception as e:
+                stats[stage_name].errors += 1
+                print(f"[ERROR] {stage_name} failed for {name}: {e}")
+                continue
+            finally:
+                stats[stage_name].busy_seconds += time.perf_counter() - began
+            stats[stage_name].processed += 1
+            if result is not None:
+                await outbox.put(result)
+
+    async def download(name, etag):
+        return name, etag, await source.read(name)
+
+    async def extract(name, etag, data):
+        text, links = await extraction_service.extract(data, os.path.splitext(name)[1])
+        if not text or not text.strip():
+            raise ValueError("no text extracted")
+        return name, etag, text, links
+
+    async def llm_parse(name, etag, text, links):
+        await limiter.wait()
+        with gateway.priority_scope(gateway.BATCH):
+            info = await asyncio.to_thread(parse_resume_json, text, links)
+        if not info or not info.get('email'):
+            raise ValueError("parsed resume has no email")
+        info['id'] = info['email']
+        info['resume_blob_name'] = name
+        return name, etag, info
+
+    async def upserter():
+        container = await async_db_operations.get_container(config['database']['resumes_container_name'])
+        finished = False
+        while not finished:
+            batch = []
+            item = await upsert_q.get()
+            # Take whatever else is already waiting, up to the batch size
+            while item is not DONE:
+                batch.append(item)
+                if len(batch) >= upsert_batch_size or upsert_q.empty():
+                    break
+                item = upsert_q.get_nowait()
+            finished = item is DONE
+            if not batch:
+                continue
+            began = time.perf_counter()
+            results = await asyncio.gather(*(container.upsert_item(info) for _, _, info in batch),
+                                           return_exceptions=True)
+            stats["upsert"].busy_seconds += time.perf_counter() - began
+            for (name, etag, info), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    stats["upsert"].errors += 1
+                    print(f"[ERROR] upsert failed for {name}: {result}")
+                else:
+                    stats["upsert"].processed += 1
+                    checkpoint.record(name, etag, info.get('email'))
+
+    async def reporter():
+        while True:
+            await asyncio.sleep(report_interval)
+            elapsed = time.perf_counter() - start
+            print(f"[INFO] Ingestion progress after {elapsed:.0f}s: " + ", ".join(
+                f"{s.name}={s.processed}" for s in stats.values()))
+
+    async def stage(count, stage_name, inbox, outbox, handle):
+        await asyncio.gather(*(worker(stage_name, inbox, outbox, handle) for _ in range(count)))
+        for _ in range(downstream_workers[stage_name]):
+            await outbox.put(DONE)
+
+    downstream_workers = {"download": extract_concurrency, "extract": llm_concurrency, "llm": 1}
+    report_task = asyncio.create_task(reporter())
+    upsert_task = asyncio.create_task(upserter())
+    stages = [
+        asyncio.create_task(stage(download_concurrency, "download", download_q, extract_q, download)),
+        asyncio.create_task(stage(extract_concurrency, "extract", extract_q, llm_q, extract)),
+        asyncio.create_task(stage(llm_concurrency, "llm", llm_q, upsert_q, llm_parse)),
+    ]
+    try:
+        await lister()
+        for _ in range(download_concurrency):
+            await download_q.put(DONE)
+        await asyncio.gather(*stages)
+        await upsert_task
+    finally:
+        report_task.cancel()
+        for task in stages + [upsert_task]:
+            task.cancel()
+        checkpoint.close()
+        await source.close()
+        extraction_service.shutdown()
+        await async_db_operations.close_client()
+
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] Ingestion finished in {elapsed:.1f}s")
+    for s in stats.values():
+        print("  " + s.summary(elapsed))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest resumes into the resumes container")
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument("--container", help="Blob container to ingest from")
+    source_group.add_argument("--dir", help="Local directory to ingest from")
+    parser.add_argument("--prefix", help="Only blobs whose name starts with this prefix")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: ingestion.checkpoint_path)")
+    parser.add_argument("--download-concurrency", type=int)
+    parser.add_argument("--extract-concurrency", type=int)
+    parser.add_argument("--llm-concurrency", type=int)
+    parser.add_argument("--rpm", type=float, help="Max LLM requests per minute")
+    parser.add_argument("--limit", type=int, help="Stop after this many new resumes")
+    args = parser.parse_args()
+
+    source = BlobSource(args.container, args.prefix) if args.container else DirectorySource(args.dir)
+    asyncio.run(run_pipeline(
+        source,
+        checkpoint_path=args.checkpoint,
+        download_concurrency=args.download_concurrency,
+        extract_concurrency=args.extract_concurrency,
+        llm_concurrency=args.llm_concurrency,
+        requests_per_minute=args.rpm,
+        limit=args.limit,
+    ))
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@ from common.database.cosmos.db_operations import upsert_resume
 from services.resume_parser.parser.openai_resume_parser import parse_resume_json
 from services.resume_parser.parser.doc_parser import parse_doc
 from services.resume_parser.parser.pdf_parser import parse_pdf
+from services.resume_parser import extraction_service
 
 def process_resume(file_path):
     """
@@ -50,21 +51,32 @@ def main(directory_path, delay_seconds=1):
         config['database']['resumes_container_name']
     )
 
-    # Walk through the directory and process all files
-    for root, dirs, files in os.walk(directory_path):
-        for file in files:
-            file_path = os.path.join(root, file)
-            try:
-                extracted_info = process_resume(file_path)
-                # Upsert resume data to the database
-                upsert_resume(container, extracted_info)
-                print(f"Successfully processed and uploaded: {file_path}")
+    file_paths = [os.path.join(root, file) for root, dirs, files in os.walk(directory_path) for file in files]
+    items = []
+    for file_path in file_paths:
+        with open(file_path, 'rb') as f:
+            items.append((f.read(), os.path.splitext(file_path)[1]))
 
-                # Sleep for the specified delay to prevent too frequent API calls
-                time.sleep(delay_seconds)
+    # Extract text on all cores first; only the OpenAI calls below are paced
+    extractions = extraction_service.extract_many(items)
+    extraction_service.shutdown()
 
-            except Exception as e:
-                print(f"Failed to process {file_path}: {e}")
+    for file_path, extraction in zip(file_paths, extractions):
+        try:
+            if isinstance(extraction, Exception):
+                raise extraction
+            text, hyperlinks = extraction
+            extracted_info = parse_resume_json(text, hyperlinks)
+            extracted_info['id'] = extracted_info['email']
+            # Upsert resume data to the database
+            upsert_resume(container, extracted_info)
+            print(f"Successfully processed and uploaded: {file_path}")
+
+            # Sleep for the specified delay to prevent too frequent API calls
+            time.sleep(delay_seconds)
+
+        except Exception as e:
+            print(f"Failed to process {file_path}: {e}")
 
 if __name__ == "__main__":
     directory_path = 'C:\\Users\\akalps\\Downloads\\Job Descriptions + Resumes'
@@ -1,11 +1,16 @@
 import docx
 import os
+import re
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from io import BytesIO
-import fitz
+from services.resume_parser.parser.pdf_parser import parse_pdf
 
 def docx_to_pdf(docx_path, pdf_path):
+    """Legacy render path (paragraph text only); kept for scripts/benchmark_docx_parsing.py."""
     import os
     print(f"[DEBUG] docx_to_pdf called with docx_path: {docx_path}")
     print(f"[DEBUG] os.path.exists(docx_path): {os.path.exists(docx_path)}")
@@ -36,39 +41,135 @@ def docx_to_pdf(docx_path, pdf_path):
     print(f"[DEBUG] PDF written to: {pdf_path}, exists after write: {os.path.exists(pdf_path)}")
 
 
-def parse_pdf(file_path):
-    doc = fitz.open(file_path)
-    text = ""
+W_P = qn('w:p')
+W_T = qn('w:t')
+W_TAB = qn('w:tab')
+W_BR = qn('w:br')
+W_CR = qn('w:cr')
+W_TBL = qn('w:tbl')
+W_TR = qn('w:tr')
+W_TC = qn('w:tc')
+W_SDT = qn('w:sdt')
+W_SDT_CONTENT = qn('w:sdtContent')
+W_HYPERLINK = qn('w:hyperlink')
+W_INSTR_TEXT = qn('w:instrText')
+R_ID = qn('r:id')
+# Text boxes are stored twice (DrawingML choice + VML fallback); only the choice is read
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+FIELD_HYPERLINK = re.compile(r'HYPERLINK\s+"([^"]+)"')
+
+
+def _walk_inline(element, rels, parts, links):
+    """Collect the text of a paragraph's content, including hyperlink runs and text boxes."""
+    for child in element.iterchildren():
+        tag = child.tag
+        if tag == W_T:
+            parts.append(child.text or "")
+        elif tag == W_TAB:
+            parts.append("\t")
+        elif tag in (W_BR, W_CR):
+            parts.append("\n")
+        elif tag == MC_FALLBACK:
+            continue
+        elif tag == W_P:
+            # Paragraph inside a text box
+            parts.append("\n")
+            _walk_inline(child, rels, parts, links)
+        elif tag == W_TC:
+            _walk_inline(child, rels, parts, links)
+            parts.append("\t")
+        elif tag == W_HYPERLINK:
+            first = len(parts)
+            _walk_inline(child, rels, parts, links)
+            rel_id = child.get(R_ID)
+            # Hyperlinks without a relationship are internal bookmarks (w:anchor)
+            if rel_id and rel_id in rels:
+                links.append({"link_text": "".join(parts[first:]).strip(), "link": rels[rel_id].target_ref})
+        elif tag == W_INSTR_TEXT:
+            # Field-code hyperlinks: { HYPERLINK "https://..." }
+            match = FIELD_HYPERLINK.search(child.text or "")
+            if match:
+                links.append({"link_text": "", "link": match.group(1)})
+        else:
+            _walk_inline(child, rels, parts, links)
+
+
+def _walk_blocks(element, rels, lines, links):
+    """Append one line per paragraph and per table row under element, in document order."""
+    for child in element.iterchildren():
+        tag = child.tag
+        if tag == W_P:
+            parts = []
+            _walk_inline(child, rels, parts, links)
+            lines.append("".join(parts))
+        elif tag == W_TBL:
+            for row in child.iterchildren(W_TR):
+                cells = []
+                for cell in row.iterchildren(W_TC):
+                    cell_lines = []
+                    _walk_blocks(cell, rels, cell_lines, links)
+                    cells.append(" ".join(line.strip() for line in cell_lines if line.strip()))
+                lines.append("\t".join(cells))
+        elif tag == W_SDT:
+            content = child.find(W_SDT_CONTENT)
+            if content is not None:
+                _walk_blocks(content, rels, lines, links)
+
+
+def _story_parts(document, reltype):
+    """Header or footer parts of the document as (element, rels)."""
+    stories = []
+    for rel in document.part.rels.values():
+        if rel.is_external or rel.reltype != reltype:
+            continue
+        part = rel.target_part
+        element = getattr(part, 'element', None)
+        if element is None:
+            element = parse_xml(part.blob)
+        stories.append((element, part.rels))
+    return stories
+
+
+def _extract_docx(document):
+    """
+    Extract (text, links) in the same shape as parse_pdf: headers, then the body (paragraphs,
+    tables, content controls, text boxes), then footers. Repeated headers/footers (first page,
+    even page, per section) are included once. Links are the hyperlinks found in the text plus
+    any other external hyperlink relationship of the document (e.g. on shapes).
+    """
     links = []
-    for _, page in enumerate(doc):
-        text += page.get_text()
-        link_dicts = page.get_links()
-        for link in link_dicts:
-            rect = fitz.Rect(link["from"])
-            # Get the text corresponding to the hyperlink area
-            link_text = page.get_text("text", clip=rect)
-            link_info = {
-                "link_text": link_text.strip(),
-                "link": link.get("uri") or link.get("file", "")
-            }
-            links.append(link_info)
-    doc.close()
-
-    return text, links
+    body_lines = []
+    _walk_blocks(document.element.body, document.part.rels, body_lines, links)
+
+    def stories_text(reltype):
+        seen = set()
+        lines = []
+        for element, rels in _story_parts(document, reltype):
+            story_lines, story_links = [], []
+            _walk_blocks(element, rels, story_lines, story_links)
+            text = "\n".join(line for line in story_lines if line.strip())
+            if text and text not in seen:
+                seen.add(text)
+                lines.append(text)
+                links.extend(story_links)
+        return lines
+
+    lines = stories_text(RT.HEADER) + body_lines + stories_text(RT.FOOTER)
+
+    seen_links = {link["link"] for link in links}
+    for rel in document.part.rels.values():
+        if rel.reltype == RT.HYPERLINK and rel.is_external and rel.target_ref not in seen_links:
+            seen_links.add(rel.target_ref)
+            links.append({"link_text": "", "link": rel.target_ref})
+    return "\n".join(lines), links
+
+
+def parse_doc_bytes(data):
+    """Extract (text, links) from DOCX content held in memory (bytes, bytearray or memoryview)."""
+    return _extract_docx(docx.Document(BytesIO(data)))
 
 
 def parse_doc(docx_path):
-    import os
     print(f"[DEBUG] parse_doc called with docx_path: {docx_path}")
     print(f"[DEBUG] os.path.exists(docx_path): {os.path.exists(docx_path)}")
-    pdf_path = docx_path.replace('.docx', '.pdf')
-    
-    docx_to_pdf(docx_path, pdf_path)
-    
-    text, links = parse_pdf(pdf_path)
-    
-    os.remove(pdf_path)
-
-    print(links)
-    
-    return text, links
+    return _extract_docx(docx.Document(docx_path))
@@ -54,27 +54,40 @@ _debug_env()
 import openai
 from openai import AzureOpenAI
 import json
+from common.utils.cache import get_cache, make_key
+from common.llm import gateway
 
 def get_azure_openai_client():
-    # Load env and print debug info
-    dotenv_path = Path(__file__).parent.parent.parent / ".env"
-    load_dotenv(dotenv_path=dotenv_path)
-    _debug_env()
-    from openai import AzureOpenAI
-    return AzureOpenAI(
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_version=os.getenv("api_version"),
-    )
+    return gateway.get_client()
 
 model = os.getenv("deployment_name")
 
+# Part of the parse cache key; bump whenever the prompt or the output shape changes so
+# previously cached parses are no longer served.
+PROMPT_VERSION = "1"
+
+def resume_parse_cache_key(resume_text, links=None):
+    return make_key("parse_resume_json", PROMPT_VERSION, model, resume_text, links)
+
 def parse_resume_json(resume_text, links=None):
+    """Parse resume text into structured JSON, serving repeat texts from the resume_parse cache."""
     if resume_text is None:
         raise ValueError("resume_text cannot be None")
     if not isinstance(resume_text, str):
         raise ValueError("resume_text must be a string")
 
+    cache = get_cache("resume_parse")
+    key = resume_parse_cache_key(resume_text, links)
+    cached = cache.get(key)
+    if cached is not None:
+        print(f"[DEBUG] resume_parse cache hit {key[:12]}")
+        return cached
+    json_data = _parse_resume_json_uncached(resume_text, links)
+    if json_data:
+        cache.set(key, json_data)
+    return json_data
+
+def _parse_resume_json_uncached(resume_text, links=None):
     print("[DEBUG] resume_text sent to OpenAI:\n", resume_text)
     print("[DEBUG] links sent to OpenAI:\n", links)
     
@@ -176,8 +189,7 @@ def parse_resume_json(resume_text, links=None):
     Provide the extracted information in JSON format. Return only the JSON string.
     """
 
-    client = get_azure_openai_client()
-    response = client.chat.completions.create(
+    response = gateway.chat_completion(
         model=model,
         messages=[
             {"role": "system", "content": "You are a resume information extractor. You have been provided with the data in the resume and your job is to understand the data and extract the required information."},
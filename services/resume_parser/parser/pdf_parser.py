@@ -1,24 +1,54 @@
 import fitz
 
+def _link_texts(page, rects):
+    """Text under each link rect, from a single word extraction of the page."""
+    words = page.get_text("words")
+    texts = []
+    for rect in rects:
+        # A word belongs to the link when its centre lies inside the link area
+        texts.append(" ".join(
+            w[4] for w in words
+            if rect.x0 <= (w[0] + w[2]) / 2 <= rect.x1 and rect.y0 <= (w[1] + w[3]) / 2 <= rect.y1
+        ))
+    return texts
+
+def _extract_page(page):
+    links = []
+    link_dicts = page.get_links()
+    if link_dicts:
+        link_texts = _link_texts(page, [fitz.Rect(link["from"]) for link in link_dicts])
+        for link, link_text in zip(link_dicts, link_texts):
+            links.append({
+                "link_text": link_text.strip(),
+                "link": link.get("uri") or link.get("file", "")
+            })
+    return page.get_text(), links
+
+def _extract_pdf(doc):
+    texts = []
+    links = []
+    for page in doc:
+        page_text, page_links = _extract_page(page)
+        texts.append(page_text)
+        links.extend(page_links)
+    return "".join(texts), links
+
 def parse_pdf(file_path):
     import os
     print(f"[DEBUG] parse_pdf called with path: {file_path}")
     print(f"[DEBUG] os.path.exists(path): {os.path.exists(file_path)}")
     doc = fitz.open(file_path)
-    text = ""
-    links = []
-    for _, page in enumerate(doc):
-        text += page.get_text()
-        link_dicts = page.get_links()
-        for link in link_dicts:
-            rect = fitz.Rect(link["from"])
-            # Get the text corresponding to the hyperlink area
-            link_text = page.get_text("text", clip=rect)
-            link_info = {
-                "link_text": link_text.strip(),
-                "link": link.get("uri") or link.get("file", "")
-            }
-            links.append(link_info)
-    doc.close()
+    try:
+        return _extract_pdf(doc)
+    finally:
+        doc.close()
 
-    return text, links
\ No newline at end of file
+def parse_pdf_bytes(data):
+    """Extract (text, links) from PDF content held in memory (bytes, bytearray or memoryview)."""
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        return _extract_pdf(doc)
+    finally:
+        doc.close()
@@ -5,24 +5,21 @@ import azure.functions as func
 from common.database.cosmos.db_setup import setup_database
 from common.database.cosmos.db_operations import upsert_resume
 from services.resume_parser.parser.openai_resume_parser import parse_resume_json
-from services.resume_parser.parser.doc_parser import parse_doc
-from services.resume_parser.parser.pdf_parser import parse_pdf
+from services.resume_parser.parser.doc_parser import parse_doc_bytes
+from services.resume_parser.parser.pdf_parser import parse_pdf_bytes
 
 def main(blob: func.InputStream):
     logging.info(f"Processing blob\nName: {blob.name}\nSize: {blob.length} bytes")
 
-    # Save the uploaded blob locally for processing
-    local_path = "/tmp/" + os.path.basename(blob.name)
-    with open(local_path, "wb") as f:
-        f.write(blob.read())
+    data = blob.read()
 
     # Determine the file type and parse accordingly
-    file_extension = os.path.splitext(local_path)[1].lower()
+    file_extension = os.path.splitext(blob.name)[1].lower()
 
     if file_extension == '.pdf':
-        text, hyperlinks = parse_pdf(local_path)
+        text, hyperlinks = parse_pdf_bytes(data)
     elif file_extension in ['.doc', '.docx']:
-        text, hyperlinks = parse_doc(local_path)
+        text, hyperlinks = parse_doc_bytes(data)
     else:
         logging.error("Unsupported file format")
         return
@@ -50,6 +47,3 @@ def main(blob: func.InputStream):
         logging.info("Resume data upserted successfully")
     except Exception as e:
         logging.error(f"An error occurred while upserting resume data: {e}")
-
-    # Clean up local file
-    os.remove(local_path)
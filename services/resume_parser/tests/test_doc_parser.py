@@ -0,0 +1,71 @@
+from io import BytesIO
+from zipfile import BadZipFile
+
+import docx
+import pytest
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+from services.resume_parser.parser.doc_parser import parse_doc, parse_doc_bytes
+
+
+def add_hyperlink(paragraph, text, url):
+    rel_id = paragraph.part.relate_to(url, RT.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), rel_id)
+    run = OxmlElement("w:r")
+    text_element = OxmlElement("w:t")
+    text_element.text = text
+    run.append(text_element)
+    hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+
+
+@pytest.fixture
+def resume_docx():
+    """A small resume with a header, a hyperlink, a table and a footer."""
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = "Jane Doe - Resume"
+    document.add_paragraph("Jane Doe")
+    contact = document.add_paragraph("GitHub: ")
+    add_hyperlink(contact, "janedoe", "https://github.com/janedoe")
+    table = document.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Skill"
+    table.cell(0, 1).text = "Years"
+    table.cell(1, 0).text = "Python"
+    table.cell(1, 1).text = "6"
+    document.add_paragraph("Experience\tAcme Corp")
+    document.sections[0].footer.paragraphs[0].text = "Page footer"
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def test_parse_doc_bytes_extracts_text_in_document_order(resume_docx):
+    text, _ = parse_doc_bytes(resume_docx)
+    assert text.split("\n") == [
+        "Jane Doe - Resume",
+        "Jane Doe",
+        "GitHub: janedoe",
+        "Skill\tYears",
+        "Python\t6",
+        "Experience\tAcme Corp",
+        "Page footer",
+    ]
+
+
+def test_parse_doc_bytes_extracts_hyperlinks(resume_docx):
+    _, links = parse_doc_bytes(resume_docx)
+    assert links == [{"link_text": "janedoe", "link": "https://github.com/janedoe"}]
+
+
+def test_parse_doc_bytes_accepts_memoryview_and_matches_parse_doc(resume_docx, tmp_path):
+    path = tmp_path / "resume.docx"
+    path.write_bytes(resume_docx)
+    assert parse_doc_bytes(memoryview(resume_docx)) == parse_doc(str(path))
+
+
+def test_parse_doc_bytes_rejects_other_content():
+    with pytest.raises(BadZipFile):
+        parse_doc_bytes(b"%PDF-1.4 not a docx")
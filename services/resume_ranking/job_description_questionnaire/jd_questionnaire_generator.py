@@ -11,11 +11,7 @@ backend_root = Path(__file__).resolve().parent.parent.parent.parent
 load_dotenv(backend_root / ".env")
 
 from common.database.cosmos import db_operations
-
-
-client = AzureOpenAI(api_key=os.getenv("AZURE_OPENAI_API_KEY"), azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"), api_version=os.getenv("api_version"))
-
-model= os.getenv("deployment_name")
+from common.llm import gateway
 
 # Function to generate a questionnaire using GPT-4o-mini
 def generate_questionnaire(job_description):
@@ -84,8 +80,7 @@ Here is the job description:
 
 
 
-    completion = client.chat.completions.create(
-        model=model,
+    completion = gateway.chat_completion(
         messages=[
             {"role": "system", "content": "You are an expert recruitment consultant."},
             {"role": "user", "content": prompt}
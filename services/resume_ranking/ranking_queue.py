@@ -0,0 +1,473 @@
+"""
+Durable job queue and worker pool for resume ranking.
+
+Ranking jobs are stored in a local SQLite file so queued work survives a restart. Each job
+has an idempotency key of (job_id, email, questionnaire_id): enqueueing the same key again
+returns the existing job instead of creating a new one. A configurable pool of worker
+threads drains the queue, which bounds how many multi-agent ranking conversations run at
+once; in the API the pool size is split across the worker processes (WEB_CONCURRENCY). Failed jobs are retried with exponential backoff up to max_attempts.
+
+The API enqueues on apply and when a candidate list shows unranked candidates; backfill
+scripts enqueue a whole job's candidates and call run_until_idle() to process them N-wide.
+The structured LLM parse of a new application is a separate parse job on the same queue, so a
+parse failure is retried on its own and never uses up the ranking's attempts (ranking only
+needs the extracted resume text).
+Jobs carry an LLM priority: interactive jobs (a candidate just applied) are claimed before
+batch jobs, and their LLM calls run at interactive priority in the gateway, so backfills
+cannot starve live applies.
+"""
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from common.utils.config_utils import load_config, per_worker
+from common.llm.gateway import INTERACTIVE, BATCH, PRIORITIES, priority_scope
+
+config = load_config()
+queue_config = config.get('ranking_queue', {}) if isinstance(config, dict) else {}
+
+repo_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DB_PATH = os.getenv("RANKING_QUEUE_DB") or os.path.join(repo_root, queue_config.get('db_path', 'data/ranking_queue.db'))
+# Threads for the whole host; the queue is shared, so each API worker process runs its share
+MAX_WORKERS = per_worker(os.getenv("RANKING_QUEUE_WORKERS") or queue_config.get('max_workers', 2))
+MAX_ATTEMPTS = int(queue_config.get('max_attempts', 3))
+BACKOFF_BASE_SECONDS = float(queue_config.get('backoff_base_seconds', 30))
+BACKOFF_MAX_SECONDS = float(queue_config.get('backoff_max_seconds', 900))
+POLL_INTERVAL_SECONDS = float(queue_config.get('poll_interval_seconds', 5))
+# A job still marked running after this long belongs to a process that died
+STALE_RUNNING_SECONDS = float(queue_config.get('stale_running_seconds', 1800))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Job kinds: rank a stored application, or fill in its structured parsed_resume
+RANK = "rank"
+PARSE = "parse"
+KINDS = (RANK, PARSE)
+
+# Stored as an integer so the claim query can order on it
+PRIORITY_RANK = {INTERACTIVE: 0, BATCH: 1}
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+_wakeup = threading.Event()
+_stop = threading.Event()
+_workers = []
+
+
+class PermanentRankingError(ValueError):
+    """A queued job that cannot succeed on retry (e.g. the application or questionnaire is missing)."""
+
+
+def _connect():
+    global _schema_ready
+    if not _schema_ready:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS ranking_jobs (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        idempotency_key TEXT NOT NULL UNIQUE,
+                        job_id TEXT NOT NULL,
+                        email TEXT NOT NULL,
+                        candidate_email TEXT NOT NULL,
+                        questionnaire_id TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        max_attempts INTEGER NOT NULL,
+                        next_attempt_at TEXT NOT NULL,
+                        last_error TEXT,
+                        score REAL,
+                        created_at TEXT NOT NULL,
+                        updated_at TEXT NOT NULL,
+                        finished_at TEXT,
+                        priority INTEGER NOT NULL DEFAULT 0,
+                        kind TEXT NOT NULL DEFAULT 'rank'
+                    )
+                """)
+                columns = {row["name"] for row in conn.execute("PRAGMA table_info(ranking_jobs)")}
+                if "priority" not in columns:
+                    conn.execute("ALTER TABLE ranking_jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+                conn.execute("DROP INDEX IF EXISTS idx_ranking_jobs_claim")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_ranking_jobs_priority_claim ON ranking_jobs (status, priority, next_attempt_at, id)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_ranking_jobs_candidate ON ranking_jobs (job_id, email)")
+                _schema_ready = True
+    return conn
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+def _normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def idempotency_key(job_id, email, questionnaire_id, kind=RANK):
+    if kind == PARSE:
+        return f"{PARSE}:{job_id}:{_normalize_email(email)}"
+    return f"{job_id}:{_normalize_email(email)}:{questionnaire_id or ''}"
+
+
+def _current_questionnaire_id(job_id):
+    from common.database.cosmos import db_operations
+    doc = db_operations.fetch_job_description_questionnaire(job_id)
+    return doc['id'] if doc else ''
+
+
+def enqueue(job_id, email, questionnaire_id=None, force=False, priority=INTERACTIVE, kind=RANK):
+    """
+    Queue a ranking (or, with kind=PARSE, a resume parse) job and return it as a dict.
+
+    An existing job with the same (job_id, email, questionnaire_id) key is returned unchanged
+    while it is pending or running (a pending batch job is raised to interactive priority if
+    asked). A finished or failed one is only queued again when force is set (e.g. the candidate
+    re-applied with a new resume), so polling a list of unranked candidates never reruns the
+    same ranking. Parse jobs are keyed on (job_id, email) alone.
+    """
+    candidate_email = (email or '').strip()
+    job_id = str(job_id)
+    if not job_id or not candidate_email:
+        return None
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown ranking priority: {priority!r} (expected one of {PRIORITIES})")
+    if kind not in KINDS:
+        raise ValueError(f"Unknown ranking queue job kind: {kind!r} (expected one of {KINDS})")
+    rank = PRIORITY_RANK[priority]
+    if kind == PARSE:
+        questionnaire_id = ''
+    elif questionnaire_id is None:
+        questionnaire_id = _current_questionnaire_id(job_id)
+    key = idempotency_key(job_id, candidate_email, questionnaire_id, kind)
+    now = _now()
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT * FROM ranking_jobs WHERE idempotency_key = ?", (key,)).fetchone()
+        if row is None:
+            conn.execute(
+                "INSERT INTO ranking_jobs (idempotency_key, job_id, email, candidate_email, questionnaire_id, status, "
+                "max_attempts, next_attempt_at, created_at, updated_at, priority, kind) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, job_id, _normalize_email(candidate_email), candidate_email, str(questionnaire_id or ''),
+                 PENDING, MAX_ATTEMPTS, now, now, now, rank, kind)
+            )
+            queued = True
+        elif force and row["status"] in (DONE, FAILED):
+            conn.execute(
+                "UPDATE ranking_jobs SET status = ?, attempts = 0, last_error = NULL, score = NULL, candidate_email = ?, "
+                "next_attempt_at = ?, updated_at = ?, finished_at = NULL, priority = ? WHERE id = ?",
+                (PENDING, candidate_email, now, now, rank, row["id"])
+            )
+            queued = True
+        else:
+            if row["status"] == PENDING and rank < row["priority"]:
+                conn.execute("UPDATE ranking_jobs SET priority = ?, updated_at = ? WHERE id = ?", (rank, now, row["id"]))
+            queued = False
+        row = conn.execute("SELECT * FROM ranking_jobs WHERE idempotency_key = ?", (key,)).fetchone()
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    if queued:
+        print(f"[INFO] Queued {kind} job {row['id']} for job {job_id} and {candidate_email}")
+        _wakeup.set()
+    return dict(row)
+
+
+def get_job(ranking_job_id):
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM ranking_jobs WHERE id = ?", (ranking_job_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def get_status(job_id, email, kind=RANK):
+    """Latest job of a kind for a candidate as a dict, or None if one was never queued."""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM ranking_jobs WHERE job_id = ? AND email = ? AND kind = ? ORDER BY updated_at DESC LIMIT 1",
+                           (str(job_id), _normalize_email(email), kind)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def job_summary(job_id=None, kind=RANK):
+    """Counts of jobs of a kind (every kind when kind is None) per status, for one job posting or the whole queue."""
+    conditions, parameters = [], []
+    if job_id is not None:
+        conditions.append("job_id = ?")
+        parameters.append(str(job_id))
+    if kind is not None:
+        conditions.append("kind = ?")
+        parameters.append(kind)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    conn = _connect()
+    try:
+        rows = conn.execute(f"SELECT status, COUNT(*) AS n FROM ranking_jobs{where} GROUP BY status", parameters).fetchall()
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+    finally:
+        conn.close()
+
+
+def job_statuses(job_id, kind=RANK):
+    """{email: latest job of a kind} for every candidate of a job posting that was ever queued."""
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT * FROM ranking_jobs WHERE job_id = ? AND kind = ? ORDER BY updated_at",
+                            (str(job_id), kind)).fetchall()
+        return {row["email"]: dict(row) for row in rows}
+    finally:
+        conn.close()
+
+
+def pending_emails(job_id):
+    """Emails with a pending or running ranking job for a job posting."""
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT email FROM ranking_jobs WHERE job_id = ? AND kind = ? AND status IN (?, ?)",
+                            (str(job_id), RANK, PENDING, RUNNING)).fetchall()
+        return {row["email"] for row in rows}
+    finally:
+        conn.close()
+
+
+def _claim_next():
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT * FROM ranking_jobs WHERE status = ? AND next_attempt_at <= ? ORDER BY priority, next_attempt_at, id LIMIT 1",
+            (PENDING, _now())
+        ).fetchone()
+        if row is not None:
+            conn.execute("UPDATE ranking_jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                         (RUNNING, _now(), row["id"]))
+        conn.execute("COMMIT")
+        return dict(row) if row else None
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _complete(ranking_job, score):
+    conn = _connect()
+    try:
+        conn.execute("UPDATE ranking_jobs SET status = ?, score = ?, last_error = NULL, updated_at = ?, finished_at = ? WHERE id = ?",
+                     (DONE, score, _now(), _now(), ranking_job["id"]))
+    finally:
+        conn.close()
+
+
+def _backoff_seconds(attempts):
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _fail(ranking_job, error, retryable=True):
+    attempts = ranking_job["attempts"] + 1  # the claim already counted this attempt in the table
+    conn = _connect()
+    try:
+        if retryable and attempts < ranking_job["max_attempts"]:
+            next_attempt = (datetime.utcnow() + timedelta(seconds=_backoff_seconds(attempts))).isoformat()
+            conn.execute("UPDATE ranking_jobs SET status = ?, last_error = ?, next_attempt_at = ?, updated_at = ? WHERE id = ?",
+                         (PENDING, error, next_attempt, _now(), ranking_job["id"]))
+            print(f"[WARN] {ranking_job['kind'].capitalize()} job {ranking_job['id']} failed (attempt {attempts}), retrying at {next_attempt}: {error}")
+        else:
+            conn.execute("UPDATE ranking_jobs SET status = ?, last_error = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+                         (FAILED, error, _now(), _now(), ranking_job["id"]))
+            print(f"[ERROR] {ranking_job['kind'].capitalize()} job {ranking_job['id']} failed after {attempts} attempts: {error}")
+    finally:
+        conn.close()
+
+
+def _requeue_interrupted():
+    """Jobs left running by a process that died are picked up again."""
+    cutoff = (datetime.utcnow() - timedelta(seconds=STALE_RUNNING_SECONDS)).isoformat()
+    conn = _connect()
+    try:
+        cursor = conn.execute("UPDATE ranking_jobs SET status = ?, next_attempt_at = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                              (PENDING, _now(), _now(), RUNNING, cutoff))
+        if cursor.rowcount:
+            print(f"[INFO] Re-queued {cursor.rowcount} interrupted ranking queue jobs")
+    finally:
+        conn.close()
+
+
+def _parse_score(ranking_result):
+    if isinstance(ranking_result, dict) and ranking_result.get('score') is not None:
+        return float(ranking_result['score'])
+    if isinstance(ranking_result, (int, float)):
+        return float(ranking_result)
+    match = re.search(r"([0-9]+\.?[0-9]*)", str(ranking_result or ''))
+    return float(match.group(1)) if match else None
+
+
+def _resume_from_blob(resume_blob_name):
+    """Download a stored resume and extract (text, hyperlinks)."""
+    from common.storage.blob_operations import download_bytes_sync
+    from services.resume_parser.extraction_service import extract_bytes, SUPPORTED_SUFFIXES
+
+    data = download_bytes_sync(resume_blob_name)
+    suffix = os.path.splitext(resume_blob_name)[-1].lower()
+    if suffix not in SUPPORTED_SUFFIXES:
+        return '', []
+    return extract_bytes(data, suffix)
+
+
+def _resume_text(job_id, candidate):
+    """Return (resume text, hyperlinks) of a stored application, from its raw_text or the resume blob."""
+    parsed_resume = candidate.get('parsed_resume') if isinstance(candidate.get('parsed_resume'), dict) else {}
+    resume_text = parsed_resume.get('raw_text', '')
+    hyperlinks = candidate.get('resume_hyperlinks') or []
+    if not resume_text and candidate.get('resume_blob_name'):
+        resume_text, hyperlinks = _resume_from_blob(candidate['resume_blob_name'])
+    if not resume_text:
+        raise PermanentRankingError(f"No resume text for job {job_id} and {candidate.get('email')}")
+    return resume_text, hyperlinks
+
+
+def is_parsed(parsed_resume):
+    """Whether a stored parsed_resume holds the structured LLM parse, not just the extracted text."""
+    return isinstance(parsed_resume, dict) and not set(parsed_resume) <= {'raw_text'}
+
+
+def parse_candidate(job_id, email):
+    """
+    Fill in the structured parsed_resume of an application stored with raw text only.
+    Raises PermanentRankingError when the application or its resume text is missing; any other
+    exception (including an empty parse) is retried.
+    """
+    from common.database.cosmos import db_operations
+    from services.resume_parser.parser.openai_resume_parser import parse_resume_json
+
+    candidate = db_operations.fetch_resume_with_email_and_job(job_id, email)
+    if not candidate:
+        raise PermanentRankingError(f"No application found for job {job_id} and {email}")
+    if is_parsed(candidate.get('parsed_resume')):
+        return
+    resume_text, hyperlinks = _resume_text(job_id, candidate)
+    structured = parse_resume_json(resume_text, hyperlinks)
+    if not isinstance(structured, dict) or not structured:
+        raise RuntimeError(f"Resume parse returned nothing for job {job_id} and {email}")
+    structured['raw_text'] = resume_text
+    db_operations.update_candidate_fields(job_id, candidate['email'], {"parsed_resume": structured, "parse_status": DONE})
+
+
+def rank_candidate(job_id, email):
+    """
+    Rank one stored application with the configured ranking engine and save the result.
+    Raises PermanentRankingError when required data is missing; any other exception is retried.
+    """
+    from common.database.cosmos import db_operations
+    from services.resume_ranking.resume_ranker.scoring_engine import rank_resume
+
+    candidate = db_operations.fetch_resume_with_email_and_job(job_id, email)
+    if not candidate:
+        raise PermanentRankingError(f"No application found for job {job_id} and {email}")
+    job_description = db_operations.fetch_job_description(job_id)
+    job_questionnaire_doc = db_operations.fetch_job_description_questionnaire(job_id)
+    job_questionnaire_id = job_questionnaire_doc['id'] if job_questionnaire_doc else None
+    questionnaire = job_questionnaire_doc['questionnaire'] if job_questionnaire_doc else None
+    job_description_text = job_description['description'] if job_description and 'description' in job_description else ''
+    if not all([job_questionnaire_id, job_description_text, questionnaire]):
+        raise PermanentRankingError(f"Missing job description or questionnaire for job {job_id}")
+    resume_text, _ = _resume_text(job_id, candidate)
+
+    candidate_email = candidate.get('email') or email
+    # The queue is the only writer: rank_resume must not store as well
+    ranking_result = rank_resume(job_id, job_questionnaire_id, resume_text, job_description_text,
+                                 candidate_email, questionnaire, store=False)
+    score = _parse_score(ranking_result)
+    if score is None:
+        raise RuntimeError(f"Ranking returned no score for job {job_id} and {email}: {ranking_result!r}")
+    explanation = ranking_result.get('explanation') if isinstance(ranking_result, dict) else None
+    db_operations.store_candidate_ranking(job_id, candidate_email, score, explanation)
+    return score
+
+
+def _worker_loop():
+    while not _stop.is_set():
+        try:
+            ranking_job = _claim_next()
+        except Exception as e:
+            print(f"[ERROR] Ranking queue claim failed: {e}")
+            ranking_job = None
+        if ranking_job is None:
+            _wakeup.wait(POLL_INTERVAL_SECONDS)
+            _wakeup.clear()
+            continue
+        try:
+            priority = BATCH if ranking_job.get("priority") == PRIORITY_RANK[BATCH] else INTERACTIVE
+            with priority_scope(priority):
+                if ranking_job["kind"] == PARSE:
+                    parse_candidate(ranking_job["job_id"], ranking_job["candidate_email"])
+                    score = None
+                else:
+                    score = rank_candidate(ranking_job["job_id"], ranking_job["candidate_email"])
+            _complete(ranking_job, score)
+            if ranking_job["kind"] == PARSE:
+                print(f"[INFO] Parsed the resume of {ranking_job['candidate_email']} for job {ranking_job['job_id']}")
+            else:
+                print(f"[INFO] Ranked {ranking_job['candidate_email']} for job {ranking_job['job_id']}: {score}")
+        except PermanentRankingError as e:
+            _fail(ranking_job, str(e), retryable=False)
+        except Exception as e:
+            _fail(ranking_job, str(e))
+
+
+def start_workers(max_workers=None):
+    """Start the worker threads (idempotent). Call once on application startup."""
+    if _workers:
+        return
+    _stop.clear()
+    _requeue_interrupted()
+    for i in range(max_workers or MAX_WORKERS):
+        worker = threading.Thread(target=_worker_loop, name=f"ranking-queue-{i}", daemon=True)
+        worker.start()
+        _workers.append(worker)
+    print(f"[INFO] Started {len(_workers)} ranking queue workers ({DB_PATH})")
+
+
+def stop_workers(timeout=5):
+    """Signal the workers to stop once their current ranking finishes."""
+    _stop.set()
+    _wakeup.set()
+    for worker in _workers:
+        worker.join(timeout)
+    _workers.clear()
+
+
+def run_until_idle(max_workers=None, job_id=None):
+    """
+    Start workers and block until no job of any kind is pending or running (for one job posting,
+    if given). Returns the ranking job counts.
+    """
+    start_workers(max_workers)
+    try:
+        while True:
+            counts = job_summary(job_id, kind=None)
+            if not counts[PENDING] and not counts[RUNNING]:
+                return job_summary(job_id)
+            time.sleep(POLL_INTERVAL_SECONDS)
+    finally:
+        stop_workers()
@@ -3,6 +3,7 @@ import os
 import uuid
 import json
 from common.database.cosmos.db_operations import fetch_application_by_job_id, create_application_for_job_id, store_candidate_ranking
+from common.llm import gateway
 from dotenv import load_dotenv
 
 # Load environment variables from .env file in the project directory
@@ -21,11 +22,7 @@ load_dotenv(backend_root / ".env")
 
 
 # Configuration for Azure OpenAI models
-config_list = [{"model": os.getenv("deployment_name"),  
-                            "api_key": os.getenv("AZURE_OPENAI_API_KEY"),
-                            "base_url": os.getenv("AZURE_OPENAI_ENDPOINT"),
-                            "api_type": os.getenv("api_type"),  
-                            "api_version": os.getenv("api_version")}]
+config_list = gateway.autogen_config_list()
 
 # --- Helper for async/background usage in FastAPI ---
 def run_ranking_as_background_task(job_id, job_questionnaire_id, resume, job_description, candidate_email, job_questionnaire):
@@ -42,10 +39,23 @@ def run_ranking_as_background_task(job_id, job_questionnaire_id, resume, job_des
         import traceback; traceback.print_exc()
         return None
 
-def initiate_chat(job_id, job_questionnaire_id, resume, job_description, candidate_email, job_questionnaire):
+def _usage_totals(usage_summary):
+    """Sum prompt/completion tokens across models from autogen.gather_usage_summary output."""
+    if isinstance(usage_summary, tuple):  # older autogen returns (total_usage, actual_usage)
+        usage_summary = {"usage_including_cached_inference": usage_summary[0]}
+    usage = (usage_summary or {}).get("usage_including_cached_inference") or {}
+    totals = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    for model_usage in usage.values():
+        if isinstance(model_usage, dict):
+            for key in totals:
+                totals[key] += model_usage.get(key, 0) or 0
+    return totals
+
+def initiate_chat(job_id, job_questionnaire_id, resume, job_description, candidate_email, job_questionnaire, store=True):
     """
     Main entrypoint for running the multi-agent ranking workflow.
     If running in a FastAPI endpoint, you should call this inside a BackgroundTasks context for long-running jobs.
+    With store=False the ranking is only returned, not saved.
 
     # Example usage in FastAPI handler:
     # from fastapi import BackgroundTasks
@@ -53,6 +63,7 @@ def initiate_chat(job_id, job_questionnaire_id, resume, job_description, candida
     """
     import logging
     ranking_result_holder = {}
+    usage_totals = None
     # Debug: Show resume type and preview
     try:
         questionnaire = job_questionnaire  # Always assign at the top
@@ -106,6 +117,11 @@ def initiate_chat(job_id, job_questionnaire_id, resume, job_description, candida
                     print(f"[ERROR] Explanation is missing for candidate {candidate_email}. Explanation is required.")
                     raise ValueError("Explanation is required for ranking_tool.")
 
+                if not store:
+                    ranking_result_holder['score'] = ranking
+                    ranking_result_holder['explanation'] = explanation
+                    return f"Ranking complete for candidate email: {candidate_email_safe}"
+
                 # Fetch the application data from Cosmos DB using job_id
                 ranking_data = fetch_application_by_job_id(job_id)
 
@@ -218,6 +234,12 @@ def initiate_chat(job_id, job_questionnaire_id, resume, job_description, candida
         )
         # NOTE: The ranking_tool will be called by the ranking agent with the actual score and conversation log.
         # No need to call ranking_tool manually here; it will be invoked by the agent with real data.
+        try:
+            usage_totals = _usage_totals(autogen.gather_usage_summary(
+                [job_description_analyst, resume_analyst, score_calculator_analyst, ranking_agent, group_chat_manager]
+            ))
+        except Exception as e:
+            print(f"[WARN] Could not gather token usage for {candidate_email}: {e}")
 
     except Exception as e:
         print(f"[ERROR] Exception in initiate_chat for candidate_email {candidate_email}: {e}")
@@ -226,6 +248,8 @@ def initiate_chat(job_id, job_questionnaire_id, resume, job_description, candida
 
     # Return the captured ranking result if available
     if ranking_result_holder:
+        if usage_totals:
+            ranking_result_holder['usage'] = usage_totals
         return ranking_result_holder
     return None
 
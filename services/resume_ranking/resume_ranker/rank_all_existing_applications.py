@@ -1,23 +1,27 @@
 import sys
 import os
 import json
+import argparse
 # Ensure project root is in sys.path for absolute imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
-from services.resume_ranking.resume_ranker.rank_on_application import rank_candidate_on_application
-from common.database.cosmos.db_operations import fetch_all_jobs, fetch_top_k_candidates_by_count
+from services.resume_ranking import ranking_queue
+from common.database.cosmos.db_operations import fetch_all_jobs, fetch_top_k_candidates_by_count, fetch_job_description_questionnaire
 
-def rank_all_applications_for_all_jobs():
+def rank_all_applications_for_all_jobs(workers=None):
     jobs = fetch_all_jobs()
     job_ids = [job['job_id'] for job in jobs if 'job_id' in job]
     print(f"[INFO] Found {len(job_ids)} unique job_ids.")
-    total_ranked = 0
+    total_queued = 0
     total_skipped = 0
     for job_idx, job_id in enumerate(job_ids):
         print(f"\n[INFO] Processing job_id {job_id} ({job_idx+1}/{len(job_ids)})")
+        job_questionnaire = fetch_job_description_questionnaire(job_id)
+        questionnaire_id = job_questionnaire['id'] if job_questionnaire else ''
         applications = fetch_top_k_candidates_by_count(job_id, top_k=1000)
-        ranked = 0
+        applications = json.loads(applications) if isinstance(applications, str) else applications
+        queued = 0
         skipped = 0
-        for idx, app in enumerate(applications):
+        for app in applications:
             candidate_email = app.get('email')
             job_id_app = app.get('job_id')
             resume_blob_name = app.get('resume_blob_name')
@@ -29,17 +33,18 @@ def rank_all_applications_for_all_jobs():
                 print(f"[WARNING] Skipping candidate {candidate_email} for job {job_id} (no resume_blob_name, likely incomplete application)")
                 skipped += 1
                 continue
-            try:
-                print(f"[INFO] Ranking candidate {candidate_email} for job {job_id} ({idx+1}/{len(applications)})")
-                rank_candidate_on_application(job_id, candidate_email)
-                ranked += 1
-            except Exception as e:
-                print(f"[ERROR] Failed to rank candidate {candidate_email}: {e}")
-                skipped += 1
-        print(f"[INFO] Ranking complete for job_id {job_id}. Total ranked: {ranked}, Skipped: {skipped}")
-        total_ranked += ranked
+            ranking_queue.enqueue(job_id, candidate_email, questionnaire_id, force=True, priority=ranking_queue.BATCH)
+            queued += 1
+        print(f"[INFO] Queued job_id {job_id}. Queued: {queued}, Skipped: {skipped}")
+        total_queued += queued
         total_skipped += skipped
-    print(f"\n[INFO] All jobs processed. Total ranked: {total_ranked}, Total skipped: {total_skipped}")
+    if total_queued:
+        counts = ranking_queue.run_until_idle(max_workers=workers)
+        print(f"\n[INFO] Ranking queue drained: {counts}")
+    print(f"\n[INFO] All jobs processed. Total queued: {total_queued}, Total skipped: {total_skipped}")
 
 if __name__ == "__main__":
-    rank_all_applications_for_all_jobs()
+    parser = argparse.ArgumentParser(description="Rank every existing application")
+    parser.add_argument("--workers", type=int, default=ranking_queue.MAX_WORKERS, help="Number of candidates ranked in parallel")
+    args = parser.parse_args()
+    rank_all_applications_for_all_jobs(args.workers)
@@ -0,0 +1,393 @@
+"""
+Single-call resume scoring engine.
+
+One structured-output LLM call scores every questionnaire question for a resume and
+returns JSON. The weighted sum and normalization are done here in Python against the
+questionnaire weights, instead of asking an agent to do the arithmetic.
+
+rank_resume() is the entry point used by the ranking worker. It dispatches to this
+engine ("single_call") or to the multi-agent GroupChat in multiagent_resume_ranker
+("groupchat"), based on config ranking.engine or the RANKING_ENGINE environment
+variable, and logs latency and token usage per resume for either engine.
+
+score_resumes_batch() scores many resumes for one job: several candidates are packed
+into each request, and every request starts with the same system prompt + job
+description + questionnaire messages so provider-side prompt caching applies to that
+prefix across requests.
+
+Both entry points memoize results in the "ranking" cache (common.utils.cache), keyed on the
+engine, model, prompt version, questionnaire id and content, job description and resume
+text, so re-ranking an unchanged resume against an unchanged questionnaire makes no LLM
+call. Entries are tagged per job and dropped when the job or its questionnaire is rewritten
+(db_operations.invalidate_ranking_cache).
+"""
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from dotenv import load_dotenv
+
+from common.utils.config_utils import load_config
+from common.utils.cache import get_cache, make_key
+from common.llm import gateway
+from common.database.cosmos.db_operations import store_candidate_ranking, ranking_cache_tag
+
+# Always load .env from backend root
+backend_root = Path(__file__).resolve().parent.parent.parent.parent
+load_dotenv(backend_root / ".env")
+
+config = load_config()
+ranking_config = config.get('ranking', {}) if isinstance(config, dict) else {}
+
+SINGLE_CALL = "single_call"
+GROUPCHAT = "groupchat"
+ENGINES = (SINGLE_CALL, GROUPCHAT)
+DEFAULT_ENGINE = os.getenv("RANKING_ENGINE") or ranking_config.get('engine', SINGLE_CALL)
+
+BATCH_SIZE = int(ranking_config.get('batch_size', 5))
+BATCH_CONCURRENCY = int(ranking_config.get('batch_concurrency', 4))
+
+MAX_SCORE = 5
+model = os.getenv("deployment_name")
+
+# Part of the ranking cache key; bump whenever SCORING_RUBRIC, the prompts or the GroupChat
+# agents change so previously cached rankings are no longer served.
+PROMPT_VERSION = "1"
+BATCH = "batch"
+
+
+
+SCORING_RUBRIC = """
+You are a seasoned hiring consultant scoring resumes against a job questionnaire.
+
+For each question, assign an integer score:
+5 - Expert-level relevant experience with renowned companies in the field
+4 - Expert-level relevant experience with smaller or less known companies
+3 - Strong transferable skills from well-known companies
+2 - Transferable skills from smaller companies
+1 - Some relevance to the job requirements
+0 - No relevant experience or not applicable
+
+Scrutinize claims, prefer concrete examples and achievements over vague statements, and be
+consistent across candidates. Do not calculate any totals or weighted scores.
+"""
+
+SCORING_SYSTEM_PROMPT = SCORING_RUBRIC + """
+Respond with JSON only, in this format:
+{
+  "scores": [
+    {"id": "<question id>", "score": <0-5>, "reasoning": "<one or two sentences citing the resume>"}
+  ],
+  "summary": "<two or three sentence explanation of the candidate's overall fit>"
+}
+Include every question id exactly once.
+"""
+
+BATCH_SCORING_SYSTEM_PROMPT = SCORING_RUBRIC + """
+You will be given several candidates. Score each one independently of the others.
+
+Respond with JSON only, in this format:
+{
+  "candidates": [
+    {
+      "candidate": "<candidate key>",
+      "scores": [
+        {"id": "<question id>", "score": <0-5>, "reasoning": "<one sentence citing the resume>"}
+      ],
+      "summary": "<two or three sentence explanation of the candidate's overall fit>"
+    }
+  ]
+}
+Include every candidate key exactly once and every question id exactly once per candidate.
+"""
+
+
+def flatten_questionnaire(questionnaire):
+    """
+    Turn a stored questionnaire into a flat list of {"id", "category", "question", "weight"}.
+    Accepts the {"questionnaire": {category: [...]}} document shape, the inner category dict,
+    or a plain list of questions.
+    """
+    if isinstance(questionnaire, str):
+        questionnaire = json.loads(questionnaire)
+    if isinstance(questionnaire, dict) and isinstance(questionnaire.get('questionnaire'), (dict, list)):
+        questionnaire = questionnaire['questionnaire']
+    if isinstance(questionnaire, list):
+        categories = {"": questionnaire}
+    elif isinstance(questionnaire, dict):
+        categories = {k: v for k, v in questionnaire.items() if isinstance(v, list)}
+    else:
+        categories = {}
+    questions = []
+    for category, items in categories.items():
+        for item in items:
+            if not isinstance(item, dict) or not item.get('question'):
+                continue
+            try:
+                weight = float(item.get('weight', 1))
+            except (TypeError, ValueError):
+                weight = 1.0
+            questions.append({
+                "id": f"q{len(questions) + 1}",
+                "category": category,
+                "question": item['question'],
+                "weight": max(weight, 0.0),
+            })
+    return questions
+
+
+def weighted_score(questions, scores):
+    """
+    Weighted, normalized score on a 0-100 scale.
+    Each question's score is clamped to 0..MAX_SCORE; unanswered questions count as 0.
+    """
+    total_possible = sum(q['weight'] * MAX_SCORE for q in questions)
+    if total_possible <= 0:
+        raise ValueError("Questionnaire has no weighted questions")
+    total = 0.0
+    for q in questions:
+        try:
+            score = float(scores.get(q['id'], 0))
+        except (TypeError, ValueError):
+            score = 0.0
+        total += q['weight'] * min(max(score, 0.0), MAX_SCORE)
+    return round(total / total_possible * 100, 2)
+
+
+def _resume_text(resume):
+    return resume if isinstance(resume, str) else json.dumps(resume, ensure_ascii=False)
+
+
+def ranking_cache_key(engine, job_questionnaire_id, resume, job_description, job_questionnaire):
+    return make_key("rank_resume", PROMPT_VERSION, engine, model, job_questionnaire_id, job_questionnaire,
+                    job_description, _resume_text(resume))
+
+
+def _questionnaire_messages(system_prompt, questions, job_description):
+    """
+    Messages shared by every request for a job. Keeping them first and byte-identical lets the
+    provider cache this prefix, so only the resume part is re-processed per request.
+    """
+    question_lines = "\n".join(
+        json.dumps({"id": q['id'], "category": q['category'], "question": q['question']}, ensure_ascii=False)
+        for q in questions
+    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Job Description:\n{job_description}\n\nQuestions:\n{question_lines}\n"},
+    ]
+
+
+def _usage_dict(usage):
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', 0),
+        'completion_tokens': getattr(usage, 'completion_tokens', 0),
+        'total_tokens': getattr(usage, 'total_tokens', 0),
+        'cached_tokens': getattr(details, 'cached_tokens', 0) if details else 0,
+    }
+
+
+def _candidate_result(questions, scored):
+    """Turn one candidate's {"scores": [...], "summary": ...} response into a scored result."""
+    by_id = {s.get('id'): s for s in scored.get('scores', []) if isinstance(s, dict)}
+    score = weighted_score(questions, {qid: s.get('score', 0) for qid, s in by_id.items()})
+    per_question = [dict(q, score=by_id.get(q['id'], {}).get('score', 0),
+                         reasoning=by_id.get(q['id'], {}).get('reasoning', '')) for q in questions]
+    explanation = scored.get('summary') or f"Weighted questionnaire score {score}/100"
+    return {'score': score, 'explanation': explanation, 'per_question': per_question,
+            'missing_questions': [q['id'] for q in questions if q['id'] not in by_id]}
+
+
+def score_resume(job_id, job_questionnaire_id, resume, job_description, candidate_email, job_questionnaire, store=True):
+    """
+    Score a resume with one LLM call. Same arguments as multiagent_resume_ranker.initiate_chat.
+    Returns {'score', 'explanation', 'per_question', 'usage'} or None on failure.
+    """
+    try:
+        if not resume or (isinstance(resume, str) and not resume.strip()):
+            print(f"[RANKING] Skipping ranking for {candidate_email}: Resume is missing or invalid.")
+            return None
+        questions = flatten_questionnaire(job_questionnaire)
+        if not questions:
+            print(f"[ERROR] No questions found in questionnaire {job_questionnaire_id} for job {job_id}")
+            return None
+        messages = _questionnaire_messages(SCORING_SYSTEM_PROMPT, questions, job_description)
+        messages.append({"role": "user", "content": f"Resume:\n{_resume_text(resume)}\n"})
+        completion = gateway.chat_completion(
+            model=model,
+            messages=messages,
+            response_format={"type": "json_object"},
+            temperature=0,
+            max_tokens=4096
+        )
+        result = _candidate_result(questions, json.loads(completion.choices[0].message.content))
+        if result['missing_questions']:
+            print(f"[WARN] Scoring response for {candidate_email} is missing {len(result['missing_questions'])} questions; scoring them 0")
+        result['usage'] = _usage_dict(completion.usage)
+        if store:
+            store_candidate_ranking(job_id, candidate_email, result['score'], result['explanation'])
+        return result
+    except Exception as e:
+        print(f"[ERROR] Exception in score_resume for candidate_email {candidate_email}: {e}")
+        import traceback; traceback.print_exc()
+        return None
+
+
+def rank_resume(job_id, job_questionnaire_id, resume, job_description, candidate_email, job_questionnaire, engine=None,
+                store=True, use_cache=True):
+    """
+    Rank a resume with the configured engine and log latency and token usage.
+    A cached result for identical inputs is returned (and stored, if store) without an LLM call;
+    pass use_cache=False to always run the engine.
+    Returns the engine result dict ({'score', 'explanation', ...}, 'cached' on a hit) or None.
+    """
+    engine = engine or DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown ranking engine: {engine!r} (expected one of {ENGINES})")
+    cache = get_cache("ranking") if use_cache else None
+    if cache is not None:
+        key = ranking_cache_key(engine, job_questionnaire_id, resume, job_description, job_questionnaire)
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"[RANKING] engine={engine} job_id={job_id} candidate={candidate_email} cache hit score={cached.get('score')}")
+            if store:
+                store_candidate_ranking(job_id, candidate_email, cached['score'], cached.get('explanation'))
+            cached.update(engine=engine, cached=True, latency_seconds=0.0)
+            return cached
+    start = time.perf_counter()
+    if engine == SINGLE_CALL:
+        result = score_resume(job_id, job_questionnaire_id, resume, job_description, candidate_email, job_questionnaire, store=store)
+    else:
+        from services.resume_ranking.resume_ranker.multiagent_resume_ranker import initiate_chat
+        result = initiate_chat(job_id, job_questionnaire_id, resume, job_description, candidate_email, job_questionnaire,
+                               store=store)
+    latency = time.perf_counter() - start
+    usage = (result or {}).get('usage') or {}
+    print(f"[RANKING] engine={engine} job_id={job_id} candidate={candidate_email} latency={latency:.2f}s "
+          f"prompt_tokens={usage.get('prompt_tokens', 'n/a')} completion_tokens={usage.get('completion_tokens', 'n/a')} "
+          f"score={(result or {}).get('score')}")
+    if result is not None:
+        if cache is not None and result.get('score') is not None:
+            cache.set(key, {k: v for k, v in result.items() if k != 'usage'}, tag=ranking_cache_tag(job_id))
+        result['engine'] = engine
+        result['latency_seconds'] = round(latency, 3)
+    return result
+
+
+def _score_chunk(questions, job_description, chunk, priority=None):
+    """Score a list of (email, resume) pairs in one request. Returns ({email: result}, usage)."""
+    keys = {f"c{i + 1}": email for i, (email, _) in enumerate(chunk)}
+    candidate_blocks = "\n\n".join(f"Candidate {key}:\n{_resume_text(resume)}"
+                                     for key, (_, resume) in zip(keys, chunk))
+    messages = _questionnaire_messages(BATCH_SCORING_SYSTEM_PROMPT, questions, job_description)
+    messages.append({"role": "user", "content": f"Candidates:\n\n{candidate_blocks}\n"})
+    completion = gateway.chat_completion(
+        priority=priority,
+        model=model,
+        messages=messages,
+        response_format={"type": "json_object"},
+        temperature=0,
+        max_tokens=min(16384, 2048 * len(chunk))
+    )
+    content = json.loads(completion.choices[0].message.content)
+    results = {}
+    for scored in content.get('candidates', []):
+        email = keys.get(scored.get('candidate')) if isinstance(scored, dict) else None
+        if email and email not in results:
+            results[email] = _candidate_result(questions, scored)
+    return results, _usage_dict(completion.usage)
+
+
+def score_resumes_batch(job_id, job_questionnaire_id, candidates, job_description, job_questionnaire,
+                        batch_size=None, concurrency=None, store=True, use_cache=True, priority=gateway.BATCH):
+    """
+    Score many resumes for one job.
+
+    :param candidates: list of {"email": ..., "resume": ...}
+    :param batch_size: candidates packed into each LLM request (config ranking.batch_size)
+    :param concurrency: requests in flight at once (config ranking.batch_concurrency)
+    :param use_cache: reuse cached batch results for unchanged resumes and cache new ones
+    :param priority: LLM gateway priority of the requests (bulk scoring defaults to batch)
+    :return: list of {"email", "score", "explanation", "per_question"} in input order; a
+             candidate that could not be scored has score None and an "error"
+    """
+    questions = flatten_questionnaire(job_questionnaire)
+    if not questions:
+        raise ValueError(f"No questions found in questionnaire {job_questionnaire_id} for job {job_id}")
+    pairs = [(c['email'], c['resume']) for c in candidates
+             if c.get('email') and c.get('resume') and not (isinstance(c['resume'], str) and not c['resume'].strip())]
+
+    results, errors, keys = {}, {}, {}
+    cache = get_cache("ranking") if use_cache else None
+    if cache is not None:
+        for email, resume in pairs:
+            keys[email] = ranking_cache_key(BATCH, job_questionnaire_id, resume, job_description, job_questionnaire)
+            cached = cache.get(keys[email])
+            if cached is not None:
+                results[email] = cached
+        pairs = [(email, resume) for email, resume in pairs if email not in results]
+
+    batch_size = max(1, batch_size or BATCH_SIZE)
+    chunks = [pairs[i:i + batch_size] for i in range(0, len(pairs), batch_size)]
+
+    start = time.perf_counter()
+    cached_count = len(results)
+    usage_total = {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'cached_tokens': 0}
+
+    def run(chunk):
+        try:
+            return chunk, _score_chunk(questions, job_description, chunk, priority), None
+        except Exception as e:
+            return chunk, None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency or BATCH_CONCURRENCY)) as executor:
+        for chunk, scored, error in executor.map(run, chunks):
+            if error is not None:
+                print(f"[ERROR] Batch scoring request failed for job {job_id} ({len(chunk)} candidates): {error}")
+                for email, _ in chunk:
+                    errors[email] = str(error)
+                continue
+            chunk_results, usage = scored
+            for key in usage_total:
+                usage_total[key] += usage.get(key, 0) or 0
+            for email, _ in chunk:
+                if email in chunk_results:
+                    results[email] = chunk_results[email]
+                else:
+                    errors[email] = "Candidate missing from batch scoring response"
+
+    # Anything the batch response dropped gets one single-candidate retry
+    resumes = dict(pairs)
+    for email in [e for e in errors if e in resumes]:
+        with gateway.priority_scope(priority):
+            retry = score_resume(job_id, job_questionnaire_id, resumes[email], job_description, email,
+                                 job_questionnaire, store=False)
+        if retry:
+            results[email] = retry
+            errors.pop(email)
+
+    if cache is not None:
+        for email, _ in pairs:
+            if email in results:
+                cache.set(keys[email], {k: v for k, v in results[email].items() if k != 'usage'},
+                          tag=ranking_cache_tag(job_id))
+
+    latency = time.perf_counter() - start
+    print(f"[RANKING] engine=batch job_id={job_id} candidates={len(pairs) + cached_count} cached={cached_count} requests={len(chunks)} "
+          f"latency={latency:.2f}s prompt_tokens={usage_total['prompt_tokens']} cached_tokens={usage_total['cached_tokens']} "
+          f"completion_tokens={usage_total['completion_tokens']} failed={len(errors)}")
+
+    output = []
+    for c in candidates:
+        email = c.get('email')
+        if email in results:
+            result = results[email]
+            if store:
+                store_candidate_ranking(job_id, email, result['score'], result['explanation'])
+            output.append({'email': email, 'score': result['score'], 'explanation': result['explanation'],
+                           'per_question': result['per_question']})
+        else:
+            output.append({'email': email, 'score': None, 'error': errors.get(email, "Missing email or resume")})
+    return output
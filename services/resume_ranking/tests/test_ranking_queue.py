@@ -0,0 +1,208 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.resume_ranking import ranking_queue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(ranking_queue, "DB_PATH", str(tmp_path / "ranking_queue.db"))
+    monkeypatch.setattr(ranking_queue, "_schema_ready", False)
+    monkeypatch.setattr(ranking_queue, "POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(ranking_queue.random, "uniform", lambda low, high: 1.0)
+    yield ranking_queue
+    ranking_queue.stop_workers()
+
+
+def set_status(queue, ranking_job_id, **fields):
+    conn = queue._connect()
+    try:
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        conn.execute(f"UPDATE ranking_jobs SET {assignments} WHERE id = ?", (*fields.values(), ranking_job_id))
+    finally:
+        conn.close()
+
+
+def test_enqueue_is_idempotent(queue):
+    first = queue.enqueue("123456", "Ann@Example.com ", questionnaire_id="q1")
+    second = queue.enqueue("123456", "ann@example.com", questionnaire_id="q1")
+    assert first["id"] == second["id"]
+    assert first["idempotency_key"] == "123456:ann@example.com:q1"
+    assert queue.job_summary("123456")[queue.PENDING] == 1
+
+
+def test_new_questionnaire_is_a_new_job(queue):
+    first = queue.enqueue("123456", "ann@example.com", questionnaire_id="q1")
+    second = queue.enqueue("123456", "ann@example.com", questionnaire_id="q2")
+    assert first["id"] != second["id"]
+
+
+def test_enqueue_rejects_missing_ids_and_unknown_kind(queue):
+    assert queue.enqueue("123456", "  ", questionnaire_id="q1") is None
+    with pytest.raises(ValueError):
+        queue.enqueue("123456", "ann@example.com", questionnaire_id="q1", kind="score")
+
+
+def test_enqueue_rejects_unknown_priority(queue):
+    with pytest.raises(ValueError):
+        queue.enqueue("123456", "ann@example.com", questionnaire_id="q1", priority="urgent")
+
+
+def test_finished_job_is_only_requeued_with_force(queue):
+    job = queue.enqueue("123456", "ann@example.com", questionnaire_id="q1")
+    set_status(queue, job["id"], status=queue.DONE, score=7.5, attempts=1)
+
+    again = queue.enqueue("123456", "ann@example.com", questionnaire_id="q1")
+    assert again["status"] == queue.DONE
+
+    forced = queue.enqueue("123456", "ann@example.com", questionnaire_id="q1", force=True)
+    assert forced["id"] == job["id"]
+    assert forced["status"] == queue.PENDING
+    assert forced["attempts"] == 0
+    assert forced["score"] is None
+
+
+def test_pending_batch_job_is_raised_to_interactive(queue):
+    job = queue.enqueue("123456", "ann@example.com", questionnaire_id="q1", priority=queue.BATCH)
+    assert job["priority"] == queue.PRIORITY_RANK[queue.BATCH]
+    job = queue.enqueue("123456", "ann@example.com", questionnaire_id="q1", priority=queue.INTERACTIVE)
+    assert job["priority"] == queue.PRIORITY_RANK[queue.INTERACTIVE]
+
+
+def test_claim_takes_interactive_jobs_first(queue):
+    batch = queue.enqueue("123456", "batch@example.com", questionnaire_id="q1", priority=queue.BATCH)
+    interactive = queue.enqueue("123456", "live@example.com", questionnaire_id="q1")
+
+    claimed = queue._claim_next()
+    assert claimed["id"] == interactive["id"]
+    assert queue.get_job(interactive["id"])["status"] == queue.RUNNING
+    assert queue.get_job(interactive["id"])["attempts"] == 1
+    assert queue._claim_next()["id"] == batch["id"]
+    assert queue._claim_next() is None
+
+
+def test_claim_skips_jobs_waiting_for_backoff(queue):
+    job = queue.enqueue("123456", "ann@example.com", questionnaire_id="q1")
+    later = (datetime.utcnow() + timedelta(minutes=5)).isoformat()
+    set_status(queue, job["id"], next_attempt_at=later)
+    assert queue._claim_next() is None
+
+
+def test_backoff_doubles_up_to_the_cap(queue, monkeypatch):
+    monkeypatch.setattr(queue, "BACKOFF_BASE_SECONDS", 30)
+    monkeypatch.setattr(queue, "BACKOFF_MAX_SECONDS", 100)
+    assert [queue._backoff_seconds(n) for n in (1, 2, 3, 4)] == [30, 60, 100, 100]
+
+
+def test_failure_is_retried_until_max_attempts(queue):
+    queue.enqueue("123456", "ann@example.com", questionnaire_id="q1")
+    claimed = queue._claim_next()
+    queue._fail(claimed, "timeout")
+
+    job = queue.get_job(claimed["id"])
+    assert job["status"] == queue.PENDING
+    assert job["last_error"] == "timeout"
+    assert job["next_attempt_at"] > datetime.utcnow().isoformat()
+
+    for _ in range(queue.MAX_ATTEMPTS - 1):
+        set_status(queue, claimed["id"], next_attempt_at=datetime.utcnow().isoformat())
+        claimed = queue._claim_next()
+        queue._fail(claimed, "timeout")
+    job = queue.get_job(claimed["id"])
+    assert job["status"] == queue.FAILED
+    assert job["attempts"] == queue.MAX_ATTEMPTS
+
+
+def test_permanent_error_fails_without_retry(queue, monkeypatch):
+    def missing_application(job_id, email):
+        raise queue.PermanentRankingError(f"No application found for job {job_id} and {email}")
+
+    monkeypatch.setattr(queue, "rank_candidate", missing_application)
+    job = queue.enqueue("123456", "ann@example.com", questionnaire_id="q1")
+
+    counts = queue.run_until_idle(max_workers=1, job_id="123456")
+
+    assert counts[queue.FAILED] == 1
+    job = queue.get_job(job["id"])
+    assert job["attempts"] == 1
+    assert job["last_error"].startswith("No application found")
+
+
+def test_worker_stores_the_score(queue, monkeypatch):
+    monkeypatch.setattr(queue, "rank_candidate", lambda job_id, email: 8.0)
+    job = queue.enqueue("123456", "ann@example.com", questionnaire_id="q1")
+
+    counts = queue.run_until_idle(max_workers=1, job_id="123456")
+
+    assert counts[queue.DONE] == 1
+    assert queue.get_job(job["id"])["score"] == 8.0
+    assert queue.job_statuses("123456")["ann@example.com"]["status"] == queue.DONE
+
+
+def test_requeue_interrupted_only_touches_stale_jobs(queue):
+    stale = queue.enqueue("123456", "stale@example.com", questionnaire_id="q1")
+    fresh = queue.enqueue("123456", "fresh@example.com", questionnaire_id="q1")
+    long_ago = (datetime.utcnow() - timedelta(seconds=queue.STALE_RUNNING_SECONDS + 60)).isoformat()
+    set_status(queue, stale["id"], status=queue.RUNNING, updated_at=long_ago)
+    set_status(queue, fresh["id"], status=queue.RUNNING)
+
+    queue._requeue_interrupted()
+
+    assert queue.get_job(stale["id"])["status"] == queue.PENDING
+    assert queue.get_job(fresh["id"])["status"] == queue.RUNNING
+    assert queue.pending_emails("123456") == {"stale@example.com", "fresh@example.com"}
+
+
+@pytest.mark.parametrize("result, expected", [
+    ({"score": "7.5", "explanation": "ok"}, 7.5),
+    (6, 6.0),
+    ("Ranking: 8.25 out of 10", 8.25),
+    ("no score", None),
+    (None, None),
+])
+def test_parse_score(result, expected):
+    assert ranking_queue._parse_score(result) == expected
+
+
+def test_parse_job_is_separate_from_the_ranking_job(queue):
+    rank = queue.enqueue("123456", "ann@example.com", questionnaire_id="q1")
+    parse = queue.enqueue("123456", "ann@example.com", kind=queue.PARSE)
+
+    assert parse["id"] != rank["id"]
+    assert parse["idempotency_key"] == "parse:123456:ann@example.com"
+    assert queue.enqueue("123456", "Ann@Example.com", kind=queue.PARSE)["id"] == parse["id"]
+    assert queue.job_summary("123456")[queue.PENDING] == 1
+    assert queue.job_summary("123456", queue.PARSE)[queue.PENDING] == 1
+    assert queue.job_statuses("123456", queue.PARSE)["ann@example.com"]["id"] == parse["id"]
+    assert queue.get_status("123456", "ann@example.com")["id"] == rank["id"]
+
+
+def test_parse_failure_does_not_use_up_ranking_attempts(queue, monkeypatch):
+    def failing_parse(job_id, email):
+        raise RuntimeError("parse timed out")
+
+    monkeypatch.setattr(queue, "parse_candidate", failing_parse)
+    monkeypatch.setattr(queue, "rank_candidate", lambda job_id, email: 6.0)
+    monkeypatch.setattr(queue, "MAX_ATTEMPTS", 1)
+    rank = queue.enqueue("123456", "ann@example.com", questionnaire_id="q1")
+    parse = queue.enqueue("123456", "ann@example.com", kind=queue.PARSE)
+
+    counts = queue.run_until_idle(max_workers=1, job_id="123456")
+
+    assert counts[queue.DONE] == 1
+    rank = queue.get_job(rank["id"])
+    assert (rank["status"], rank["attempts"], rank["score"]) == (queue.DONE, 1, 6.0)
+    parse = queue.get_job(parse["id"])
+    assert parse["status"] == queue.FAILED
+    assert parse["last_error"] == "parse timed out"
+
+
+@pytest.mark.parametrize("parsed_resume, expected", [
+    (None, False),
+    ({}, False),
+    ({"raw_text": "text"}, False),
+    ({"raw_text": "text", "name": "Ann"}, True),
+])
+def test_is_parsed(parsed_resume, expected):
+    assert ranking_queue.is_parsed(parsed_resume) == expected
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from services.resume_ranking.resume_ranker.scoring_engine import MAX_SCORE, flatten_questionnaire, weighted_score
+
+QUESTIONNAIRE = {
+    "questionnaire": {
+        "Technical Skills": [
+            {"question": "Python experience?", "weight": 3},
+            {"question": "Cloud experience?", "weight": "2"},
+        ],
+        "Soft Skills": [
+            {"question": "Leads a team?"},
+        ],
+    }
+}
+
+
+def test_flatten_questionnaire_document():
+    assert flatten_questionnaire(QUESTIONNAIRE) == [
+        {"id": "q1", "category": "Technical Skills", "question": "Python experience?", "weight": 3.0},
+        {"id": "q2", "category": "Technical Skills", "question": "Cloud experience?", "weight": 2.0},
+        {"id": "q3", "category": "Soft Skills", "question": "Leads a team?", "weight": 1.0},
+    ]
+
+
+def test_flatten_questionnaire_accepts_every_stored_shape():
+    expected = flatten_questionnaire(QUESTIONNAIRE)
+    assert flatten_questionnaire(QUESTIONNAIRE["questionnaire"]) == expected
+    assert flatten_questionnaire(json.dumps(QUESTIONNAIRE)) == expected
+
+    questions = flatten_questionnaire([{"question": "Python?", "weight": 2}])
+    assert questions == [{"id": "q1", "category": "", "question": "Python?", "weight": 2.0}]
+
+
+def test_flatten_questionnaire_skips_malformed_entries():
+    questions = flatten_questionnaire({
+        "job_title": "Engineer",
+        "Skills": ["not a dict", {"weight": 2}, {"question": ""},
+                   {"question": "Bad weight?", "weight": "high"},
+                   {"question": "Negative weight?", "weight": -1}],
+    })
+    assert [(q["id"], q["question"], q["weight"]) for q in questions] == [
+        ("q1", "Bad weight?", 1.0),
+        ("q2", "Negative weight?", 0.0),
+    ]
+    assert flatten_questionnaire(None) == []
+
+
+def test_weighted_score():
+    questions = flatten_questionnaire(QUESTIONNAIRE)
+    assert weighted_score(questions, {"q1": MAX_SCORE, "q2": MAX_SCORE, "q3": MAX_SCORE}) == 100.0
+    assert weighted_score(questions, {}) == 0.0
+    # (3 * 5 + 2 * 0 + 1 * 2) / (6 * 5)
+    assert weighted_score(questions, {"q1": 5, "q3": "2"}) == 56.67
+
+
+def test_weighted_score_clamps_and_ignores_bad_scores():
+    questions = flatten_questionnaire([{"question": "A?"}, {"question": "B?"}])
+    assert weighted_score(questions, {"q1": 9, "q2": -3}) == 50.0
+    assert weighted_score(questions, {"q1": "n/a", "q2": None}) == 0.0
+
+
+def test_weighted_score_needs_a_weighted_question():
+    with pytest.raises(ValueError):
+        weighted_score([], {})
+    with pytest.raises(ValueError):
+        weighted_score(flatten_questionnaire([{"question": "A?", "weight": 0}]), {"q1": 5})